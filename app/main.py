@@ -5,6 +5,7 @@ from app.modules.hd import router as hd_router
 from app.modules.spiral import router as spiral_router
 from app.modules.admin import router as admin_router
 from app.routers import auth, feedback
+from app.modules.hd.geocoding import local_gazetteer
 import subprocess
 import sys
 import os
@@ -12,7 +13,7 @@ import os
 # Import models for Alembic to detect them
 from app.core.models import User, AppSession, UserApp, Feedback
 from app.modules.values.models import ValuesSession, ValuesChatMessage, ValuesSummary
-from app.modules.hd.models import HDSession, HDChatMessage, HDSummary
+from app.modules.hd.models import HDSession, HDChatMessage, HDSummary, HDChartCache, HDTransitOverlay
 from app.modules.spiral.models import SpiralSession, SpiralChatMessage, SpiralSummary
 
 # Run database migrations on startup
@@ -63,4 +64,9 @@ app.include_router(hd_router.router, prefix="/hd", tags=["hd"])
 app.include_router(spiral_router.router, prefix="/spiral", tags=["spiral"])
 app.include_router(auth.router, tags=["auth"])
 app.include_router(admin_router.router, tags=["admin"])
-app.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
\ No newline at end of file
+app.include_router(feedback.router, prefix="/feedback", tags=["feedback"])
+
+@app.on_event("startup")
+def load_city_index():
+    """Indeks miast do autocomplete ładowany raz, przed pierwszym żądaniem"""
+    local_gazetteer()
\ No newline at end of file
@@ -182,6 +182,41 @@ def get_admin_stats(
         db.close()
 
 
+@router.get("/hd/engine-stats")
+def get_hd_engine_stats(
+    admin_key: str = Query(...)
+):
+    """
+    Statystyki silnika Human Design (solver Design, pula efemeryd, single-flight obliczeń, tablica efemeryd, cache wykresów, strefy czasowe, tranzyty, wykresy grup, bodygraph SVG, katalog bramek).
+    """
+    # Verify admin key
+    verify_admin_key(admin_key)
+    
+    from app.modules.hd.hd_calculator import design_solver_stats
+    from app.modules.hd.ephemeris_table import table_stats
+    from app.modules.hd.chart_cache import chart_cache
+    from app.modules.hd.timezones import get_timezone_resolver
+    from app.modules.hd.transits import transit_cache_stats
+    from app.modules.hd.connections import group_cache_stats
+    from app.modules.hd.bodygraph import bodygraph_cache
+    from app.modules.hd.gate_catalog import gate_catalog
+    from app.modules.hd.ephemeris_pool import pool_stats
+    from app.modules.hd.single_flight import chart_flight
+    
+    return {
+        "design_solver": design_solver_stats(),
+        "ephemeris_pool": pool_stats(),
+        "chart_flight": chart_flight.snapshot(),
+        "ephemeris_table": table_stats(),
+        "chart_cache": chart_cache.snapshot(),
+        "timezones": get_timezone_resolver().snapshot(),
+        "transits": transit_cache_stats(),
+        "group_charts": group_cache_stats(),
+        "bodygraph": bodygraph_cache.snapshot(),
+        "gate_catalog": gate_catalog.snapshot()
+    }
+
+
 @router.get("/users")
 def get_all_users(
     admin_key: str = Query(...),
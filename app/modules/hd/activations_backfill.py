@@ -0,0 +1,142 @@
+# app/modules/hd/activations_backfill.py
+"""
+Uzupełnianie aktywacji planet (activations) i aktywnych bramek w starszych sesjach HD.
+
+Sesje bez aktywacji czytane są partiami po id (keyset), liczone silnikiem wsadowym
+(hd_batch, grupami po systemie zodiaku i metodzie Design, opcjonalnie w kilku procesach)
+i zapisywane jednym bulk UPDATE na partię. Po każdej partii postęp trafia do pliku checkpoint,
+więc przerwane zadanie wznawia się od ostatniego zapisanego id.
+
+Uruchamianie:
+    python -m app.modules.hd.activations_backfill --batch-size 500 --workers 4
+    python -m app.modules.hd.activations_backfill --restart   # od początku, z pominięciem checkpointu
+"""
+import argparse
+import json
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.database import get_db
+from app.modules.hd.activations_codec import pack_activations
+from app.modules.hd.ephemeris_pool import init_worker
+from app.modules.hd.hd_batch import compute_hd_charts_batch
+from app.modules.hd.hd_calculator import to_utc
+from app.modules.hd.models import HDSession
+from app.modules.hd.timezones import get_timezone_resolver
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_CHECKPOINT = Path(__file__).resolve().parents[3] / "data" / "hd_activations_backfill.json"
+CHUNK_SIZE = 100  # rekordów na jedno zadanie procesu roboczego
+
+def _compute_chunk(utc_births: Sequence[datetime], zodiac_system: str,
+                   calculation_method: str) -> List[Tuple[List[Dict], List[int]]]:
+    """(aktywacje, aktywne bramki) dla listy dat UTC - wykonywane także w procesach roboczych"""
+    results = compute_hd_charts_batch(utc_births, zodiac_system=zodiac_system,
+                                      calculation_method=calculation_method)
+    return [(r["positions"], r["summary"]["active_gates"]) for r in results]
+
+def utc_births(rows, stats: Dict) -> List[Tuple[object, datetime]]:
+    """Czas UTC urodzenia dla każdej sesji (strefy rozwiązywane wsadowo); błędne rekordy pomijane"""
+    tznames = get_timezone_resolver().timezones_for([r.birth_lat for r in rows], [r.birth_lng for r in rows])
+    births = []
+    for row, tzname in zip(rows, tznames):
+        try:
+            if not tzname:
+                raise ValueError("brak strefy czasowej")
+            dt_local = datetime.fromisoformat(f"{row.birth_date.strftime('%Y-%m-%d')}T{row.birth_time}")
+            births.append((row, to_utc(dt_local, tzname)))
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"WARN: session {row.session_id} skipped: {e}")
+    return births
+
+def compute_batch(births, executor: Optional[ProcessPoolExecutor],
+                  compute_chunk=_compute_chunk) -> List[Tuple[object, object]]:
+    """compute_chunk(daty UTC, zodiak, metoda) dla grup po systemie, w porcjach CHUNK_SIZE; wynik w kolejności grup"""
+    groups = defaultdict(list)
+    for row, dt_utc in births:
+        groups[(row.zodiac_system or "tropical", row.calculation_method or "degrees")].append((row, dt_utc))
+
+    jobs = []
+    for (zodiac_system, calculation_method), items in groups.items():
+        for start in range(0, len(items), CHUNK_SIZE):
+            chunk = items[start:start + CHUNK_SIZE]
+            args = ([dt for _, dt in chunk], zodiac_system, calculation_method)
+            future = executor.submit(compute_chunk, *args) if executor else None
+            jobs.append((chunk, future, args))
+
+    computed = []
+    for chunk, future, args in jobs:
+        results = future.result() if future else compute_chunk(*args)
+        computed.extend((row, result) for (row, _), result in zip(chunk, results))
+    return computed
+
+def _load_checkpoint(path: Path) -> Dict:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {}
+
+def _save_checkpoint(path: Path, state: Dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    tmp.replace(path)
+
+def run_backfill(batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 0,
+                 checkpoint: Optional[Path] = DEFAULT_CHECKPOINT, restart: bool = False) -> Dict:
+    """Uzupełnia aktywacje wszystkich sesji, które ich nie mają; zwraca statystyki"""
+    state = {} if restart or checkpoint is None else _load_checkpoint(checkpoint)
+    stats = {"last_id": 0, "scanned": 0, "updated": 0, "failed": 0, **state}
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                       mp_context=multiprocessing.get_context("spawn"))
+    db = next(get_db())
+    try:
+        while True:
+            rows = (db.query(HDSession.id, HDSession.session_id, HDSession.birth_date, HDSession.birth_time,
+                             HDSession.birth_lat, HDSession.birth_lng, HDSession.zodiac_system,
+                             HDSession.calculation_method, HDSession.active_gates)
+                    .filter(HDSession.id > stats["last_id"], HDSession.activations_packed.is_(None))
+                    .order_by(HDSession.id).limit(batch_size).all())
+            if not rows:
+                break
+            updates = []
+            for row, (activations, active_gates) in compute_batch(utc_births(rows, stats), executor):
+                update = {"id": row.id, "activations_packed": pack_activations(activations)}
+                if not row.active_gates:
+                    update["active_gates"] = active_gates
+                updates.append(update)
+            if updates:
+                db.bulk_update_mappings(HDSession, updates)
+                db.commit()
+            stats["scanned"] += len(rows)
+            stats["updated"] += len(updates)
+            stats["last_id"] = rows[-1].id
+            if checkpoint is not None:
+                _save_checkpoint(checkpoint, stats)
+            print(json.dumps(stats))
+    finally:
+        db.close()
+        if executor:
+            executor.shutdown()
+    return stats
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Backfill planetary activations of HD sessions")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = in-process)")
+    parser.add_argument("--checkpoint", type=Path, default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and start from the first id")
+    args = parser.parse_args(argv)
+
+    stats = run_backfill(batch_size=args.batch_size, workers=args.workers,
+                         checkpoint=args.checkpoint, restart=args.restart)
+    print(json.dumps({"done": True, **stats}))
+
+if __name__ == "__main__":
+    main()
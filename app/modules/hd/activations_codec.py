@@ -0,0 +1,45 @@
+# app/modules/hd/activations_codec.py
+"""
+Binarny zapis aktywacji planet sesji HD (kolumna hd_sessions.activations_packed).
+
+Stały układ 26 rekordów `<BBf` (bramka, linia, długość float32) = 156 bajtów zamiast ~2.3 kB JSON.
+Strona i planeta wynikają z pozycji rekordu: najpierw Personality, potem Design, ciała w kolejności
+ACTIVATION_BODIES. Brak aktywacji zapisywany jest jako długość NaN i pomijany przy dekodowaniu.
+Bramka i linia zapisane są dokładnie, długość z dokładnością float32 (~1e-5°).
+"""
+import math
+import struct
+from typing import Dict, List, Optional, Sequence
+
+from app.modules.hd.hd_calculator import ACTIVATION_BODIES, activation_row
+
+SIDES = ("Personality", "Design")
+RECORD = struct.Struct("<BBf")
+SLOTS = [(side, body) for side in SIDES for body in ACTIVATION_BODIES]
+SLOT_INDEX = {slot: i for i, slot in enumerate(SLOTS)}
+PACKED_SIZE = RECORD.size * len(SLOTS)
+
+_EMPTY = RECORD.pack(0, 0, math.nan) * len(SLOTS)
+
+def pack_activations(rows: Optional[Sequence[Dict]]) -> Optional[bytes]:
+    """Lista {side, planet, lon, gate, line} → 156 bajtów (None dla pustej listy)"""
+    if not rows:
+        return None
+    buf = bytearray(_EMPTY)
+    for row in rows:
+        i = SLOT_INDEX.get((row.get("side"), row.get("planet")))
+        if i is None or row.get("lon") is None:
+            continue
+        # Przy powtórzonym ciele wygrywa ostatni wpis (starsze wersje silnika dublowały South Node)
+        RECORD.pack_into(buf, i * RECORD.size, row.get("gate") or 0, row.get("line") or 0, row["lon"])
+    return bytes(buf)
+
+def unpack_activations(data: Optional[bytes]) -> List[Dict]:
+    """156 bajtów → lista aktywacji w formacie compute_hd_chart"""
+    if not data:
+        return []
+    return [
+        activation_row(side, planet, lon, gate, line)
+        for (side, planet), (gate, line, lon) in zip(SLOTS, RECORD.iter_unpack(bytes(data)))
+        if not math.isnan(lon)
+    ]
@@ -0,0 +1,260 @@
+# app/modules/hd/bodygraph.py
+"""
+Bodygraph jako SVG renderowany po stronie serwera.
+
+Szablon jest kompilowany raz przy imporcie: dla każdego centrum, połówki kanału i bramki
+przygotowane są gotowe fragmenty SVG we wszystkich stanach (nieaktywna / Personality / Design / oba),
+więc renderowanie to wybór fragmentów po maskach bitowych i jedno złączenie napisów.
+
+Wynik zależy wyłącznie od masek bramek Personality i Design (kanały i centra wynikają z nich),
+dlatego kluczem cache i mocnym ETagiem jest hash tych masek i wersji szablonu. Adres treści
+(bodygraph_key: wersja szablonu + maski) nigdy nie zmienia zawartości, więc może być cache'owany bezterminowo.
+HD_BODYGRAPH_CACHE_SIZE - liczba wyrenderowanych SVG trzymanych w pamięci (domyślnie 2048).
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.modules.hd.hd_calculator import (
+    CENTER_BITS, CENTERS, CHANNEL_LIST, center_mask, channel_mask, gate_mask,
+)
+
+TEMPLATE_VERSION = "1"
+WIDTH, HEIGHT = 400, 640
+
+CENTER_GATES: Dict[str, List[int]] = {
+    "Head": [64, 61, 63],
+    "Ajna": [47, 24, 4, 17, 43, 11],
+    "Throat": [62, 23, 56, 35, 12, 45, 33, 8, 31, 20, 16],
+    "G": [1, 13, 25, 46, 2, 15, 10, 7],
+    "Ego": [21, 40, 26, 51],
+    "Solar Plexus": [6, 37, 22, 36, 30, 55, 49],
+    "Sacral": [5, 14, 29, 59, 9, 3, 42, 27, 34],
+    "Spleen": [48, 57, 44, 50, 32, 28, 18],
+    "Root": [53, 60, 52, 19, 39, 41, 58, 54, 38],
+}
+GATE_CENTER = {g: c for c, gates in CENTER_GATES.items() for g in gates}
+
+# (x, y, kształt, połowa rozmiaru)
+CENTER_LAYOUT: Dict[str, Tuple[float, float, str, float]] = {
+    "Head": (200, 60, "up", 38),
+    "Ajna": (200, 150, "down", 38),
+    "Throat": (200, 255, "square", 38),
+    "G": (200, 360, "diamond", 40),
+    "Ego": (278, 410, "up", 26),
+    "Sacral": (200, 500, "square", 38),
+    "Root": (200, 595, "square", 38),
+    "Spleen": (68, 500, "right", 38),
+    "Solar Plexus": (332, 500, "left", 38),
+}
+CENTER_COLORS = {
+    "Head": "#f2d14b", "Ajna": "#6dbb72", "Throat": "#a9825a", "G": "#f2d14b", "Ego": "#d65a4f",
+    "Sacral": "#d65a4f", "Solar Plexus": "#a9825a", "Spleen": "#a9825a", "Root": "#a9825a",
+}
+# Stany bramki: 0 - nieaktywna, 1 - Personality, 2 - Design, 3 - oba
+PERSONALITY_COLOR, DESIGN_COLOR, INACTIVE_COLOR = "#1f1f1f", "#c0392b", "#e3e3e3"
+GATE_SPACING = 14.0
+
+def _polygon(x: float, y: float, shape: str, s: float) -> List[Tuple[float, float]]:
+    return {
+        "square": [(x - s, y - s), (x + s, y - s), (x + s, y + s), (x - s, y + s)],
+        "diamond": [(x, y - s), (x + s, y), (x, y + s), (x - s, y)],
+        "up": [(x, y - s), (x + s, y + 0.8 * s), (x - s, y + 0.8 * s)],
+        "down": [(x - s, y - 0.8 * s), (x + s, y - 0.8 * s), (x, y + s)],
+        "right": [(x - 0.8 * s, y - s), (x + s, y), (x - 0.8 * s, y + s)],
+        "left": [(x + 0.8 * s, y - s), (x - s, y), (x + 0.8 * s, y + s)],
+    }[shape]
+
+def _spread(angles: List[float], min_step: float) -> List[float]:
+    """
+    Rozsuwa posortowane kąty na okręgu, by sąsiednie dzieliło co najmniej min_step.
+    Okrąg rozcinany jest w największej przerwie; nachodzące grupy łączone są wokół średniej kątów.
+    """
+    n = len(angles)
+    if n < 2:
+        return list(angles)
+    gaps = [(angles[(i + 1) % n] - angles[i]) % (2 * math.pi) for i in range(n)]
+    cut = max(range(n), key=gaps.__getitem__) + 1
+    order = list(range(cut, n)) + list(range(cut))
+    unrolled = [angles[i] + (2 * math.pi if i < cut else 0.0) for i in order]
+
+    clusters: List[List[float]] = []  # każda grupa: lista pożądanych kątów
+    for angle in unrolled:
+        clusters.append([angle])
+        while len(clusters) > 1:
+            prev, last = clusters[-2], clusters[-1]
+            prev_end = sum(prev) / len(prev) + (len(prev) - 1) / 2 * min_step
+            last_start = sum(last) / len(last) - (len(last) - 1) / 2 * min_step
+            if last_start - prev_end >= min_step - 1e-9:
+                break
+            clusters[-2:] = [prev + last]
+
+    placed = []
+    for cluster in clusters:
+        mid = sum(cluster) / len(cluster)
+        placed += [mid + (i - (len(cluster) - 1) / 2) * min_step for i in range(len(cluster))]
+    result = [0.0] * n
+    for i, angle in zip(order, placed):
+        result[i] = angle
+    return result
+
+def _gate_positions() -> Dict[int, Tuple[float, float]]:
+    """Bramki na okręgu wewnątrz centrum, każda od strony centrum partnera z pierwszego kanału"""
+    partner = {}
+    for a, b in CHANNEL_LIST:
+        partner.setdefault(a, GATE_CENTER[b])
+        partner.setdefault(b, GATE_CENTER[a])
+
+    positions = {}
+    for center, gates in CENTER_GATES.items():
+        x, y, _, s = CENTER_LAYOUT[center]
+        radius = max(0.65 * s, len(gates) * GATE_SPACING / (2 * math.pi))
+        step = GATE_SPACING / radius
+        groups: Dict[str, List[int]] = {}
+        for g in gates:
+            groups.setdefault(partner[g], []).append(g)
+        wanted = []
+        for other, members in groups.items():
+            ox, oy = CENTER_LAYOUT[other][:2]
+            base = math.atan2(oy - y, ox - x)
+            wanted += [(base + (i - (len(members) - 1) / 2) * step, g) for i, g in enumerate(members)]
+        wanted.sort()
+        angles = _spread([angle for angle, _ in wanted], step)
+        for angle, (_, g) in zip(angles, wanted):
+            positions[g] = (x + radius * math.cos(angle), y + radius * math.sin(angle))
+    return positions
+
+def _line(x1, y1, x2, y2, color: str, extra: str = "") -> str:
+    return (f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}" '
+            f'stroke="{color}" stroke-width="6" stroke-linecap="round"{extra}/>')
+
+def _half_channel(start, mid) -> List[str]:
+    """Połówka kanału od bramki do środka kanału w 4 stanach"""
+    (x1, y1), (x2, y2) = start, mid
+    return [
+        _line(x1, y1, x2, y2, INACTIVE_COLOR),
+        _line(x1, y1, x2, y2, PERSONALITY_COLOR),
+        _line(x1, y1, x2, y2, DESIGN_COLOR),
+        _line(x1, y1, x2, y2, DESIGN_COLOR) + _line(x1, y1, x2, y2, PERSONALITY_COLOR, ' stroke-dasharray="5 5"'),
+    ]
+
+def _gate(g: int, pos) -> List[str]:
+    x, y = pos
+    # (wypełnienie, obwódka, tekst); aktywna w obu stronach - czarna z czerwoną obwódką
+    styles = [("#ffffff", "#555555", "#555555"), (PERSONALITY_COLOR, "#555555", "#ffffff"),
+              (DESIGN_COLOR, "#555555", "#ffffff"), (PERSONALITY_COLOR, DESIGN_COLOR, "#ffffff")]
+    return [
+        f'<circle cx="{x:.1f}" cy="{y:.1f}" r="6.5" fill="{fill}" stroke="{stroke}" stroke-width="1.5"/>'
+        f'<text x="{x:.1f}" y="{y + 2.5:.1f}" font-size="7" text-anchor="middle" fill="{text}">{g}</text>'
+        for fill, stroke, text in styles
+    ]
+
+def _center(name: str) -> List[str]:
+    x, y, shape, s = CENTER_LAYOUT[name]
+    points = " ".join(f"{px:.1f},{py:.1f}" for px, py in _polygon(x, y, shape, s))
+    return [
+        f'<polygon points="{points}" fill="{fill}" stroke="#555555" stroke-width="1.5" stroke-linejoin="round">'
+        f'<title>{name}</title></polygon>'
+        for fill in ("#ffffff", CENTER_COLORS[name])
+    ]
+
+def _compile():
+    positions = _gate_positions()
+    channel_parts = []
+    for a, b in CHANNEL_LIST:
+        (ax, ay), (bx, by) = positions[a], positions[b]
+        mid = ((ax + bx) / 2, (ay + by) / 2)
+        channel_parts.append((a, _half_channel(positions[a], mid), b, _half_channel(positions[b], mid)))
+    center_parts = [(CENTER_BITS[c], _center(c)) for c in CENTERS]
+    gate_parts = [(g, _gate(g, positions[g])) for g in range(1, 65)]
+    header = (f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {WIDTH} {HEIGHT}" '
+              f'width="{WIDTH}" height="{HEIGHT}" font-family="sans-serif">'
+              f'<title>Human Design bodygraph</title>')
+    return header, channel_parts, center_parts, gate_parts, "</svg>"
+
+_HEADER, _CHANNEL_PARTS, _CENTER_PARTS, _GATE_PARTS, _FOOTER = _compile()
+
+def _state(personality_mask: int, design_mask: int, g: int) -> int:
+    bit = g - 1
+    return ((personality_mask >> bit) & 1) | (((design_mask >> bit) & 1) << 1)
+
+def render_bodygraph(personality_mask: int, design_mask: int) -> str:
+    """SVG bodygraphu dla masek bramek Personality i Design"""
+    defined_centers = center_mask(channel_mask(personality_mask | design_mask))
+    parts = [_HEADER]
+    for a, half_a, b, half_b in _CHANNEL_PARTS:
+        parts.append(half_a[_state(personality_mask, design_mask, a)])
+        parts.append(half_b[_state(personality_mask, design_mask, b)])
+    for bit, variants in _CENTER_PARTS:
+        parts.append(variants[bool(defined_centers & bit)])
+    for g, variants in _GATE_PARTS:
+        parts.append(variants[_state(personality_mask, design_mask, g)])
+    parts.append(_FOOTER)
+    return "".join(parts)
+
+def activation_masks(activations: Optional[List[Dict]], active_gates: Optional[List[int]] = None) -> Tuple[int, int]:
+    """Maski bramek (Personality, Design) z aktywacji; bez aktywacji - active_gates jako Personality"""
+    if not activations:
+        return gate_mask(active_gates or []), 0
+    personality = gate_mask(a["gate"] for a in activations if a.get("side") == "Personality")
+    design = gate_mask(a["gate"] for a in activations if a.get("side") == "Design")
+    return personality, design
+
+def bodygraph_hash(personality_mask: int, design_mask: int) -> str:
+    payload = f"{TEMPLATE_VERSION}:{personality_mask:x}:{design_mask:x}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+_BODYGRAPH_KEY_RE = re.compile(rf"{re.escape(TEMPLATE_VERSION)}-[0-9a-f]{{32}}")
+
+def bodygraph_key(personality_mask: int, design_mask: int) -> str:
+    """Adres treści SVG: wersja szablonu i maski, np. 1-<16 hex Personality><16 hex Design>"""
+    return f"{TEMPLATE_VERSION}-{personality_mask:016x}{design_mask:016x}"
+
+def parse_bodygraph_key(key: str) -> Optional[Tuple[int, int]]:
+    """Maski z adresu treści (None dla innej wersji szablonu lub klucza innego niż kanoniczny)"""
+    # Tylko postać z bodygraph_key - int(x, 16) przyjąłby też "+", "0x", spacje i wielkie litery,
+    # a ten sam wykres miałby wtedy kilka "immutable" adresów
+    if not _BODYGRAPH_KEY_RE.fullmatch(key):
+        return None
+    masks = key[len(TEMPLATE_VERSION) + 1:]
+    return int(masks[:16], 16), int(masks[16:], 16)
+
+class BodygraphCache:
+    """LRU wyrenderowanych SVG (bajty UTF-8) po hashu masek"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lru: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, personality_mask: int, design_mask: int) -> Tuple[str, bytes]:
+        """(hash treści, SVG) - renderowane tylko przy braku w cache"""
+        key = bodygraph_hash(personality_mask, design_mask)
+        with self._lock:
+            svg = self._lru.get(key)
+            if svg is not None:
+                self._lru.move_to_end(key)
+                self.stats["hits"] += 1
+                return key, svg
+            self.stats["misses"] += 1
+        svg = render_bodygraph(personality_mask, design_mask).encode("utf-8")
+        with self._lock:
+            self._lru[key] = svg
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+        return key, svg
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "size": len(self._lru), "maxsize": self.maxsize}
+
+bodygraph_cache = BodygraphCache(int(os.getenv("HD_BODYGRAPH_CACHE_SIZE", "2048")))
@@ -0,0 +1,149 @@
+# app/modules/hd/chart_cache.py
+"""
+Dwupoziomowy cache wykresów HD:
+  L1 - LRU w pamięci procesu,
+  L2 - tabela hd_chart_cache w bazie.
+Klucz to hash kanonicznych danych urodzenia i wersji silnika (ENGINE_VERSION),
+więc zmiana wersji silnika automatycznie unieważnia stare wpisy.
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Dict, Optional, Union
+
+from sqlalchemy.exc import IntegrityError
+
+from app.core.database import get_db
+from app.modules.hd.hd_calculator import ENGINE_VERSION
+from app.modules.hd.models import HDChartCache
+
+COORD_PRECISION = 4  # ~11 m - wystarcza, bo strefa czasowa i tak się nie zmieni
+
+def _canonical_time(birth_time: str) -> str:
+    parts = [int(p) for p in str(birth_time).strip().split(":")]
+    parts += [0] * (3 - len(parts))
+    return "{:02d}:{:02d}:{:02d}".format(*parts[:3])
+
+def chart_input_hash(birth_date: Union[date, datetime, str], birth_time: str, birth_lat: float,
+                     birth_lng: float, zodiac_system: str = "tropical",
+                     calculation_method: str = "degrees", engine_version: str = ENGINE_VERSION) -> str:
+    """Hash kanonicznych danych wejściowych wykresu"""
+    if isinstance(birth_date, (date, datetime)):
+        birth_date = birth_date.strftime("%Y-%m-%d")
+    canonical = {
+        "date": str(birth_date)[:10],
+        "time": _canonical_time(birth_time),
+        "lat": round(float(birth_lat), COORD_PRECISION),
+        "lng": round(float(birth_lng), COORD_PRECISION),
+        "zodiac_system": (zodiac_system or "tropical").lower(),
+        "calculation_method": (calculation_method or "degrees").lower(),
+        "engine_version": engine_version,
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ChartCache:
+    """LRU w pamięci + trwała tabela hd_chart_cache"""
+
+    def __init__(self, maxsize: int = 1024, persistent: bool = True):
+        self.maxsize = maxsize
+        self.persistent = persistent
+        self._lru: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged = False
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "stores": 0, "purged": 0}
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            chart = self._lru.get(key)
+            if chart is not None:
+                self._lru.move_to_end(key)
+                self.stats["l1_hits"] += 1
+                return copy.deepcopy(chart)
+
+        chart = self._db_get(key) if self.persistent else None
+        with self._lock:
+            if chart is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["l2_hits"] += 1
+            self._remember(key, chart)
+        return copy.deepcopy(chart)
+
+    def put(self, key: str, chart: Dict) -> None:
+        with self._lock:
+            self._remember(key, copy.deepcopy(chart))
+            self.stats["stores"] += 1
+        if self.persistent:
+            self._db_put(key, chart)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._lru.clear()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            lookups = self.stats["l1_hits"] + self.stats["l2_hits"] + self.stats["misses"]
+            hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+            return {
+                **self.stats,
+                "size": len(self._lru),
+                "maxsize": self.maxsize,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "engine_version": ENGINE_VERSION,
+            }
+
+    def _remember(self, key: str, chart: Dict) -> None:
+        self._lru[key] = chart
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def _db_get(self, key: str) -> Optional[Dict]:
+        db = next(get_db())
+        try:
+            self._purge_stale(db)
+            row = db.query(HDChartCache).filter(
+                HDChartCache.cache_key == key,
+                HDChartCache.engine_version == ENGINE_VERSION
+            ).first()
+            return row.chart_data if row else None
+        except Exception as e:
+            print(f"WARN: chart cache read failed: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _db_put(self, key: str, chart: Dict) -> None:
+        db = next(get_db())
+        try:
+            self._purge_stale(db)
+            db.add(HDChartCache(cache_key=key, engine_version=ENGINE_VERSION, chart_data=chart))
+            db.commit()
+        except IntegrityError:
+            # Ten sam wykres zapisany równolegle przez inne żądanie
+            db.rollback()
+        except Exception as e:
+            db.rollback()
+            print(f"WARN: chart cache write failed: {e}")
+        finally:
+            db.close()
+
+    def _purge_stale(self, db) -> None:
+        """Raz na proces usuwa wpisy policzone starszą wersją silnika"""
+        if self._purged:
+            return
+        self._purged = True
+        removed = db.query(HDChartCache).filter(
+            HDChartCache.engine_version != ENGINE_VERSION
+        ).delete(synchronize_session=False)
+        db.commit()
+        if removed:
+            self.stats["purged"] += removed
+            print(f"🧹 Removed {removed} stale HD chart cache entries")
+
+chart_cache = ChartCache(maxsize=int(os.getenv("HD_CHART_CACHE_SIZE", "1024")))
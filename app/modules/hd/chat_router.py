@@ -1,9 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
 from app.core.database import get_db
 from app.modules.hd.models import HDSession
 from app.modules.hd.service_chat import chat_with_hd_ai, stream_chat_with_hd_ai
+from app.modules.hd.service import get_session_definition
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -25,7 +26,7 @@ async def start_hd_chat(
     """
     try:
         # Pobierz dane sesji HD
-        hd_session = db.query(HDSession).filter(HDSession.session_id == request.session_id).first()
+        hd_session = db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(HDSession.session_id == request.session_id).first()
         if not hd_session:
             raise HTTPException(status_code=404, detail="HD session not found")
         
@@ -40,6 +41,7 @@ async def start_hd_chat(
             "defined_channels": hd_session.defined_channels,
             "active_gates": hd_session.active_gates,
             "activations": hd_session.activations,
+            **get_session_definition(hd_session),
             "name": hd_session.name,
             "birth_date": hd_session.birth_date.isoformat() if hd_session.birth_date else None,
             "birth_time": hd_session.birth_time,
@@ -78,7 +80,7 @@ async def send_hd_message(
         session_id = '-'.join(parts[3:])  # Wszystko po trzecim myślniku
         
         # Pobierz dane sesji HD
-        hd_session = db.query(HDSession).filter(HDSession.session_id == session_id).first()
+        hd_session = db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(HDSession.session_id == session_id).first()
         if not hd_session:
             raise HTTPException(status_code=404, detail="HD session not found")
         
@@ -93,6 +95,7 @@ async def send_hd_message(
             "defined_channels": hd_session.defined_channels,
             "active_gates": hd_session.active_gates,
             "activations": hd_session.activations,
+            **get_session_definition(hd_session),
             "name": hd_session.name,
             "birth_date": hd_session.birth_date.isoformat() if hd_session.birth_date else None,
             "birth_time": hd_session.birth_time,
@@ -129,7 +132,7 @@ async def send_hd_message_stream(
         session_id = '-'.join(parts[3:])  # Wszystko po trzecim myślniku
         
         # Pobierz dane sesji HD
-        hd_session = db.query(HDSession).filter(HDSession.session_id == session_id).first()
+        hd_session = db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(HDSession.session_id == session_id).first()
         if not hd_session:
             raise HTTPException(status_code=404, detail="HD session not found")
         
@@ -144,6 +147,7 @@ async def send_hd_message_stream(
             "defined_channels": hd_session.defined_channels,
             "active_gates": hd_session.active_gates,
             "activations": hd_session.activations,
+            **get_session_definition(hd_session),
             "name": hd_session.name,
             "birth_date": hd_session.birth_date.isoformat() if hd_session.birth_date else None,
             "birth_time": hd_session.birth_time,
@@ -0,0 +1,133 @@
+# app/modules/hd/connections.py
+"""
+Wykresy połączeń (connection charts) liczone wyłącznie z masek aktywnych bramek - bez efemeryd.
+
+Dla każdego kanału i pary osób A, B:
+  - electromagnetic - A ma jedną bramkę kanału, B drugą (żadne nie ma całego kanału),
+  - dominance       - jedna osoba ma cały kanał, druga żadnej z jego bramek,
+  - compromise      - jedna osoba ma cały kanał, druga tylko jedną z jego bramek,
+  - companionship   - obie osoby mają cały kanał.
+Macierz N × N dla grupy liczona jest mnożeniem macierzy wskaźników (osoba × kanał).
+
+Wykres grupy (group_chart) to suma bramek wszystkich członków: kanały i centra definiowane przez grupę,
+kanały powstające dopiero w grupie oraz członkowie wnoszący każdą bramkę definiujących kanałów.
+"""
+import copy
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.modules.hd.hd_calculator import (
+    CHANNEL_GATE_MASKS, CHANNEL_LIST, center_mask, centers_from_mask, channel_mask, definition_split,
+    gates_from_mask, iter_bits,
+)
+
+CONNECTION_KINDS = ["electromagnetic", "dominance", "compromise", "companionship"]
+MAX_MATRIX_SIZE = 500
+
+_CH_GATE_A = np.array([1 << (a - 1) for a, _ in CHANNEL_LIST], dtype=np.uint64)
+_CH_GATE_B = np.array([1 << (b - 1) for _, b in CHANNEL_LIST], dtype=np.uint64)
+
+def _channel_name(k: int) -> str:
+    a, b = CHANNEL_LIST[k]
+    return f"{a}-{b}"
+
+def connection_chart(mask_a: int, mask_b: int) -> Dict:
+    """Kanały połączenia dwóch osób według rodzaju oraz definicja wykresu złożonego"""
+    result: Dict[str, List] = {kind: [] for kind in CONNECTION_KINDS}
+    for k, cm in enumerate(CHANNEL_GATE_MASKS):
+        in_a, in_b = mask_a & cm, mask_b & cm
+        full_a, full_b = in_a == cm, in_b == cm
+        if full_a and full_b:
+            result["companionship"].append(_channel_name(k))
+        elif full_a or full_b:
+            holder, other = ("a", in_b) if full_a else ("b", in_a)
+            kind = "dominance" if not other else "compromise"
+            result[kind].append({"channel": _channel_name(k), "defined_by": holder})
+        elif in_a and in_b and (in_a | in_b) == cm:
+            result["electromagnetic"].append(_channel_name(k))
+
+    composite_ch = channel_mask(mask_a | mask_b)
+    result["composite"] = {
+        "defined_centers": sorted(centers_from_mask(center_mask(composite_ch))),
+        "definition": definition_split(composite_ch),
+    }
+    return result
+
+def _indicators(masks: np.ndarray) -> Dict[str, np.ndarray]:
+    """Macierze wskaźników osoba × kanał (int32) dla mnożenia macierzy"""
+    has_a = (masks[:, None] & _CH_GATE_A[None, :]) != 0
+    has_b = (masks[:, None] & _CH_GATE_B[None, :]) != 0
+    return {
+        "full": (has_a & has_b).astype(np.int32),
+        "only_a": (has_a & ~has_b).astype(np.int32),
+        "only_b": (~has_a & has_b).astype(np.int32),
+        "none": (~has_a & ~has_b).astype(np.int32),
+    }
+
+def connection_matrix(masks: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Liczby kanałów każdego rodzaju dla wszystkich par (macierze N × N, symetryczne).
+    Przekątna to połączenie osoby z samą sobą (same companionship).
+    """
+    ind = _indicators(np.asarray(masks, dtype=np.uint64))
+    full, only_a, only_b, none = ind["full"], ind["only_a"], ind["only_b"], ind["none"]
+    partial = only_a + only_b
+    em = only_a @ only_b.T
+    dom = full @ none.T
+    comp = full @ partial.T
+    return {
+        "electromagnetic": em + em.T,
+        "dominance": dom + dom.T,
+        "compromise": comp + comp.T,
+        "companionship": full @ full.T,
+    }
+
+# ---------- Group chart ----------
+def group_hash(members: Dict[str, int]) -> str:
+    """Hash składu grupy (id sesji + maski bramek, niezależny od kolejności)"""
+    payload = ";".join(f"{sid}:{mask:x}" for sid, mask in sorted(members.items()))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@lru_cache(maxsize=256)
+def _group_chart(members: Tuple[Tuple[str, int], ...]) -> Dict:
+    union = 0
+    individual_ch = 0
+    for _, mask in members:
+        union |= mask
+        individual_ch |= channel_mask(mask)
+    group_ch = channel_mask(union)
+
+    channels = []
+    for k in iter_bits(group_ch):
+        a, b = CHANNEL_LIST[k]
+        channels.append({
+            "channel": f"{a}-{b}",
+            "group_only": not (individual_ch >> k) & 1,
+            "contributors": {
+                str(gate): [sid for sid, mask in members if mask >> (gate - 1) & 1] for gate in (a, b)
+            },
+        })
+    gate_counts = {str(g): sum(mask >> (g - 1) & 1 for _, mask in members) for g in sorted(gates_from_mask(union))}
+    return {
+        "members": len(members),
+        "active_gates": sorted(gates_from_mask(union)),
+        "gate_counts": gate_counts,
+        "channels": channels,
+        "group_only_channels": [c["channel"] for c in channels if c["group_only"]],
+        "defined_centers": sorted(centers_from_mask(center_mask(group_ch))),
+        "individually_defined_centers": sorted(centers_from_mask(center_mask(individual_ch))),
+        "definition": definition_split(group_ch),
+    }
+
+def group_chart(members: Dict[str, int]) -> Dict:
+    """Wykres grupy dla {session_id: maska bramek}; wynik pamiętany per skład grupy"""
+    chart = copy.deepcopy(_group_chart(tuple(sorted(members.items()))))
+    chart["group_hash"] = group_hash(members)
+    return chart
+
+def group_cache_stats() -> Dict:
+    info = _group_chart.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
@@ -0,0 +1,130 @@
+# app/modules/hd/engine_recompute.py
+"""
+Przeliczenie zapisanych sesji HD po zmianie silnika (ENGINE_VERSION, np. poprawka GATE_RANGES
+albo logiki compute_type).
+
+Sesje policzone inną (lub nieznaną) wersją silnika czytane są partiami po id, liczone silnikiem
+wsadowym i porównywane z zapisanym wykresem. Przepisywane są tylko sesje, w których podsumowanie
+faktycznie się zmieniło (kolumny wykresu, hash wejścia, wersja; nieaktualne warianty są usuwane).
+Pozostałym jedno UPDATE ... WHERE id IN (...) na partię podbija samą wersję silnika - ich hash wejścia
+zawiera starą wersję, więc pierwszy regenerate przeliczy je jeszcze raz. Przetworzone sesje mają już
+bieżącą wersję, więc przerwane zadanie po prostu uruchamia się ponownie. Na końcu raport: ile typów,
+profili i autorytetów się przesunęło.
+
+Uruchamianie:
+    python -m app.modules.hd.engine_recompute --dry-run      # sam raport różnic, bez zapisu
+    python -m app.modules.hd.engine_recompute --batch-size 500 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Sequence
+
+from sqlalchemy import or_
+from sqlalchemy.orm import undefer
+
+from app.core.database import get_db
+from app.modules.hd.activations_backfill import DEFAULT_BATCH_SIZE, compute_batch, utc_births
+from app.modules.hd.activations_codec import pack_activations
+from app.modules.hd.chart_cache import chart_input_hash
+from app.modules.hd.ephemeris_pool import init_worker
+from app.modules.hd.hd_batch import compute_hd_charts_batch
+from app.modules.hd.hd_calculator import ENGINE_VERSION
+from app.modules.hd.models import HDSession
+from app.modules.hd.service import HumanDesignCalculator, session_fields_from_chart
+
+# Kolumny podsumowania porównywane ze starym wynikiem (aktywacje porównywane osobno, po bramkach i liniach)
+SUMMARY_COLUMNS = (
+    "type", "strategy", "authority", "profile",
+    "sun_gate", "earth_gate", "moon_gate", "north_node_gate", "south_node_gate",
+    "defined_centers", "undefined_centers", "defined_channels", "active_gates",
+    "definition", "bridging_gates",
+)
+REPORTED = ("type", "profile", "authority")
+
+def _recompute_chunk(utc_births: Sequence[datetime], zodiac_system: str,
+                     calculation_method: str) -> List[Dict]:
+    """Kolumny wykresu bieżącym silnikiem dla listy dat UTC - wykonywane także w procesach roboczych"""
+    results = compute_hd_charts_batch(utc_births, zodiac_system=zodiac_system,
+                                      calculation_method=calculation_method)
+    calculator = HumanDesignCalculator()
+    return [session_fields_from_chart(calculator._convert_to_legacy_format(r)) for r in results]
+
+def _activation_gates(rows: List[Dict]) -> List[tuple]:
+    # Długości różnią się szumem float32 - znaczenie mają bramki i linie
+    return [(r["side"], r["planet"], r["gate"], r["line"]) for r in rows]
+
+def diff_session(session: HDSession, fields: Dict) -> Dict:
+    """Kolumny wykresu, których nowa wartość różni się od zapisanej"""
+    changes = {column: fields[column] for column in SUMMARY_COLUMNS if getattr(session, column) != fields[column]}
+    if _activation_gates(session.activations) != _activation_gates(fields["activations"]):
+        changes["activations_packed"] = pack_activations(fields["activations"])
+    return changes
+
+def run_recompute(batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 0, dry_run: bool = False) -> Dict:
+    """Przelicza sesje z nieaktualną wersją silnika; zwraca raport różnic"""
+    stats = {"engine_version": ENGINE_VERSION, "dry_run": dry_run, "last_id": 0,
+             "scanned": 0, "unchanged": 0, "rewritten": 0, "failed": 0}
+    moved = {column: Counter() for column in REPORTED}
+    executor = None
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                       mp_context=multiprocessing.get_context("spawn"))
+    db = next(get_db())
+    try:
+        while True:
+            rows = (db.query(HDSession).options(undefer(HDSession.activations_packed))
+                    .filter(HDSession.id > stats["last_id"],
+                            or_(HDSession.engine_version.is_(None), HDSession.engine_version != ENGINE_VERSION))
+                    .order_by(HDSession.id).limit(batch_size).all())
+            if not rows:
+                break
+            updates, unchanged_ids = [], []
+            for row, fields in compute_batch(utc_births(rows, stats), executor, _recompute_chunk):
+                changes = diff_session(row, fields)
+                if not changes:
+                    stats["unchanged"] += 1
+                    unchanged_ids.append(row.id)
+                    continue
+                for column in REPORTED:
+                    if column in changes:
+                        moved[column][f"{getattr(row, column)} → {changes[column]}"] += 1
+                stats["rewritten"] += 1
+                input_hash = chart_input_hash(row.birth_date, row.birth_time, row.birth_lat, row.birth_lng,
+                                              row.zodiac_system or "tropical", row.calculation_method or "degrees")
+                updates.append({"id": row.id, "engine_version": ENGINE_VERSION, "input_hash": input_hash,
+                                "variants": None, **changes})
+            if not dry_run and (updates or unchanged_ids):
+                if updates:
+                    db.bulk_update_mappings(HDSession, updates)
+                if unchanged_ids:
+                    db.query(HDSession).filter(HDSession.id.in_(unchanged_ids)).update(
+                        {HDSession.engine_version: ENGINE_VERSION}, synchronize_session=False)
+                db.commit()
+            stats["scanned"] += len(rows)
+            stats["last_id"] = rows[-1].id
+            db.expunge_all()
+            print(json.dumps(stats))
+    finally:
+        db.close()
+        if executor:
+            executor.shutdown()
+    stats["moved"] = {column: sum(counter.values()) for column, counter in moved.items()}
+    stats["transitions"] = {column: dict(counter.most_common()) for column, counter in moved.items()}
+    return stats
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Recompute HD sessions computed with an older chart engine")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = in-process)")
+    parser.add_argument("--dry-run", action="store_true", help="report the differences without writing")
+    args = parser.parse_args(argv)
+
+    report = run_recompute(batch_size=args.batch_size, workers=args.workers, dry_run=args.dry_run)
+    print(json.dumps({"done": True, **report}, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# app/modules/hd/ephemeris_pool.py
+"""
+Pula procesów liczących wykresy HD.
+
+Każdy proces roboczy ma własny stan Swiss Ephemeris (tryb sidereal ustawiany raz na wątek,
+zodiak wybierany per wywołanie) i własną tablicę efemeryd, więc równoległe wykresy nie dzielą
+globalnego stanu biblioteki, a przepustowość rośnie z liczbą rdzeni.
+
+Strefa czasowa rozwiązywana jest w procesie głównym (wspólny cache TimezoneResolver),
+do procesu roboczego trafia gotowa nazwa strefy.
+
+HD_EPHEMERIS_WORKERS - liczba procesów (0 = liczenie w procesie serwera, domyślnie),
+HD_EPHEMERIS_START_METHOD - metoda startu procesów (domyślnie spawn),
+HD_EPHEMERIS_TIMEOUT - maksymalny czas jednego wykresu w sekundach.
+"""
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from app.modules.hd.hd_calculator import compute_hd_chart_at, compute_hd_chart_variants, resolve_timezone
+
+DEFAULT_START_METHOD = "spawn"
+DEFAULT_TIMEOUT = 30.0
+
+def init_worker() -> None:
+    """Rozgrzanie procesu roboczego: import silnika i tablicy efemeryd przed pierwszym zadaniem"""
+    from app.modules.hd.ephemeris_table import active_table
+    active_table()
+
+class EphemerisPool:
+    """Leniwie tworzona pula procesów z licznikami zadań"""
+
+    def __init__(self, workers: int, start_method: str = DEFAULT_START_METHOD,
+                 timeout: float = DEFAULT_TIMEOUT):
+        self.workers = workers
+        self.start_method = start_method
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "restarts": 0, "total_ms": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                        initializer=init_worker,
+                    )
+        return self._executor
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+                self.stats["restarts"] += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, **kwargs):
+        """Wykonuje fn(**kwargs) w procesie roboczym; gdy pula padła - tworzy ją od nowa i ponawia raz"""
+        start = time.perf_counter()
+        with self._lock:
+            self.stats["submitted"] += 1
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    result = executor.submit(fn, **kwargs).result(timeout=self.timeout)
+                    break
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    if attempt:
+                        raise
+        except Exception:
+            with self._lock:
+                self.stats["failed"] += 1
+            raise
+        with self._lock:
+            self.stats["completed"] += 1
+            self.stats["total_ms"] += (time.perf_counter() - start) * 1000
+        return result
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "total_ms": round(self.stats["total_ms"], 3),
+                "workers": self.workers,
+                "start_method": self.start_method,
+                "running": self._executor is not None,
+            }
+
+_pool: Optional[EphemerisPool] = None
+_pool_lock = threading.Lock()
+
+def get_ephemeris_pool() -> Optional[EphemerisPool]:
+    """Pula procesu serwera (HD_EPHEMERIS_WORKERS > 0) albo None - liczenie w bieżącym procesie"""
+    global _pool
+    workers = int(os.getenv("HD_EPHEMERIS_WORKERS", "0"))
+    if workers <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EphemerisPool(
+                    workers=workers,
+                    start_method=os.getenv("HD_EPHEMERIS_START_METHOD", DEFAULT_START_METHOD),
+                    timeout=float(os.getenv("HD_EPHEMERIS_TIMEOUT", DEFAULT_TIMEOUT)),
+                )
+                atexit.register(_pool.shutdown)
+    return _pool
+
+def _run_in_pool(fn, kwargs: Dict):
+    pool = get_ephemeris_pool()
+    if pool is None:
+        return fn(**kwargs)
+
+    timezone_ms = 0.0
+    if not kwargs.get("tzname"):
+        tz_start = time.perf_counter()
+        kwargs["tzname"] = resolve_timezone(kwargs["lat"], kwargs["lon"])
+        timezone_ms = (time.perf_counter() - tz_start) * 1000
+    result = pool.run(fn, **kwargs)
+    for chart in (result.values() if fn is compute_hd_chart_variants else [result]):
+        chart.setdefault("timings", {})["timezone_ms"] = round(timezone_ms, 3)
+    return result
+
+def run_chart(**kwargs) -> Dict:
+    """compute_hd_chart_at w puli procesów (jeśli skonfigurowana) z tymi samymi argumentami i wynikiem"""
+    return _run_in_pool(compute_hd_chart_at, kwargs)
+
+def run_chart_variants(**kwargs) -> Dict[str, Dict]:
+    """compute_hd_chart_variants w puli procesów - wszystkie warianty jednym zadaniem"""
+    return _run_in_pool(compute_hd_chart_variants, kwargs)
+
+def pool_stats() -> Dict:
+    pool = get_ephemeris_pool()
+    return pool.snapshot() if pool else {"workers": 0, "running": False}
@@ -0,0 +1,199 @@
+# app/modules/hd/ephemeris_table.py
+"""
+Prekomputowana tablica efemeryd (float32, memory-mapped) z interpolacją.
+
+Tablica przechowuje długości tropikalne ciał z EPHEMERIS_BODIES w stałym kroku czasu.
+Pozycja jest interpolowana wielomianem Lagrange'a 3. stopnia z 4 sąsiednich próbek;
+jeśli wynik leży bliżej granicy linii niż `tolerance`, wartość jest doliczana w Swiss Ephemeris.
+Granice sprawdzane są w każdym układzie, w którym wynik zostanie odczytany (tropical i/lub sidereal).
+
+Użycie:
+    python -m app.modules.hd.ephemeris_table build --start 1900 --end 2100 --step 0.25
+    python -m app.modules.hd.ephemeris_table report --samples 20000
+    python -m app.modules.hd.ephemeris_table report --samples 20000 --zodiac sidereal
+
+Backend włącza się zmienną środowiskową HD_EPHEMERIS_TABLE (ścieżka bez rozszerzenia).
+"""
+import argparse
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from app.modules.hd.hd_calculator import HAVE_SW, EPHEMERIS_BODIES, GATE_INDEX, ZODIAC_SYSTEMS, _body_ids, zodiac_offset
+
+if HAVE_SW:
+    import swisseph as swe
+
+DEFAULT_TABLE_PATH = Path(__file__).resolve().parents[3] / "data" / "ephemeris" / "hd_ephemeris"
+DEFAULT_TOLERANCE = 0.0005  # stopnie od granicy linii, poniżej których liczymy dokładnie
+
+class EphemerisTable:
+    """Tablica długości (próbki × ciała) z metadanymi start_jd / step"""
+
+    def __init__(self, path: Path, tolerance: float = DEFAULT_TOLERANCE):
+        path = Path(path)
+        meta = json.loads(path.with_suffix(".json").read_text(encoding="utf-8"))
+        if meta["bodies"] != EPHEMERIS_BODIES:
+            raise ValueError(f"Tablica {path} ma inne ciała niż EPHEMERIS_BODIES")
+        self.path = path
+        self.start_jd = float(meta["start_jd"])
+        self.step = float(meta["step"])
+        self.data = np.load(path.with_suffix(".npy"), mmap_mode="r")
+        self.end_jd = self.start_jd + (self.data.shape[0] - 1) * self.step
+        self.tolerance = tolerance
+        self.refined = 0
+        self.lookups = 0
+
+    def covers(self, jd) -> bool:
+        jd = np.asarray(jd, dtype=np.float64)
+        # Interpolacja potrzebuje próbki przed i dwóch po przedziale
+        return bool(np.all(jd >= self.start_jd + self.step) & np.all(jd < self.end_jd - 2 * self.step))
+
+    def interpolate(self, jd) -> np.ndarray:
+        """Interpolowane długości (N × ciała) bez doliczania w Swiss Ephemeris"""
+        jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+        pos = (jd - self.start_jd) / self.step
+        i1 = np.floor(pos).astype(np.int64)
+        u = (pos - i1)[:, None]
+        idx = i1[:, None] + np.arange(-1, 3)[None, :]
+        y = np.asarray(self.data[idx.ravel()], dtype=np.float64).reshape(len(jd), 4, -1)
+        # Rozwinięcie kątów względem pierwszej próbki (przejście przez 0°)
+        y = y[:, :1, :] + np.mod(y - y[:, :1, :] + 180.0, 360.0) - 180.0
+        w0 = -u * (u - 1) * (u - 2) / 6.0
+        w1 = (u + 1) * (u - 1) * (u - 2) / 2.0
+        w2 = -(u + 1) * u * (u - 2) / 2.0
+        w3 = (u + 1) * u * (u - 1) / 6.0
+        out = w0 * y[:, 0] + w1 * y[:, 1] + w2 * y[:, 2] + w3 * y[:, 3]
+        return np.mod(out, 360.0)
+
+    def longitudes(self, jd, offsets: Sequence = (0.0,)) -> np.ndarray:
+        """
+        Długości tropikalne (N × ciała) z doliczeniem w Swiss Ephemeris przy granicach linii.
+        offsets: przesunięcia układów, w których wynik będzie odczytany (skalar albo wartość na wiersz,
+        np. ajanamsa dla sidereal) - doliczane jest ciało bliskie granicy w którymkolwiek z nich.
+        """
+        jd = np.atleast_1d(np.asarray(jd, dtype=np.float64))
+        out = self.interpolate(jd)
+        self.lookups += out.size
+        if HAVE_SW:
+            near = np.zeros(out.shape, dtype=bool)
+            for offset in offsets:
+                shift = np.asarray(offset, dtype=np.float64).reshape(-1, 1)
+                near |= GATE_INDEX.line_boundary_distance(out - shift) < self.tolerance
+            near = np.argwhere(near)
+            ids = _body_ids()
+            for row, col in near:
+                out[row, col] = swe.calc_ut(float(jd[row]), ids[EPHEMERIS_BODIES[col]])[0][0] % 360.0
+            self.refined += len(near)
+        return out
+
+_table: Optional[EphemerisTable] = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+def active_table() -> Optional[EphemerisTable]:
+    """Tablica wskazana przez HD_EPHEMERIS_TABLE (ładowana raz) albo None"""
+    global _table, _table_loaded
+    if _table_loaded:
+        return _table
+    with _table_lock:
+        if not _table_loaded:
+            path = os.getenv("HD_EPHEMERIS_TABLE")
+            if path:
+                try:
+                    tolerance = float(os.getenv("HD_EPHEMERIS_TOLERANCE", DEFAULT_TOLERANCE))
+                    _table = EphemerisTable(Path(path), tolerance=tolerance)
+                    print(f"✅ Ephemeris table loaded: {path} ({_table.data.shape[0]} samples)")
+                except Exception as e:
+                    print(f"WARN: could not load ephemeris table {path}: {e}")
+                    _table = None
+            _table_loaded = True
+    return _table
+
+def table_stats() -> Dict:
+    table = active_table()
+    if table is None:
+        return {"enabled": False}
+    return {"enabled": True, "path": str(table.path), "lookups": table.lookups,
+            "refined": table.refined, "tolerance": table.tolerance}
+
+# ---------- CLI ----------
+def build_table(start_year: int, end_year: int, step: float, out: Path) -> None:
+    """Generuje tablicę efemeryd dla lat [start_year, end_year]"""
+    if not HAVE_SW:
+        raise RuntimeError("Brak pyswisseph - nie można wygenerować tablicy")
+    start_jd = swe.julday(start_year, 1, 1, 0.0) - 2 * step
+    end_jd = swe.julday(end_year + 1, 1, 1, 0.0) + 3 * step
+    n = int(np.ceil((end_jd - start_jd) / step)) + 1
+    ids = _body_ids()
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    data = np.lib.format.open_memmap(out.with_suffix(".npy"), mode="w+", dtype=np.float32,
+                                     shape=(n, len(EPHEMERIS_BODIES)))
+    for i in range(n):
+        jd = start_jd + i * step
+        data[i] = [swe.calc_ut(jd, ids[name])[0][0] % 360.0 for name in EPHEMERIS_BODIES]
+        if i % 50000 == 0:
+            print(f"  {i}/{n}")
+    data.flush()
+    out.with_suffix(".json").write_text(json.dumps({
+        "start_jd": start_jd, "step": step, "bodies": EPHEMERIS_BODIES,
+        "years": [start_year, end_year], "zodiac": "tropical",
+    }), encoding="utf-8")
+    print(f"✅ Wrote {n} samples × {len(EPHEMERIS_BODIES)} bodies to {out.with_suffix('.npy')}")
+
+def accuracy_report(path: Path, samples: int, tolerance: float, seed: int = 0,
+                    zodiac_system: str = "tropical") -> Dict:
+    """Porównanie tablicy ze Swiss Ephemeris na losowych chwilach z zakresu tablicy (bramki i linie w danym zodiaku)"""
+    table = EphemerisTable(path, tolerance=tolerance)
+    rng = np.random.default_rng(seed)
+    jd = rng.uniform(table.start_jd + table.step, table.end_jd - 2 * table.step, samples)
+    ids = _body_ids()
+    offset = np.array([zodiac_offset(float(t), zodiac_system) for t in jd])[:, None]
+    exact = np.array([[swe.calc_ut(float(t), ids[name])[0][0] % 360.0 for name in EPHEMERIS_BODIES]
+                      for t in jd]) - offset
+    interp = table.interpolate(jd) - offset
+    refined = table.longitudes(jd, (offset[:, 0],)) - offset
+    err = np.abs(np.mod(interp - exact + 180.0, 360.0) - 180.0)
+    exact_act = GATE_INDEX.lookup_array(exact)
+    report = {"samples": samples, "tolerance": tolerance, "zodiac_system": zodiac_system,
+              "refined": table.refined, "bodies": {}}
+    for col, name in enumerate(EPHEMERIS_BODIES):
+        for label, values in (("interpolated", interp), ("refined", refined)):
+            act = GATE_INDEX.lookup_array(values[:, col])
+            report["bodies"].setdefault(name, {})[f"line_mismatches_{label}"] = int(np.sum(
+                (act.gate != exact_act.gate[:, col]) | (act.line != exact_act.line[:, col])))
+        report["bodies"][name].update({
+            "max_err_deg": float(err[:, col].max()),
+            "p99_err_deg": float(np.percentile(err[:, col], 99)),
+        })
+    return report
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="HD ephemeris table tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="generate the table")
+    build.add_argument("--start", type=int, default=1900)
+    build.add_argument("--end", type=int, default=2100)
+    build.add_argument("--step", type=float, default=0.25, help="sample step in days")
+    build.add_argument("--out", type=Path, default=DEFAULT_TABLE_PATH)
+    report = sub.add_parser("report", help="accuracy report against swisseph")
+    report.add_argument("--table", type=Path, default=DEFAULT_TABLE_PATH)
+    report.add_argument("--samples", type=int, default=20000)
+    report.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    report.add_argument("--zodiac", choices=ZODIAC_SYSTEMS, default="tropical",
+                        help="frame in which gates and lines are compared")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_table(args.start, args.end, args.step, args.out)
+    else:
+        print(json.dumps(accuracy_report(args.table, args.samples, args.tolerance,
+                                         zodiac_system=args.zodiac), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# app/modules/hd/gate_catalog.py
+"""
+Katalog opisów bramek HD serwowany jako gotowe bajty.
+
+Pakiet językowy to moduł app.modules.hd.data.gates_<język> ze słownikiem GATES_<JĘZYK>
+(np. gates_pl.GATES_PL). Pakiet ładowany jest leniwie przy pierwszym żądaniu danego języka,
+a cały katalog i każda bramka kodowane są wtedy raz do JSON (w tym samym formacie co JSONResponse)
+oraz do gzip, z mocnym ETagiem z hasha treści. Żądanie to już tylko wybór gotowych bajtów.
+Nowy język to nowy moduł danych - bez kosztu przy starcie aplikacji.
+"""
+import gzip
+import hashlib
+import importlib
+import json
+import re
+import threading
+from typing import Dict, NamedTuple, Optional
+
+DATA_PACKAGE = "app.modules.hd.data"
+_LANGUAGE_RE = re.compile(r"^[a-z]{2}$")
+
+class EncodedJSON(NamedTuple):
+    body: bytes
+    gzipped: bytes
+    etag: str
+    gzip_etag: str  # osobny mocny ETag dla reprezentacji gzip
+
+def encode_json(data) -> EncodedJSON:
+    body = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return EncodedJSON(body, gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}"', f'"{digest}-gzip"')
+
+class LanguagePack(NamedTuple):
+    catalog: EncodedJSON
+    gates: Dict[int, EncodedJSON]
+
+def _load_gates(language: str) -> Optional[Dict]:
+    try:
+        module = importlib.import_module(f"{DATA_PACKAGE}.gates_{language}")
+    except ModuleNotFoundError:
+        return None
+    return getattr(module, f"GATES_{language.upper()}", None)
+
+class GateCatalog:
+    """Leniwie ładowane, wstępnie zakodowane pakiety językowe bramek"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._packs: Dict[str, Optional[LanguagePack]] = {}
+
+    def pack(self, language: str) -> Optional[LanguagePack]:
+        """Pakiet języka (None, gdy języka nie ma)"""
+        if not _LANGUAGE_RE.match(language or ""):
+            return None
+        if language in self._packs:
+            return self._packs[language]
+        with self._lock:
+            if language not in self._packs:
+                gates = _load_gates(language)
+                self._packs[language] = LanguagePack(
+                    catalog=encode_json(gates),
+                    gates={number: encode_json(gate) for number, gate in gates.items()},
+                ) if gates else None
+            return self._packs[language]
+
+    def catalog(self, language: str) -> Optional[EncodedJSON]:
+        pack = self.pack(language)
+        return pack.catalog if pack else None
+
+    def gate(self, language: str, gate_number: int) -> Optional[EncodedJSON]:
+        pack = self.pack(language)
+        return pack.gates.get(gate_number) if pack else None
+
+    def clear(self) -> None:
+        """Zapomina załadowane pakiety (kolejne żądanie załaduje i zakoduje je od nowa)"""
+        with self._lock:
+            self._packs.clear()
+
+    def snapshot(self) -> Dict:
+        return {
+            language: {"gates": len(pack.gates), "bytes": len(pack.catalog.body),
+                       "gzip_bytes": len(pack.catalog.gzipped)}
+            for language, pack in self._packs.items() if pack
+        }
+
+gate_catalog = GateCatalog()
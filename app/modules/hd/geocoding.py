@@ -0,0 +1,391 @@
+# app/modules/hd/geocoding.py
+"""
+Geokodowanie miejsc urodzenia.
+
+Geocoder to wspólny interfejs (geocode / reverse / search) z implementacjami:
+  - GazetteerGeocoder - lokalny indeks miast z data/cities.tsv (bez sieci, < 1 ms,
+                        także podpowiedzi po prefiksie nazwy - complete()),
+  - NominatimGeocoder - zapytania do OpenStreetMap Nominatim,
+  - FallbackGeocoder  - łańcuch: pierwszy geocoder, który zwróci wynik.
+
+Tryb wybiera zmienna HD_GEOCODER: "local", "local+nominatim" (domyślnie) lub "nominatim".
+Plik z miastami buduje się z dumpów GeoNames:
+    python -m app.modules.hd.geocoding build --source cities15000.txt --out app/modules/hd/data/cities.tsv
+"""
+import argparse
+import math
+import os
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+GAZETTEER_PATH = Path(__file__).resolve().parent / "data" / "cities.tsv"
+GAZETTEER_HEADER = "# Source: GeoNames (https://www.geonames.org), CC BY 4.0"
+
+# Litery, których NFKD nie rozkłada na znak bazowy + diakrytyk
+_FOLD_EXTRA = str.maketrans({"ł": "l", "Ł": "l", "ø": "o", "Ø": "o", "đ": "d", "Đ": "d",
+                             "ß": "ss", "æ": "ae", "Æ": "ae", "œ": "oe", "Œ": "oe", "ı": "i"})
+
+def fold_name(text: str) -> str:
+    """Normalizacja nazwy do wyszukiwania: małe litery, bez diakrytyków i zbędnych spacji"""
+    text = unicodedata.normalize("NFKD", text.translate(_FOLD_EXTRA))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    return " ".join(text.replace("-", " ").split())
+
+@dataclass(frozen=True)
+class Place:
+    """Wynik geokodowania"""
+    name: str
+    country: str
+    lat: float
+    lng: float
+    country_code: str = ""
+    population: int = 0
+    timezone: Optional[str] = None
+    full_address: Optional[str] = None
+
+    @property
+    def display_name(self) -> str:
+        return f"{self.name}, {self.country}" if self.country else self.name
+
+    def to_dict(self) -> Dict:
+        """Format odpowiedzi /hd/cities/autocomplete"""
+        return {
+            "display_name": self.display_name,
+            "city": self.name,
+            "country": self.country,
+            "lat": self.lat,
+            "lng": self.lng,
+            "full_address": self.full_address or self.display_name,
+        }
+
+class Geocoder(ABC):
+    """Interfejs geokodera (niekompletny backend nie da się utworzyć)"""
+
+    @abstractmethod
+    def geocode(self, query: str) -> Optional[Place]:
+        ...
+
+    @abstractmethod
+    def reverse(self, lat: float, lng: float) -> Optional[Place]:
+        ...
+
+    @abstractmethod
+    def search(self, query: str, limit: int = 10) -> List[Place]:
+        ...
+
+# ---------- Local gazetteer ----------
+def _haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 6371.0 * 2 * math.asin(min(1.0, math.sqrt(a)))
+
+class GazetteerGeocoder(Geocoder):
+    """
+    Lokalny indeks miast. Dane kolumnowe (listy / array) + indeksy:
+    znormalizowana nazwa → id (po populacji malejąco), posortowana tablica nazw do wyszukiwania
+    po prefiksie (bisect) oraz siatka 1° → id dla wyszukiwania odwrotnego.
+    """
+
+    SHORT_PREFIX = 2        # rankingi dla krótkich prefiksów (duże zakresy) są zapamiętywane
+    ALTERNATE_WEIGHT = 0.1  # trafienie tylko po nazwie alternatywnej liczy się jak 10% populacji
+
+    def __init__(self, path: Path = GAZETTEER_PATH, reverse_max_km: float = 50.0):
+        self.path = Path(path)
+        self.reverse_max_km = reverse_max_km
+        self.names: List[str] = []
+        self.folded_names: List[str] = []
+        self.alternates: List[Tuple[str, ...]] = []
+        self.country_codes: List[str] = []
+        self.countries: List[str] = []
+        self.timezones: List[str] = []
+        self.lats = array("d")
+        self.lngs = array("d")
+        self.populations = array("q")
+        self._by_name: Dict[str, List[int]] = {}
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._keys: List[str] = []
+        self._key_ids: List[List[int]] = []
+        self._short_prefix_cache: Dict[str, List[int]] = {}
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _load(self) -> None:
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                _, name, cc, country, lat, lng, population, tz, alternates = line.rstrip("\n").split("\t")
+                i = len(self.names)
+                self.names.append(name)
+                self.folded_names.append(fold_name(name))
+                self.alternates.append(tuple(a for a in alternates.split("|") if a))
+                self.country_codes.append(cc)
+                self.countries.append(country)
+                self.lats.append(float(lat))
+                self.lngs.append(float(lng))
+                self.populations.append(int(population or 0))
+                self.timezones.append(tz)
+                for key in {fold_name(n) for n in (name, *self.alternates[i])}:
+                    self._by_name.setdefault(key, []).append(i)
+                self._grid.setdefault(self._cell(float(lat), float(lng)), []).append(i)
+        for ids in self._by_name.values():
+            ids.sort(key=lambda i: -self.populations[i])
+        self._keys = sorted(self._by_name)
+        self._key_ids = [self._by_name[key] for key in self._keys]
+
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat)), int(math.floor(lng))
+
+    def place(self, i: int) -> Place:
+        return Place(
+            name=self.names[i], country=self.countries[i], lat=self.lats[i], lng=self.lngs[i],
+            country_code=self.country_codes[i], population=self.populations[i],
+            timezone=self.timezones[i] or None,
+        )
+
+    def _matches_country(self, i: int, country_query: str) -> bool:
+        return (fold_name(self.countries[i]).startswith(country_query)
+                or self.country_codes[i].lower() == country_query)
+
+    @staticmethod
+    def _split_query(query: str) -> Tuple[str, str]:
+        """"Kraków, Polska" → ("krakow", "polska")"""
+        city, _, rest = query.partition(",")
+        return fold_name(city), fold_name(rest.split(",")[-1]) if rest.strip() else ""
+
+    def _candidates(self, query: str) -> List[int]:
+        key, country_query = self._split_query(query)
+        ids = self._by_name.get(key, [])
+        if country_query:
+            ids = [i for i in ids if self._matches_country(i, country_query)]
+        return ids
+
+    def _prefix_ids(self, prefix: str) -> List[int]:
+        """Id miast, których dowolna nazwa zaczyna się od prefiksu (ranking po populacji)"""
+        cached = self._short_prefix_cache.get(prefix)
+        if cached is not None:
+            return cached
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\uffff", lo)
+        ids = list({i for ids in self._key_ids[lo:hi] for i in ids})
+        ids.sort(key=lambda i: -self.populations[i] * (
+            1.0 if self.folded_names[i].startswith(prefix) else self.ALTERNATE_WEIGHT))
+        if len(prefix) <= self.SHORT_PREFIX:
+            self._short_prefix_cache[prefix] = ids
+        return ids
+
+    def complete(self, query: str, limit: int = 10) -> List[Place]:
+        """Podpowiedzi dla wpisywanego tekstu ("kra", "Krak, Pol"), największe miasta najpierw"""
+        prefix, country_query = self._split_query(query)
+        if not prefix:
+            return []
+        ids = self._prefix_ids(prefix)
+        if country_query:
+            ids = [i for i in ids if self._matches_country(i, country_query)]
+        typed = query.partition(",")[0].strip().lower()
+        if typed != prefix:
+            # Wpisane polskie znaki ("Łó") - najpierw nazwy zgodne co do diakrytyków
+            exact = [i for i in ids if self.names[i].lower().startswith(typed)]
+            ids = exact + [i for i in ids if not self.names[i].lower().startswith(typed)]
+        return [self.place(i) for i in ids[:limit]]
+
+    def geocode(self, query: str) -> Optional[Place]:
+        ids = self._candidates(query)
+        return self.place(ids[0]) if ids else None
+
+    def search(self, query: str, limit: int = 10) -> List[Place]:
+        return [self.place(i) for i in self._candidates(query)[:limit]]
+
+    def reverse(self, lat: float, lng: float) -> Optional[Place]:
+        cy, cx = self._cell(lat, lng)
+        best, best_km = None, self.reverse_max_km
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                x = (cx + dx + 180) % 360 - 180
+                for i in self._grid.get((cy + dy, x), ()):
+                    km = _haversine_km(lat, lng, self.lats[i], self.lngs[i])
+                    if km < best_km:
+                        best, best_km = i, km
+        return self.place(best) if best is not None else None
+
+# ---------- Nominatim ----------
+class NominatimGeocoder(Geocoder):
+    """OpenStreetMap Nominatim (sieć); strefę czasową uzupełnia wywołujący"""
+
+    def __init__(self, user_agent: str = "hd_backend", timeout: int = 10, language: str = "pl"):
+        from geopy.geocoders import Nominatim
+        self._client = Nominatim(user_agent=user_agent, timeout=timeout)
+        self.language = language
+
+    @staticmethod
+    def _to_place(location) -> Place:
+        address = location.raw.get("display_name", "") or location.address or ""
+        parts = address.split(", ")
+        return Place(
+            name=parts[0] if parts else "",
+            country=parts[-1] if len(parts) > 1 else "",
+            lat=location.latitude,
+            lng=location.longitude,
+            full_address=address,
+        )
+
+    def geocode(self, query: str) -> Optional[Place]:
+        location = self._client.geocode(query, addressdetails=True, language=self.language)
+        return self._to_place(location) if location else None
+
+    def reverse(self, lat: float, lng: float) -> Optional[Place]:
+        location = self._client.reverse(f"{lat}, {lng}", language=self.language)
+        return self._to_place(location) if location else None
+
+    def search(self, query: str, limit: int = 10) -> List[Place]:
+        results = self._client.geocode(query, exactly_one=False, limit=limit,
+                                       language=self.language, addressdetails=True)
+        return [self._to_place(location) for location in (results or [])]
+
+class FallbackGeocoder(Geocoder):
+    """Pyta kolejne geokodery, aż któryś zwróci wynik (błędy sieci są pomijane)"""
+
+    def __init__(self, *geocoders: Geocoder):
+        self.geocoders = geocoders
+
+    def _first(self, method: str, *args):
+        for geocoder in self.geocoders:
+            try:
+                result = getattr(geocoder, method)(*args)
+            except Exception as e:
+                print(f"WARN: {type(geocoder).__name__}.{method} failed: {e}")
+                continue
+            if result:
+                return result
+        return None
+
+    def geocode(self, query: str) -> Optional[Place]:
+        return self._first("geocode", query)
+
+    def reverse(self, lat: float, lng: float) -> Optional[Place]:
+        return self._first("reverse", lat, lng)
+
+    def search(self, query: str, limit: int = 10) -> List[Place]:
+        return self._first("search", query, limit) or []
+
+_geocoder: Optional[Geocoder] = None
+_gazetteer: Optional[GazetteerGeocoder] = None
+_gazetteer_loaded = False
+_geocoder_lock = threading.Lock()
+
+def local_gazetteer() -> Optional[GazetteerGeocoder]:
+    """Lokalny indeks miast (ładowany raz na proces) albo None, gdy brak pliku"""
+    global _gazetteer, _gazetteer_loaded
+    if _gazetteer_loaded:
+        return _gazetteer
+    with _geocoder_lock:
+        if not _gazetteer_loaded:
+            try:
+                _gazetteer = GazetteerGeocoder()
+                print(f"✅ City gazetteer loaded: {len(_gazetteer)} places")
+            except OSError as e:
+                print(f"WARN: could not load city gazetteer: {e}")
+                _gazetteer = None
+            _gazetteer_loaded = True
+    return _gazetteer
+
+def get_geocoder() -> Geocoder:
+    """Geokoder procesu, budowany raz według HD_GEOCODER"""
+    global _geocoder
+    if _geocoder is None:
+        mode = os.getenv("HD_GEOCODER", "local+nominatim")
+        gazetteer = local_gazetteer() if mode != "nominatim" else None
+        with _geocoder_lock:
+            if _geocoder is None:
+                if gazetteer is None:
+                    _geocoder = NominatimGeocoder()
+                elif mode == "local":
+                    _geocoder = gazetteer
+                else:
+                    _geocoder = FallbackGeocoder(gazetteer, NominatimGeocoder())
+    return _geocoder
+
+# ---------- Builder (GeoNames → cities.tsv) ----------
+# Nazwy, dla których GeoNames podaje wersję angielską zamiast polskiej
+POLISH_NAME_OVERRIDES = {"Warsaw": "Warszawa"}
+_POLISH_LETTERS = set("ąćęłńśźżĄĆĘŁŃŚŹŻ")
+
+def _is_latin(text: str) -> bool:
+    return all(ord(ch) < 0x250 or unicodedata.combining(ch) for ch in text)
+
+def _alternates_limit(population: int, base: int) -> int:
+    """Duże miasta mają więcej egzonimów wartych wyszukiwania (Londyn, Monachium...)"""
+    if population >= 1_000_000:
+        return base * 3
+    return base if population >= 100_000 else max(base // 2, 1)
+
+def _pick_alternates(name: str, geonames_name: str, alternates: Iterable[str], limit: int) -> List[str]:
+    """Alternatywne nazwy w alfabecie łacińskim: nazwa GeoNames, potem te z polskimi znakami"""
+    seen = {fold_name(name)}
+    picked = []
+    ordered = sorted(alternates, key=lambda a: not (_POLISH_LETTERS & set(a)))
+    for alt in [geonames_name] + ordered:
+        key = fold_name(alt)
+        if len(alt) < 3 or alt.isupper() or not _is_latin(alt) or key in seen:
+            continue
+        seen.add(key)
+        picked.append(alt)
+    return picked[:limit]
+
+def build_gazetteer(sources: List[Path], out: Path, min_population: int,
+                    full_countries: List[str], alternates_limit: int) -> int:
+    """Buduje cities.tsv z plików GeoNames (format cities*.txt / allCountries.txt)"""
+    from app.modules.hd.data.countries_pl import COUNTRIES_PL
+
+    rows: Dict[str, List[str]] = {}
+    for source in sources:
+        with open(source, encoding="utf-8") as f:
+            for line in f:
+                cols = line.rstrip("\n").split("\t")
+                if len(cols) < 19 or cols[6] != "P":
+                    continue
+                geoname_id, name, cc, population = cols[0], cols[1], cols[8], int(cols[14] or 0)
+                if not (cc in full_countries or population >= min_population or cols[7] == "PPLC"):
+                    continue
+                if cc == "PL":
+                    name = POLISH_NAME_OVERRIDES.get(name, name)
+                alternates = _pick_alternates(name, cols[1], [a for a in cols[3].split(",") if a],
+                                              _alternates_limit(population, alternates_limit))
+                rows[geoname_id] = [geoname_id, name, cc, COUNTRIES_PL.get(cc, cc), cols[4], cols[5],
+                                    str(population), cols[17], "|".join(alternates)]
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(GAZETTEER_HEADER + "\n")
+        f.write("# geonameid\tname\tcountry_code\tcountry\tlat\tlng\tpopulation\ttimezone\talternates\n")
+        for row in sorted(rows.values(), key=lambda r: -int(r[6])):
+            f.write("\t".join(row) + "\n")
+    return len(rows)
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="HD gazetteer tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build cities.tsv from GeoNames dumps")
+    build.add_argument("--source", type=Path, action="append", required=True)
+    build.add_argument("--out", type=Path, default=GAZETTEER_PATH)
+    build.add_argument("--min-population", type=int, default=100000)
+    build.add_argument("--full-country", action="append", default=["PL"],
+                       help="countries included regardless of population")
+    build.add_argument("--alternates", type=int, default=12, help="max alternate names per place")
+    args = parser.parse_args(argv)
+
+    count = build_gazetteer(args.source, args.out, args.min_population, args.full_country, args.alternates)
+    print(f"✅ Wrote {count} places to {args.out}")
+
+if __name__ == "__main__":
+    main()
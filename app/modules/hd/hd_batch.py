@@ -0,0 +1,159 @@
+# app/modules/hd/hd_batch.py
+"""
+Wsadowe obliczanie wykresów Human Design dla wielu dat urodzenia naraz.
+Pozycje Personality i Design liczone są w jednym przebiegu do tablic NumPy,
+a bramki, kanały i centra wyznaczane są na maskach bitowych (uint64) operacjami tablicowymi.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
+
+from app.modules.hd.hd_calculator import (
+    HAVE_SW, CHANNEL_GATE_MASKS, CHANNEL_LIST, EPHEMERIS_BODIES, ACTIVATION_BODIES, GATE_INDEX,
+    _body_ids, activation_row, build_chart_result, center_mask, centers_from_mask, channels_from_mask,
+    chart_input_info, compute_authority, design_julday_solar_arc, gates_from_mask,
+    type_for_channel_mask, zodiac_offset,
+)
+from app.modules.hd.ephemeris_table import active_table
+
+if HAVE_SW:
+    import swisseph as swe
+
+# Maski kanałów jako uint64 do operacji na całych tablicach bramek
+_CH_GATE_MASKS = np.array(CHANNEL_GATE_MASKS, dtype=np.uint64)
+_CH_BITS = np.uint64(1) << np.arange(len(CHANNEL_LIST), dtype=np.uint64)
+
+_UNIX_EPOCH_JD = 2440587.5
+
+def julday_array(dts_utc: Sequence[datetime]) -> np.ndarray:
+    """Julian Day (UT) dla listy dat UTC (naiwne daty traktowane jako UTC)"""
+    ts = [
+        (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+        for dt in dts_utc
+    ]
+    return np.asarray(ts, dtype=np.float64) / 86400.0 + _UNIX_EPOCH_JD
+
+def _calc_longitude(jd: float, body: int, name: str) -> float:
+    """Długość tropikalna ciała; błąd Swiss Ephemeris (np. brak pliku .se1) przerywa obliczenie"""
+    xx, ret = swe.calc_ut(jd, body)
+    if ret < 0:
+        raise RuntimeError(f"Swiss Ephemeris nie policzył pozycji {name} (JD {jd})")
+    return xx[0]
+
+def calc_positions_array(jd: np.ndarray, zodiac_system: str = "tropical") -> np.ndarray:
+    """Długości ekliptyczne (N × 13) w kolejności ACTIVATION_BODIES"""
+    out = np.empty((len(jd), len(ACTIVATION_BODIES)), dtype=np.float64)
+    offsets = np.array([zodiac_offset(float(t), zodiac_system) for t in jd])
+    table = active_table()
+    if table is not None and table.covers(jd):
+        out[:, :len(EPHEMERIS_BODIES)] = table.longitudes(jd, (offsets,))
+    else:
+        ids = _body_ids()
+        for col, name in enumerate(EPHEMERIS_BODIES):
+            out[:, col] = [_calc_longitude(float(t), ids[name], name) for t in jd]
+    if zodiac_system == "sidereal":
+        out[:, :len(EPHEMERIS_BODIES)] -= offsets[:, None]
+    return _add_opposites(out)
+
+def _add_opposites(out: np.ndarray) -> np.ndarray:
+    out[:, len(EPHEMERIS_BODIES)] = out[:, 0] + 180.0       # Earth
+    out[:, len(EPHEMERIS_BODIES) + 1] = out[:, 10] + 180.0  # South Node
+    return np.mod(out, 360.0)
+
+def design_julday_array(jd_birth: np.ndarray, arc_deg: float = 88.0) -> np.ndarray:
+    """Czas Design (-88° łuku Słońca) dla wszystkich rekordów (solver Newtona z pamięcią wyników)"""
+    return np.array([design_julday_solar_arc(float(jd), arc_deg) for jd in jd_birth], dtype=np.float64)
+
+def gate_masks_array(gates: np.ndarray) -> np.ndarray:
+    """Maska bramek (uint64, bit g-1) dla każdego wiersza macierzy bramek (N × K)"""
+    bits = np.where(gates > 0, np.uint64(1) << (np.clip(gates, 1, 64) - 1).astype(np.uint64), np.uint64(0))
+    return np.bitwise_or.reduce(bits, axis=1)
+
+def channel_masks_array(gate_masks: np.ndarray) -> np.ndarray:
+    """Maski zdefiniowanych kanałów (uint64) dla tablicy masek bramek"""
+    defined = (gate_masks[:, None] & _CH_GATE_MASKS[None, :]) == _CH_GATE_MASKS[None, :]
+    return np.bitwise_or.reduce(np.where(defined, _CH_BITS[None, :], np.uint64(0)), axis=1)
+
+def touched_channel_masks_array(gate_masks: np.ndarray) -> np.ndarray:
+    """Maski kanałów, w których jest przynajmniej jedna bramka z maski (uint64)"""
+    touched = (gate_masks[:, None] & _CH_GATE_MASKS[None, :]) != 0
+    return np.bitwise_or.reduce(np.where(touched, _CH_BITS[None, :], np.uint64(0)), axis=1)
+
+def resolve_definitions(gates: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Z macierzy bramek (N × K) wyznacza maski bramek, kanałów i centrów oraz typ i autorytet.
+    Typ i autorytet liczone są raz dla każdej unikalnej maski kanałów.
+    """
+    gate_masks = gate_masks_array(gates)
+    channel_masks = channel_masks_array(gate_masks)
+
+    unique, inverse = np.unique(channel_masks, return_inverse=True)
+    u_centers, u_type, u_authority = [], [], []
+    for ch_mask in unique.tolist():
+        c_mask = center_mask(ch_mask)
+        hd_type = type_for_channel_mask(ch_mask)
+        u_centers.append(c_mask)
+        u_type.append(hd_type)
+        u_authority.append(compute_authority(centers_from_mask(c_mask), hd_type))
+    return {
+        "gate_masks": gate_masks,
+        "channel_masks": channel_masks,
+        "center_masks": np.array(u_centers, dtype=np.uint64)[inverse],
+        "type": np.array(u_type, dtype=object)[inverse],
+        "authority": np.array(u_authority, dtype=object)[inverse],
+    }
+
+def compute_hd_charts_batch(utc_births: Sequence[datetime], zodiac_system: str = "tropical",
+                            calculation_method: str = "degrees",
+                            inputs: Optional[Sequence[Dict]] = None) -> List[Dict]:
+    """
+    Oblicza wykresy dla wielu dat urodzenia (UTC) w jednym przebiegu.
+    `inputs` to opcjonalne metadane rekordów (name, date, time, place, lat, lon, timezone).
+    Zwraca listę wyników w tym samym formacie co compute_hd_chart.
+    """
+    if not HAVE_SW:
+        raise RuntimeError("Brak pyswisseph - nie można obliczyć Human Design")
+    if not utc_births:
+        return []
+
+    jd_pers = julday_array(utc_births)
+    lon_pers = calc_positions_array(jd_pers, zodiac_system)
+    if calculation_method == "degrees":
+        jd_des = design_julday_array(jd_pers, arc_deg=88.0)
+    else:
+        jd_des = jd_pers - 88.0
+    lon_des = calc_positions_array(jd_des, zodiac_system)
+
+    lons = np.concatenate([lon_pers, lon_des], axis=1)
+    act = GATE_INDEX.lookup_array(lons)
+    gates, lines = act.gate, act.line
+    defs = resolve_definitions(gates)
+
+    n_side = len(ACTIVATION_BODIES)
+    results = []
+    for i, dt_utc in enumerate(utc_births):
+        dt_utc = dt_utc if dt_utc.tzinfo else dt_utc.replace(tzinfo=timezone.utc)
+        meta = inputs[i] if inputs else {}
+        input_info = chart_input_info(
+            meta.get("name", ""), meta.get("date", dt_utc.date().isoformat()),
+            meta.get("time", dt_utc.strftime("%H:%M")), meta.get("place", ""),
+            meta.get("lat"), meta.get("lon"), meta.get("timezone", "UTC"),
+            zodiac_system, calculation_method,
+        )
+        rows = [
+            activation_row("Personality" if k < n_side else "Design", ACTIVATION_BODIES[k % n_side],
+                           float(lons[i, k]), int(gates[i, k]), int(lines[i, k]))
+            for k in range(2 * n_side)
+        ]
+        active_gates: Set[int] = gates_from_mask(int(defs["gate_masks"][i]))
+        defined_ch = channels_from_mask(int(defs["channel_masks"][i]))
+        defined_cent = centers_from_mask(int(defs["center_masks"][i]))
+        line_p, line_d = int(lines[i, 0]), int(lines[i, n_side])
+        profile = f"{line_p}/{line_d}" if (line_p > 0 and line_d > 0) else "—"
+        dt_utc_design = dt_utc - timedelta(days=float(jd_pers[i] - jd_des[i]))
+        results.append(build_chart_result(
+            input_info, dt_utc, dt_utc_design, rows, str(defs["type"][i]),
+            str(defs["authority"][i]), profile, defined_cent, defined_ch, active_gates,
+        ))
+    return results
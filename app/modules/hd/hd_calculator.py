@@ -5,10 +5,18 @@ Bazuje na implementacji z HD_v3, ale dostosowany do naszego projektu
 """
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple, Set, Optional
-from geopy.geocoders import Nominatim
-from timezonefinder import TimezoneFinder
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from functools import lru_cache
+from typing import Any, List, Dict, NamedTuple, Tuple, Set, Optional, Sequence
 import pytz
+from app.modules.hd.geocoding import get_geocoder
+from app.modules.hd.timezones import get_timezone_resolver
+
+# Wersja silnika obliczeń - podbij przy każdej zmianie wpływającej na wyniki wykresu
+ENGINE_VERSION = "5"
 
 try:
     import swisseph as swe
@@ -16,31 +24,45 @@ try:
 except Exception:
     HAVE_SW = False
 
+try:
+    import numpy as np
+    HAVE_NP = True
+except Exception:
+    HAVE_NP = False
+
 # ---------- Geo & time ----------
+def resolve_timezone(lat: float, lng: float) -> str:
+    """Strefa czasowa dla współrzędnych (lokalnie, bez zapytań sieciowych)"""
+    return get_timezone_resolver().resolve(lat, lng)
+
 def geocode_place(place: str) -> Tuple[float, float, str]:
-    """Geokodowanie miejsca urodzenia"""
-    geo = Nominatim(user_agent="hd_backend").geocode(place, addressdetails=True, language="pl")
+    """Geokodowanie miejsca urodzenia (lokalny indeks miast, Nominatim jako fallback)"""
+    geo = get_geocoder().geocode(place)
     if not geo:
         raise ValueError("Nie znaleziono lokalizacji")
-    tz = TimezoneFinder().timezone_at(lng=geo.longitude, lat=geo.latitude)
-    if not tz:
-        raise ValueError("Nie udało się ustalić strefy czasowej")
-    return geo.latitude, geo.longitude, tz
+    return geo.lat, geo.lng, geo.timezone or resolve_timezone(geo.lat, geo.lng)
 
 def to_utc(dt_local: datetime, tzname: str) -> datetime:
     """Konwersja czasu lokalnego na UTC"""
     return pytz.timezone(tzname).localize(dt_local).astimezone(pytz.utc)
 
 # ---------- Ephemeris (tropical + solar arc -88°) ----------
-def set_tropical():
-    """Ustawienie trybu tropical zodiac"""
-    if HAVE_SW:
-        swe.set_sid_mode(0, 0, 0)  # tropical
+# Tryb sidereal (ajanamsa Lahiri) ustawiany jest raz na wątek i nigdy nie zmieniany - stan Swiss Ephemeris
+# jest lokalny dla wątku, więc wątki robocze (single-flight, threadpool) bez tego liczyłyby domyślną
+# ajanamsą Fagan/Bradley. Zodiak wybiera się per wywołanie: pozycje liczone są tropikalnie, a dla sidereal
+# odejmowana jest ajanamsa danej chwili - bez przełączania stanu Swiss Ephemeris między żądaniami.
+_sid_mode = threading.local()
+
+def ayanamsa(jd: float) -> float:
+    """Ajanamsa Lahiri (z nutacją - zgodna z FLG_SIDEREAL)"""
+    if not getattr(_sid_mode, "lahiri", False):
+        swe.set_sid_mode(swe.SIDM_LAHIRI, 0, 0)
+        _sid_mode.lahiri = True
+    return swe.get_ayanamsa_ex_ut(jd, swe.FLG_SWIEPH)[1]
 
-def set_sidereal():
-    """Ustawienie trybu sidereal zodiac"""
-    if HAVE_SW:
-        swe.set_sid_mode(swe.SIDM_LAHIRI, 0, 0)  # sidereal
+def zodiac_offset(jd: float, zodiac_system: str = "tropical") -> float:
+    """Wartość odejmowana od długości tropikalnej dla danego systemu zodiaku"""
+    return ayanamsa(jd) if zodiac_system == "sidereal" else 0.0
 
 def julday_utc(dt_utc: datetime) -> float:
     """Konwersja daty UTC na Julian Day"""
@@ -49,23 +71,72 @@ def julday_utc(dt_utc: datetime) -> float:
 
 def sun_longitude_utc(dt_utc: datetime) -> float:
     """Obliczenie długości ekliptycznej Słońca"""
-    return swe.calc_ut(julday_utc(dt_utc), swe.SUN)[0][0] % 360.0
+    jd = julday_utc(dt_utc)
+    table = _ephemeris_table(jd)
+    if table is not None:
+        return float(table.longitudes(jd)[0, 0])
+    return swe.calc_ut(jd, swe.SUN)[0][0] % 360.0
 
 def angular_diff(a: float, b: float) -> float:
     """Różnica kątowa między dwoma długościami ekliptycznymi"""
     return (a - b + 180.0) % 360.0 - 180.0
 
-def find_design_time_solar_arc(dt_birth_utc: datetime, arc_deg: float = 88.0) -> datetime:
-    """Znalezienie czasu Design przez solar arc -88°"""
-    target = (sun_longitude_utc(dt_birth_utc) - arc_deg) % 360.0
-    guess = dt_birth_utc - timedelta(days=88)
-    for _ in range(6):
-        lon = sun_longitude_utc(guess)
+def sun_longitude_speed_jd(jd: float) -> Tuple[float, float]:
+    """Długość Słońca i jego prędkość (°/dzień) z jednego wywołania Swiss Ephemeris"""
+    xx, _ = swe.calc_ut(jd, swe.SUN, swe.FLG_SWIEPH | swe.FLG_SPEED)
+    return xx[0] % 360.0, xx[3]
+
+# Instrumentacja solvera Design: liczba wywołań i rozkład liczby iteracji
+_design_stats_lock = threading.Lock()
+DESIGN_SOLVER_STATS: Dict[str, Any] = {"calls": 0, "solved": 0, "iterations": Counter(), "max_iterations": 0}
+
+@lru_cache(maxsize=8192)
+def design_julday_solar_arc(jd_birth: float, arc_deg: float = 88.0,
+                            tol: float = 1e-6, max_iter: int = 8) -> float:
+    """
+    Julian Day momentu, w którym Słońce było `arc_deg` stopni przed pozycją z urodzenia.
+    Metoda Newtona z prędkością Słońca; zwykle zbiega w 1-2 krokach. Wynik zapamiętywany.
+    """
+    lon_birth, speed = sun_longitude_speed_jd(jd_birth)
+    target = (lon_birth - arc_deg) % 360.0
+    jd = jd_birth - arc_deg / speed
+    iterations = 0
+    for _ in range(max_iter):
+        lon, speed = sun_longitude_speed_jd(jd)
         err = angular_diff(lon, target)
-        if abs(err) < 0.01: 
+        if abs(err) < tol:
             break
-        guess -= timedelta(days=err/0.985647)
-    return guess
+        jd -= err / speed
+        iterations += 1
+    with _design_stats_lock:
+        DESIGN_SOLVER_STATS["solved"] += 1
+        DESIGN_SOLVER_STATS["iterations"][iterations] += 1
+        DESIGN_SOLVER_STATS["max_iterations"] = max(DESIGN_SOLVER_STATS["max_iterations"], iterations)
+    return jd
+
+def find_design_time_solar_arc(dt_birth_utc: datetime, arc_deg: float = 88.0) -> datetime:
+    """Znalezienie czasu Design przez solar arc -88°"""
+    with _design_stats_lock:
+        DESIGN_SOLVER_STATS["calls"] += 1
+    jd_birth = julday_utc(dt_birth_utc)
+    jd_design = design_julday_solar_arc(jd_birth, arc_deg)
+    return dt_birth_utc - timedelta(days=jd_birth - jd_design)
+
+def design_solver_stats() -> Dict:
+    """Statystyki solvera Design (do podglądu w panelu admina)"""
+    cache = design_julday_solar_arc.cache_info()
+    with _design_stats_lock:
+        solved = DESIGN_SOLVER_STATS["solved"]
+        iterations = dict(sorted(DESIGN_SOLVER_STATS["iterations"].items()))
+        return {
+            "calls": DESIGN_SOLVER_STATS["calls"],
+            "solved": solved,
+            "cache_hits": cache.hits,
+            "cache_size": cache.currsize,
+            "iterations_histogram": iterations,
+            "mean_iterations": (sum(k * v for k, v in iterations.items()) / solved) if solved else 0.0,
+            "max_iterations": DESIGN_SOLVER_STATS["max_iterations"],
+        }
 
 @dataclass
 class PlanetPos:
@@ -75,31 +146,65 @@ class PlanetPos:
 
 BASE_PLANETS = ["Sun","Earth","Moon","Mercury","Venus","Mars","Jupiter","Saturn","Uranus","Neptune","Pluto"]
 
-def calc_positions(dt_utc: datetime) -> List[PlanetPos]:
+# Ciała liczone bezpośrednio w Swiss Ephemeris (Earth i South Node są przeciwległe do Sun / North Node)
+EPHEMERIS_BODIES = ["Sun","Moon","Mercury","Venus","Mars","Jupiter","Saturn","Uranus","Neptune","Pluto","North Node"]
+# Kolejność aktywacji po jednej stronie wykresu (13 na stronę, 26 łącznie)
+ACTIVATION_BODIES = EPHEMERIS_BODIES + ["Earth", "South Node"]
+
+def _body_ids() -> Dict[str, int]:
+    return {
+        "Sun": swe.SUN, "Moon": swe.MOON, "Mercury": swe.MERCURY, "Venus": swe.VENUS, "Mars": swe.MARS,
+        "Jupiter": swe.JUPITER, "Saturn": swe.SATURN, "Uranus": swe.URANUS, "Neptune": swe.NEPTUNE, "Pluto": swe.PLUTO,
+        "North Node": swe.TRUE_NODE,  # Węzły księżycowe
+    }
+
+def _ephemeris_table(jd):
+    """Prekomputowana tablica efemeryd, jeśli włączona i obejmuje dany moment"""
+    if not HAVE_NP:
+        return None
+    from app.modules.hd.ephemeris_table import active_table
+    table = active_table()
+    return table if table is not None and table.covers(jd) else None
+
+def _tropical_longitudes(jd: float, offsets: Sequence[float] = (0.0,)) -> List[Optional[float]]:
+    """
+    Długości tropikalne EPHEMERIS_BODIES (None, gdy Swiss Ephemeris nie policzył ciała).
+    offsets: przesunięcia zodiaków, w których długości zostaną odczytane (granice linii dla tablicy efemeryd).
+    """
+    table = _ephemeris_table(jd)
+    if table is not None:
+        # Interpolacja z prekomputowanej tablicy (z doliczeniem przy granicach linii)
+        return [float(lon) for lon in table.longitudes(jd, offsets)[0]]
+    lons = []
+    for name, planet_id in _body_ids().items():
+        try:
+            xx, ret = swe.calc_ut(jd, planet_id)
+            lons.append(xx[0] % 360.0 if ret >= 0 else None)
+        except:
+            lons.append(None)
+    return lons
+
+def calc_positions(dt_utc: datetime, zodiac_system: str = "tropical") -> List[PlanetPos]:
     """Obliczenie pozycji planet"""
     if not HAVE_SW:
         return []
     
     jd = julday_utc(dt_utc)
-    ids = {
-        "Sun": swe.SUN, "Moon": swe.MOON, "Mercury": swe.MERCURY, "Venus": swe.VENUS, "Mars": swe.MARS,
-        "Jupiter": swe.JUPITER, "Saturn": swe.SATURN, "Uranus": swe.URANUS, "Neptune": swe.NEPTUNE, "Pluto": swe.PLUTO,
-        "North Node": swe.TRUE_NODE, "South Node": swe.TRUE_NODE  # Węzły księżycowe
-    }
-    
+    offset = zodiac_offset(jd, zodiac_system)
+    return _positions_from_longitudes(_tropical_longitudes(jd, (offset,)), offset)
+
+def _positions_from_longitudes(lons: List[Optional[float]], offset: float) -> List[PlanetPos]:
+    """Pozycje ciał z długości tropikalnych przesuniętych o offset (ajanamsa dla sidereal)"""
     positions = []
     north_node_pos = None
     
-    for name, planet_id in ids.items():
-        try:
-            xx, ret = swe.calc_ut(jd, planet_id)
-            if ret >= 0:
-                lon = xx[0] % 360.0
-                positions.append(PlanetPos(name, lon))
-                if name == "North Node":
-                    north_node_pos = lon
-        except:
-            pass
+    for name, lon in zip(EPHEMERIS_BODIES, lons):
+        if lon is None:
+            continue
+        lon = (lon - offset) % 360.0
+        positions.append(PlanetPos(name, lon))
+        if name == "North Node":
+            north_node_pos = lon
     
     # Earth jest przeciwieństwem Słońca
     sun_pos = next((p for p in positions if p.name == "Sun"), None)
@@ -130,7 +235,7 @@ GATE_RANGES: List[Tuple[float, float, int]] = [
     (_d(TA,13,15,0), _d(TA,18,52,30), 2), (_d(TA,18,52,30), _d(TA,24,30,0), 23),
     (_d(TA,24,30,0), _d(GE,0,7,30), 8), (_d(GE,0,7,30), _d(GE,5,45,0), 20),
     (_d(GE,5,45,0), _d(GE,11,22,30), 16), (_d(GE,11,22,30), _d(GE,17,0,0), 35),
-    (_d(GE,17,0,0), _d(GE,22,27,30), 45), (_d(GE,22,37,30), _d(GE,28,15,0), 12),
+    (_d(GE,17,0,0), _d(GE,22,37,30), 45), (_d(GE,22,37,30), _d(GE,28,15,0), 12),
     (_d(GE,28,15,0), _d(CA,3,52,30), 15), (_d(CA,3,52,30), _d(CA,9,30,0), 52),
     (_d(CA,9,30,0), _d(CA,15,7,30), 39), (_d(CA,15,7,30), _d(CA,20,45,0), 53),
     (_d(CA,20,45,0), _d(CA,26,22,30), 62), (_d(CA,26,22,30), _d(LE,2,0,0), 56),
@@ -157,23 +262,118 @@ GATE_RANGES: List[Tuple[float, float, int]] = [
     (_d(PI,17,0,0), _d(PI,22,37,30), 22), (_d(PI,22,37,30), _d(PI,28,15,0), 36),
 ]
 
+class GateActivation(NamedTuple):
+    """Aktywacja: bramka, linia, kolor, ton i baza (skalary lub tablice NumPy)"""
+    gate: Any
+    line: Any
+    color: Any
+    tone: Any
+    base: Any
+
+class GateIndex:
+    """
+    Indeks mandali: długość ekliptyczna → bramka, linia, kolor, ton, baza.
+    Granice są posortowane raz, a wyszukiwanie to bisect (lub searchsorted dla tablic).
+    """
+    LINES, COLORS, TONES, BASES = 6, 6, 6, 5
+
+    def __init__(self, ranges: List[Tuple[float, float, int]]):
+        # Zakres przechodzący przez 0° (bramka 25) dzielimy na dwa segmenty
+        segments: List[Tuple[float, float, int, float, float]] = []
+        for start, end, gate in ranges:
+            width = (end - start) % 360.0
+            if start < end:
+                segments.append((start, end, gate, start, width))
+            else:
+                segments.append((start, 360.0, gate, start, width))
+                segments.append((0.0, end, gate, start, width))
+        segments.sort()
+        self._validate(segments)
+
+        self.starts = [s[0] for s in segments]
+        self.gates = [s[2] for s in segments]
+        self.gate_starts = [s[3] for s in segments]
+        self.gate_widths = [s[4] for s in segments]
+        self.bounds = {gate: (start, end) for start, end, gate in ranges}
+        if HAVE_NP:
+            self._np_starts = np.asarray(self.starts, dtype=np.float64)
+            self._np_gates = np.asarray(self.gates, dtype=np.int16)
+            self._np_gate_starts = np.asarray(self.gate_starts, dtype=np.float64)
+            self._np_gate_widths = np.asarray(self.gate_widths, dtype=np.float64)
+
+    @staticmethod
+    def _validate(segments: List[Tuple[float, float, int, float, float]], eps: float = 1e-9) -> None:
+        if abs(segments[0][0]) > eps or abs(segments[-1][1] - 360.0) > eps:
+            raise ValueError("GATE_RANGES nie pokrywa pełnego koła 0°–360°")
+        for (s1, e1, g1, _, _), (s2, _, g2, _, _) in zip(segments, segments[1:]):
+            if s2 - e1 > eps:
+                raise ValueError(f"Luka w GATE_RANGES między bramką {g1} ({e1:.6f}°) a {g2} ({s2:.6f}°)")
+            if e1 - s2 > eps:
+                raise ValueError(f"Nakładanie się bramek {g1} i {g2} w GATE_RANGES ({s2:.6f}°)")
+        gates = {s[2] for s in segments}
+        if gates != set(range(1, 65)):
+            raise ValueError(f"GATE_RANGES nie zawiera wszystkich 64 bramek: brak {sorted(set(range(1, 65)) - gates)}")
+
+    def _segment(self, lon: float) -> Tuple[int, float]:
+        x = lon % 360.0
+        return bisect_right(self.starts, x) - 1, x
+
+    def gate_bounds(self, lon: float) -> Tuple[int, float, float]:
+        i, _ = self._segment(lon)
+        gate = self.gates[i]
+        start, end = self.bounds[gate]
+        return gate, start, end
+
+    def fraction(self, lon: float) -> Tuple[int, float]:
+        """Bramka i ułamek jej szerokości (0..1) dla danej długości"""
+        i, x = self._segment(lon)
+        return self.gates[i], ((x - self.gate_starts[i]) % 360.0) / self.gate_widths[i]
+
+    def lookup(self, lon: float) -> GateActivation:
+        gate, frac = self.fraction(lon)
+        line = min(max(int(frac * self.LINES) + 1, 1), self.LINES)
+        scaled = frac * self.LINES
+        color = int(scaled * self.COLORS) % self.COLORS + 1
+        scaled *= self.COLORS
+        tone = int(scaled * self.TONES) % self.TONES + 1
+        scaled *= self.TONES
+        base = int(scaled * self.BASES) % self.BASES + 1
+        return GateActivation(gate, line, color, tone, base)
+
+    def lookup_array(self, lons) -> GateActivation:
+        """Wersja wektorowa: przyjmuje tablicę długości, zwraca tablice int"""
+        if not HAVE_NP:
+            raise RuntimeError("Brak numpy - wyszukiwanie wektorowe niedostępne")
+        x = np.mod(np.asarray(lons, dtype=np.float64), 360.0)
+        i = np.searchsorted(self._np_starts, x, side="right") - 1
+        frac = np.mod(x - self._np_gate_starts[i], 360.0) / self._np_gate_widths[i]
+        scaled = frac * self.LINES
+        line = np.clip(scaled.astype(np.int64) + 1, 1, self.LINES)
+        scaled = scaled * self.COLORS
+        color = scaled.astype(np.int64) % self.COLORS + 1
+        scaled = scaled * self.TONES
+        tone = scaled.astype(np.int64) % self.TONES + 1
+        scaled = scaled * self.BASES
+        base = scaled.astype(np.int64) % self.BASES + 1
+        return GateActivation(self._np_gates[i].astype(np.int64), line, color, tone, base)
+
+    def line_boundary_distance(self, lons):
+        """Odległość (w stopniach) do najbliższej granicy linii, dla tablic NumPy"""
+        x = np.mod(np.asarray(lons, dtype=np.float64), 360.0)
+        i = np.searchsorted(self._np_starts, x, side="right") - 1
+        line_width = self._np_gate_widths[i] / self.LINES
+        pos = np.mod(x - self._np_gate_starts[i], 360.0) / line_width
+        return np.abs(pos - np.round(pos)) * line_width
+
+# Budowany raz przy imporcie; błąd w GATE_RANGES zatrzyma start aplikacji
+GATE_INDEX = GateIndex(GATE_RANGES)
+
 def gate_bounds_for(lon: float) -> Tuple[int, float, float]:
-    x = lon % 360.0
-    for start, end, g in GATE_RANGES:
-        if (start < end and start <= x < end) or (start > end and (x >= start or x < end)):
-            return g, start, end
-    return -1, 0.0, 0.0
+    return GATE_INDEX.gate_bounds(lon)
 
 def gate_line_for(lon: float) -> Tuple[int, int]:
-    g, start, end = gate_bounds_for(lon)
-    if g <= 0:
-        return -1, -1
-    width = (end - start) % 360.0
-    if width == 0:
-        return g, 1
-    frac = ((lon - start) % 360.0) / width
-    line = int(frac * 6.0) + 1
-    return g, min(max(line, 1), 6)
+    activation = GATE_INDEX.lookup(lon)
+    return activation.gate, activation.line
 
 # ---------- Centers & Channels (canonical) ----------
 # Map channel gate pairs to their two connected centers
@@ -193,57 +393,168 @@ CHANNELS: Dict[Tuple[int, int], Tuple[str, str]] = {
 for (a, b), centers in list(CHANNELS.items()):
     CHANNELS[(b, a)] = centers
 
+# ---------- Bitmasks ----------
+# Bramka g → bit (g - 1) w 64-bitowej masce; kanał k → bit k w masce kanałów
+CENTERS = ["Head", "Ajna", "Throat", "G", "Ego", "Sacral", "Solar Plexus", "Spleen", "Root"]
+MOTOR_CENTERS = ["Sacral", "Solar Plexus", "Ego", "Root"]
+CENTER_BITS = {c: 1 << i for i, c in enumerate(CENTERS)}
+MOTOR_MASK = sum(CENTER_BITS[c] for c in MOTOR_CENTERS)
+
+# Kanały bez duplikatów kierunku (g1 < g2), w stałej kolejności
+CHANNEL_LIST: List[Tuple[int, int]] = sorted(k for k in CHANNELS if k[0] < k[1])
+CHANNEL_INDEX = {pair: k for k, pair in enumerate(CHANNEL_LIST)}
+CHANNEL_INDEX.update({(b, a): k for (a, b), k in list(CHANNEL_INDEX.items())})
+CHANNEL_GATE_MASKS = [(1 << (a - 1)) | (1 << (b - 1)) for a, b in CHANNEL_LIST]
+CHANNEL_CENTER_MASKS = [CENTER_BITS[CHANNELS[pair][0]] | CENTER_BITS[CHANNELS[pair][1]]
+                        for pair in CHANNEL_LIST]
+
+def iter_bits(mask: int):
+    """Indeksy ustawionych bitów (rosnąco)"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def gate_mask(gates) -> int:
+    """Maska bramek 1..64"""
+    mask = 0
+    for g in gates:
+        if g:
+            mask |= 1 << (g - 1)
+    return mask
+
+def gates_from_mask(mask: int) -> Set[int]:
+    return {bit + 1 for bit in iter_bits(mask)}
+
+_CHANNEL_BITS = [(cm, 1 << k) for k, cm in enumerate(CHANNEL_GATE_MASKS)]
+
+def channel_mask(gmask: int) -> int:
+    """Maska zdefiniowanych kanałów dla maski bramek"""
+    return sum(bit for cm, bit in _CHANNEL_BITS if gmask & cm == cm)
+
+def channel_mask_of(channels) -> int:
+    """Maska kanałów dla par bramek (w dowolnym kierunku) lub zapisów "a-b" z bazy"""
+    mask = 0
+    for pair in channels:
+        if isinstance(pair, str):
+            pair = tuple(int(g) for g in pair.split("-"))
+        mask |= 1 << CHANNEL_INDEX[pair]
+    return mask
+
+def channels_from_mask(ch_mask: int) -> Set[Tuple[int, int]]:
+    return {CHANNEL_LIST[k] for k in iter_bits(ch_mask)}
+
+def center_mask(ch_mask: int) -> int:
+    """Maska zdefiniowanych centrów (każde centrum połączone zdefiniowanym kanałem)"""
+    mask = 0
+    for k in iter_bits(ch_mask):
+        mask |= CHANNEL_CENTER_MASKS[k]
+    return mask
+
+def centers_from_mask(c_mask: int) -> Set[str]:
+    return {CENTERS[i] for i in iter_bits(c_mask)}
+
+@lru_cache(maxsize=8192)
+def center_components(ch_mask: int) -> Tuple[int, ...]:
+    """Spójne grupy zdefiniowanych centrów (maski centrów), union-find po kanałach - pamiętane per maska kanałów"""
+    parent = list(range(len(CENTERS)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    defined = 0
+    for k in iter_bits(ch_mask):
+        a, b = iter_bits(CHANNEL_CENTER_MASKS[k])
+        parent[find(a)] = find(b)
+        defined |= CHANNEL_CENTER_MASKS[k]
+    groups: Dict[int, int] = {}
+    for i in iter_bits(defined):
+        root = find(i)
+        groups[root] = groups.get(root, 0) | (1 << i)
+    return tuple(sorted(groups.values()))
+
+def motor_to_throat(ch_mask: int) -> bool:
+    """Czy któryś silnik jest połączony (pośrednio) z Gardłem"""
+    throat = CENTER_BITS["Throat"]
+    return any(comp & throat and comp & MOTOR_MASK for comp in center_components(ch_mask))
+
+@lru_cache(maxsize=8192)
+def _definition_sets(ch_mask: int) -> Tuple[frozenset, frozenset]:
+    return frozenset(channels_from_mask(ch_mask)), frozenset(centers_from_mask(center_mask(ch_mask)))
+
 def compute_definition(active_gates: Set[int]) -> Tuple[Set[Tuple[int, int]], Set[str]]:
     """Oblicz zdefiniowane kanały oraz centra na podstawie aktywnych bramek."""
-    defined_channels: Set[Tuple[int, int]] = set()
-    defined_centers: Set[str] = set()
-    for (g1, g2), (c1, c2) in CHANNELS.items():
-        if g1 < g2 and g1 in active_gates and g2 in active_gates:
-            defined_channels.add((g1, g2))
-            defined_centers.update([c1, c2])
-    return defined_channels, defined_centers
-
-def _build_center_graph(defined_channels: Set[Tuple[int, int]]) -> Dict[str, Set[str]]:
-    graph: Dict[str, Set[str]] = {}
-    for (g1, g2) in defined_channels:
-        c1, c2 = CHANNELS[(g1, g2)]
-        graph.setdefault(c1, set()).add(c2)
-        graph.setdefault(c2, set()).add(c1)
-    return graph
-
-def _has_motor_to_throat_path(defined_channels: Set[Tuple[int, int]]) -> bool:
-    motor_centers = {"Sacral", "Solar Plexus", "Ego", "Root"}
-    graph = _build_center_graph(defined_channels)
-    from collections import deque
-    for start in motor_centers:
-        if start not in graph:
+    channels, centers = _definition_sets(channel_mask(gate_mask(active_gates)))
+    return set(channels), set(centers)
+
+# Liczba rozłącznych grup centrów → rodzaj definicji
+SPLIT_TYPES = {0: "None", 1: "Single", 2: "Split", 3: "Triple Split", 4: "Quadruple Split"}
+
+def definition_split(ch_mask: int) -> str:
+    return SPLIT_TYPES.get(len(center_components(ch_mask)), "Quadruple Split")
+
+@lru_cache(maxsize=8192)
+def _bridge_channels(ch_mask: int) -> Tuple[int, ...]:
+    """Niezdefiniowane kanały łączące dwie różne grupy zdefiniowanych centrów"""
+    components = center_components(ch_mask)
+    if len(components) < 2:
+        return ()
+    bridges = []
+    for k, cm in enumerate(CHANNEL_CENTER_MASKS):
+        if ch_mask >> k & 1:
             continue
-        seen = {start}
-        q = deque([start])
-        while q:
-            u = q.popleft()
-            if u == "Throat":
-                return True
-            for v in graph.get(u, []):
-                if v not in seen:
-                    seen.add(v)
-                    q.append(v)
-    return False
+        touched = [comp for comp in components if comp & cm]
+        if len(touched) == 2:
+            bridges.append(k)
+    return tuple(bridges)
 
-def compute_type(defined_centers: Set[str], defined_channels: Set[Tuple[int, int]]) -> str:
-    """Określ typ na podstawie sakralu i połączeń silników do Gardła."""
-    if not defined_centers:
+def bridging_gates(ch_mask: int, gmask: int) -> List[int]:
+    """
+    Bramki mostkujące: brakująca bramka kanału, który połączyłby dwie grupy centrów,
+    gdy druga bramka tego kanału jest już aktywna.
+    """
+    gates = set()
+    for k in _bridge_channels(ch_mask):
+        a, b = CHANNEL_LIST[k]
+        if gmask >> (a - 1) & 1:
+            gates.add(b)
+        elif gmask >> (b - 1) & 1:
+            gates.add(a)
+    return sorted(gates)
+
+def analyze_definition(defined_channels, active_gates) -> Dict[str, Any]:
+    """Rodzaj definicji (Single / Split / ...) i bramki mostkujące"""
+    ch_mask = channel_mask_of(defined_channels)
+    return {
+        "definition": definition_split(ch_mask),
+        "bridging_gates": bridging_gates(ch_mask, gate_mask(active_gates)),
+    }
+
+@lru_cache(maxsize=8192)
+def type_for_channel_mask(ch_mask: int) -> str:
+    """Typ na podstawie sakralu i połączeń silników do Gardła."""
+    centers = center_mask(ch_mask)
+    if not centers:
         return "Reflector"
-    sacral = "Sacral" in defined_centers
-    motor_to_throat = _has_motor_to_throat_path(defined_channels)
-    if sacral and motor_to_throat:
+    sacral = bool(centers & CENTER_BITS["Sacral"])
+    to_throat = motor_to_throat(ch_mask)
+    if sacral and to_throat:
         return "Manifesting Generator"
     if sacral:
         return "Generator"
-    if ("Throat" in defined_centers and motor_to_throat) and not sacral:
+    if centers & CENTER_BITS["Throat"] and to_throat:
         return "Manifestor"
     return "Projector"
 
+def compute_type(defined_centers: Set[str], defined_channels: Set[Tuple[int, int]]) -> str:
+    """Określ typ na podstawie sakralu i połączeń silników do Gardła."""
+    if not defined_centers:
+        return "Reflector"
+    return type_for_channel_mask(channel_mask_of(defined_channels))
+
 def compute_authority(defined_centers: Set[str], hd_type: str) -> str:
     """Określ autorytet zgodnie z kolejnością centrów."""
     if "Solar Plexus" in defined_centers:
@@ -268,26 +579,94 @@ def compute_profile(sun_p_lon: float, sun_d_lon: float) -> str:
     _, lD = gate_line_for(sun_d_lon)
     return f"{lP}/{lD}" if (lP > 0 and lD > 0) else "—"
 
+STRATEGIES = {
+    "Generator": "To Respond",
+    "Manifesting Generator": "To Respond", 
+    "Manifestor": "To Inform",
+    "Projector": "To Wait for Invitation",
+    "Reflector": "To Wait a Lunar Cycle"
+}
+
+def activation_row(side: str, planet: str, lon: float, gate: int, line: int) -> Dict:
+    """Wiersz aktywacji w formacie zwracanym przez compute_hd_chart"""
+    return {
+        "side": side, 
+        "planet": planet, 
+        "lon": round(lon, 6),
+        "gate": gate if gate > 0 else None, 
+        "line": line if line > 0 else None
+    }
+
+def build_chart_result(input_info: Dict, dt_utc: datetime, dt_utc_design: datetime, rows: List[Dict],
+                       hd_type: str, authority: str, profile: str, defined_centers: Set[str],
+                       defined_channels: Set[Tuple[int, int]], active_gates: Set[int]) -> Dict:
+    """Złożenie wyniku wykresu (wspólne dla compute_hd_chart i obliczeń wsadowych)"""
+    return {
+        "input": input_info,
+        "timestamps": {
+            "utc_birth": dt_utc.isoformat(),
+            "utc_design": dt_utc_design.isoformat()
+        },
+        "summary": {
+            "type": hd_type,
+            "strategy": STRATEGIES.get(hd_type, "Unknown"),
+            "authority": authority,
+            "profile": profile,
+            "defined_centers": sorted(list(defined_centers)),
+            "channels": sorted([f"{min(a,b)}-{max(a,b)}" for (a,b) in defined_channels]),
+            "active_gates": sorted(list(active_gates)),
+            **analyze_definition(defined_channels, active_gates)
+        },
+        "positions": rows
+    }
+
+def chart_input_info(name: str, date_str: str, time_str: str, place: str, lat: Optional[float],
+                     lon: Optional[float], tzname: Optional[str], zodiac_system: str,
+                     calculation_method: str) -> Dict:
+    return {
+        "name": name,
+        "date": date_str,
+        "time": time_str,
+        "place": place,
+        "lat": lat,
+        "lon": lon,
+        "timezone": tzname,
+        "zodiac_mode": zodiac_system.title(),
+        "design_mode": "-88° (łuk Słońca)" if calculation_method == "degrees" else "-88 dni"
+    }
+
 # ---------- Public API ----------
 def compute_hd_chart(name: str, date_str: str, time_str: str, place: str, 
                      zodiac_system: str = "tropical", calculation_method: str = "degrees") -> Dict:
-    """Główna funkcja obliczania Human Design"""
+    """Główna funkcja obliczania Human Design (z geokodowaniem nazwy miejsca)"""
     if not HAVE_SW:
         raise RuntimeError("Brak pyswisseph - nie można obliczyć Human Design")
     
-    # Input → times
     lat, lon, tzname = geocode_place(place)
+    return compute_hd_chart_at(name, date_str, time_str, lat, lon, place=place,
+                               zodiac_system=zodiac_system, calculation_method=calculation_method,
+                               tzname=tzname)
+
+def compute_hd_chart_at(name: str, date_str: str, time_str: str, lat: float, lon: float,
+                        place: Optional[str] = None, zodiac_system: str = "tropical",
+                        calculation_method: str = "degrees", tzname: Optional[str] = None) -> Dict:
+    """Obliczanie Human Design dla znanych współrzędnych - bez geokodowania"""
+    if not HAVE_SW:
+        raise RuntimeError("Brak pyswisseph - nie można obliczyć Human Design")
+    
+    # Input → times
+    timezone_ms = 0.0
+    if not tzname:
+        tz_start = time.perf_counter()
+        tzname = resolve_timezone(lat, lon)
+        timezone_ms = (time.perf_counter() - tz_start) * 1000
+    if not place:
+        place = f"Lat: {lat}, Lng: {lon}"
     dt_local = datetime.fromisoformat(f"{date_str}T{time_str}")
     dt_utc = to_utc(dt_local, tzname)
     
-    # Ustawienie systemu zodiaku
-    if zodiac_system == "sidereal":
-        set_sidereal()
-    else:
-        set_tropical()
-    
     # Personality positions
-    pos_pers = calc_positions(dt_utc)
+    pos_pers = calc_positions(dt_utc, zodiac_system)
     
     # Design time calculation
     if calculation_method == "degrees":
@@ -297,32 +676,23 @@ def compute_hd_chart(name: str, date_str: str, time_str: str, place: str,
         # -88 days
         dt_utc_design = dt_utc - timedelta(days=88)
     
-    pos_des = calc_positions(dt_utc_design)
+    pos_des = calc_positions(dt_utc_design, zodiac_system)
     
+    input_info = chart_input_info(name, date_str, time_str, place, lat, lon, tzname,
+                                  zodiac_system, calculation_method)
+    result = _chart_from_positions(input_info, dt_utc, dt_utc_design, pos_pers, pos_des)
+    result["timings"] = {"timezone_ms": round(timezone_ms, 3)}
+    return result
+
+def _chart_from_positions(input_info: Dict, dt_utc: datetime, dt_utc_design: datetime,
+                          pos_pers: List[PlanetPos], pos_des: List[PlanetPos]) -> Dict:
+    """Bramki, definicja, typ, autorytet i profil z pozycji Personality i Design"""
     def table(positions: List[PlanetPos], side: str):
-        rows = []
-        for p in positions:
-            g, l = gate_line_for(p.lon)
-            rows.append({
-                "side": side, 
-                "planet": p.name, 
-                "lon": round(p.lon, 6),
-                "gate": g if g > 0 else None, 
-                "line": l if l > 0 else None
-            })
-        return rows
+        return [activation_row(side, p.name, p.lon, *gate_line_for(p.lon)) for p in positions]
     
     rows = table(pos_pers, "Personality") + table(pos_des, "Design")
     active_gates: Set[int] = set(r["gate"] for r in rows if r["gate"])
     
-    # DEBUG: Print all positions and gates
-    print("🔍 DEBUG: All planet positions and gates:")
-    for r in rows:
-        if r["gate"]:
-            print(f"  {r['side']} {r['planet']}: {r['lon']:.2f}° → Gate {r['gate']}, Line {r['line']}")
-    
-    print(f"🔍 DEBUG: Active gates: {sorted(active_gates)}")
-    
     defined_ch, defined_cent = compute_definition(active_gates)
     
     t = compute_type(defined_cent, defined_ch)
@@ -332,40 +702,56 @@ def compute_hd_chart(name: str, date_str: str, time_str: str, place: str,
     sun_d = next(p.lon for p in pos_des if p.name == "Sun")
     profile = compute_profile(sun_p, sun_d)
     
-    # Strategy based on type
-    strategy_map = {
-        "Generator": "To Respond",
-        "Manifesting Generator": "To Respond", 
-        "Manifestor": "To Inform",
-        "Projector": "To Wait for Invitation",
-        "Reflector": "To Wait a Lunar Cycle"
-    }
-    strategy = strategy_map.get(t, "Unknown")
+    return build_chart_result(input_info, dt_utc, dt_utc_design, rows, t, a, profile,
+                              defined_cent, defined_ch, active_gates)
+
+# ---------- Warianty systemów ----------
+ZODIAC_SYSTEMS = ("tropical", "sidereal")
+CALCULATION_METHODS = ("degrees", "days")
+
+def variant_key(zodiac_system: str, calculation_method: str) -> str:
+    """Klucz wariantu, np. "sidereal:degrees" (wartości spoza list traktowane jak w compute_hd_chart_at)"""
+    zodiac = "sidereal" if zodiac_system == "sidereal" else "tropical"
+    method = "degrees" if calculation_method == "degrees" else "days"
+    return f"{zodiac}:{method}"
+
+def compute_hd_chart_variants(name: str, date_str: str, time_str: str, lat: float, lon: float,
+                              place: Optional[str] = None, tzname: Optional[str] = None) -> Dict[str, Dict]:
+    """
+    Wszystkie cztery warianty wykresu (tropical/sidereal × degrees/days) w jednym przebiegu.
+    Długości tropikalne liczone są raz dla urodzenia i raz dla każdego z dwóch czasów Design,
+    wersje sidereal powstają z nich przez odjęcie ajanamsy. Wyniki są identyczne z compute_hd_chart_at.
+    """
+    if not HAVE_SW:
+        raise RuntimeError("Brak pyswisseph - nie można obliczyć Human Design")
     
-    return {
-        "input": {
-            "name": name,
-            "date": date_str,
-            "time": time_str,
-            "place": place,
-            "lat": lat,
-            "lon": lon,
-            "timezone": tzname,
-            "zodiac_mode": zodiac_system.title(),
-            "design_mode": "-88° (łuk Słońca)" if calculation_method == "degrees" else "-88 dni"
-        },
-        "timestamps": {
-            "utc_birth": dt_utc.isoformat(),
-            "utc_design": dt_utc_design.isoformat()
-        },
-        "summary": {
-            "type": t,
-            "strategy": strategy,
-            "authority": a,
-            "profile": profile,
-            "defined_centers": sorted(list(defined_cent)),
-            "channels": sorted([f"{min(a,b)}-{max(a,b)}" for (a,b) in defined_ch]),
-            "active_gates": sorted(list(active_gates))
-        },
-        "positions": rows
+    timezone_ms = 0.0
+    if not tzname:
+        tz_start = time.perf_counter()
+        tzname = resolve_timezone(lat, lon)
+        timezone_ms = (time.perf_counter() - tz_start) * 1000
+    if not place:
+        place = f"Lat: {lat}, Lng: {lon}"
+    dt_utc = to_utc(datetime.fromisoformat(f"{date_str}T{time_str}"), tzname)
+    
+    jd = julday_utc(dt_utc)
+    offsets = {z: zodiac_offset(jd, z) for z in ZODIAC_SYSTEMS}
+    lons = _tropical_longitudes(jd, tuple(offsets.values()))
+    pos_pers = {z: _positions_from_longitudes(lons, offsets[z]) for z in ZODIAC_SYSTEMS}
+    design_times = {
+        "degrees": find_design_time_solar_arc(dt_utc, arc_deg=88.0),
+        "days": dt_utc - timedelta(days=88),
     }
+    
+    results = {}
+    for method, dt_utc_design in design_times.items():
+        jd_design = julday_utc(dt_utc_design)
+        offsets_design = {z: zodiac_offset(jd_design, z) for z in ZODIAC_SYSTEMS}
+        lons_design = _tropical_longitudes(jd_design, tuple(offsets_design.values()))
+        for zodiac in ZODIAC_SYSTEMS:
+            pos_des = _positions_from_longitudes(lons_design, offsets_design[zodiac])
+            input_info = chart_input_info(name, date_str, time_str, place, lat, lon, tzname, zodiac, method)
+            result = _chart_from_positions(input_info, dt_utc, dt_utc_design, pos_pers[zodiac], pos_des)
+            result["timings"] = {"timezone_ms": round(timezone_ms, 3)}
+            results[variant_key(zodiac, method)] = result
+    return results
@@ -1,8 +1,10 @@
 # app/modules/hd/models.py
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Boolean, Float
-from sqlalchemy.orm import relationship
+from typing import Dict, List, Optional
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, JSON, Boolean, Float, Index, LargeBinary
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.modules.hd.activations_codec import pack_activations, unpack_activations
 
 class HDSession(Base):
     """Human Design session"""
@@ -46,8 +48,21 @@ class HDSession(Base):
 
     # Gates (active gates from both personality and design)
     active_gates = Column(JSON, nullable=True)  # List of active gates
-    # Full planetary activations [{side, planet, lon, gate, line}]
-    activations = Column(JSON, nullable=True)
+    # Full planetary activations, 26 × <BBf (gate, line, float32 lon) - see activations_codec.
+    # Deferred: only chart/regenerate/chat queries load it (undefer), lists and dashboards skip it
+    activations_packed = deferred(Column(LargeBinary, nullable=True))
+    # Definition split ("Single", "Split", "Triple Split", ...) and bridging gates
+    definition = Column(String(30), nullable=True)
+    bridging_gates = Column(JSON, nullable=True)
+    # chart_input_hash of the stored chart (birth data, system, engine version) - unchanged input skips regenerate
+    input_hash = Column(String(64), nullable=True)
+    # ENGINE_VERSION the chart columns were computed with (NULL = before versioning) - see engine_recompute
+    engine_version = Column(String(16), nullable=True)
+    # All chart variants (tropical/sidereal × degrees/days) with the birth-data hash they belong to;
+    # switching systems on regenerate is a lookup here - see service.pack_session_variants
+    variants = Column(JSON, nullable=True)
+    # Idempotency-Key z żądania /calculate - ponowienia zwracają zapisaną sesję
+    idempotency_key = Column(String(255), nullable=True)
     
     # Session metadata
     started_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -58,6 +73,26 @@ class HDSession(Base):
     user = relationship("User", back_populates="hd_sessions")
     chat_messages = relationship("HDChatMessage", back_populates="session", cascade="all, delete-orphan")
     summary = relationship("HDSummary", back_populates="session", uselist=False)
+    
+    @property
+    def activations(self) -> List[Dict]:
+        """Planetary activations [{side, planet, lon, gate, line}], decoded once per loaded value"""
+        packed = self.activations_packed
+        memo = self.__dict__.get("_activations_memo")
+        # Memo is keyed by the packed value itself, so a refresh from the DB invalidates it as well
+        if memo is None or memo[0] is not packed:
+            memo = (packed, unpack_activations(packed))
+            self.__dict__["_activations_memo"] = memo
+        return memo[1]
+    
+    @activations.setter
+    def activations(self, rows: Optional[List[Dict]]) -> None:
+        self.__dict__.pop("_activations_memo", None)
+        self.activations_packed = pack_activations(rows)
+    
+    __table_args__ = (
+        Index("ix_hd_sessions_user_idempotency", "user_id", "idempotency_key", unique=True),
+    )
 
 class HDChatMessage(Base):
     """Individual chat messages in HD session"""
@@ -87,3 +122,30 @@ class HDSummary(Base):
     
     # Relationships
     session = relationship("HDSession", back_populates="summary")
+
+class HDChartCache(Base):
+    """Persistent cache of computed charts keyed by canonical birth inputs"""
+    __tablename__ = "hd_chart_cache"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String(64), nullable=False, unique=True, index=True)  # sha256 of canonical inputs
+    engine_version = Column(String(20), nullable=False, index=True)
+    chart_data = Column(JSON, nullable=False)  # legacy-format chart_data from HumanDesignCalculator
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class HDTransitOverlay(Base):
+    """Daily transit overlay for an HD session (one row per session per day)"""
+    __tablename__ = "hd_transit_overlays"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(255), ForeignKey("hd_sessions.session_id", ondelete="CASCADE"), nullable=False)
+    day = Column(Date, nullable=False)
+    overlay = Column(JSON, nullable=False)  # completed channels, temporary centers, changes since yesterday
+    content_hash = Column(String(64), nullable=False)  # sha256 of overlay - rows are rewritten only when it changes
+    session_key = Column(String(40), nullable=True)  # zodiac + session gate mask the overlay was built from; stale when it differs
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        Index("ix_hd_transit_overlays_session_day", "session_id", "day", unique=True),
+        Index("ix_hd_transit_overlays_day", "day"),
+    )
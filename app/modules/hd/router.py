@@ -1,17 +1,30 @@
 # app/modules/hd/router.py
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 from app.core.database import get_db
 from app.core.models import User, AppSession
 from app.routers.auth import get_current_user_from_token
 from app.modules.hd.models import HDSession, HDChatMessage, HDSummary
 from app.modules.hd import service, schemas
-from app.modules.hd.data.gates_pl import GATES_PL
+from app.modules.hd.hd_calculator import ENGINE_VERSION, gate_mask, geocode_place, variant_key
+from app.modules.hd.chart_cache import chart_input_hash
+from app.modules.hd.bodygraph import (
+    activation_masks, bodygraph_cache, bodygraph_hash, bodygraph_key, parse_bodygraph_key
+)
+from app.modules.hd.gate_catalog import EncodedJSON, gate_catalog
+from app.modules.hd.single_flight import chart_flight
+from app.modules.hd.connections import MAX_MATRIX_SIZE, connection_chart, connection_matrix, group_chart
+from app.modules.hd.geocoding import local_gazetteer
+from app.modules.hd.transits import find_transits
+from app.modules.hd.transit_overlays import get_session_overlay
 from app.modules.hd.chat_router import router as hd_chat_router
 from app.config.ai_models import get_model_config
+import hashlib
 import time
 import uuid
 
@@ -29,105 +42,12 @@ def update_progress(progress: schemas.HDInitProgress):
     }
 
 @router.get("/cities/autocomplete")
-def autocomplete_cities(query: str = Query(..., min_length=2)):
-    """Autocomplete cities with country suggestions"""
-    try:
-        from geopy.geocoders import Nominatim
-        
-        geolocator = Nominatim(
-            user_agent="hd_backend",
-            timeout=10  # Increase timeout to 10 seconds
-        )
-        
-        # Search for places with the query
-        results = geolocator.geocode(
-            query, 
-            exactly_one=False, 
-            limit=10,
-            language="pl",
-            addressdetails=True,
-            timeout=10  # Additional timeout parameter
-        )
-        
-        if not results:
-            return {"cities": []}
-        
-        cities = []
-        for location in results:
-            address = location.raw.get("display_name", "")
-            parts = address.split(", ")
-            
-            # Extract city and country
-            city = parts[0] if len(parts) > 0 else ""
-            country = parts[-1] if len(parts) > 1 else ""
-            
-            # Create a clean display name
-            if len(parts) >= 2:
-                display_name = f"{city}, {country}"
-            else:
-                display_name = city
-            
-            cities.append({
-                "display_name": display_name,
-                "city": city,
-                "country": country,
-                "lat": location.latitude,
-                "lng": location.longitude,
-                "full_address": address
-            })
-        
-        # If no Polish cities found, add fallback Polish cities
-        polish_cities_found = any(city["country"] == "Polska" for city in cities)
-        if not polish_cities_found and len(query) >= 2:
-            fallback_cities = [
-                {"display_name": "Warszawa, Polska", "city": "Warszawa", "country": "Polska", "lat": 52.2297, "lng": 21.0122, "full_address": "Warszawa, Polska"},
-                {"display_name": "Kraków, Polska", "city": "Kraków", "country": "Polska", "lat": 50.0647, "lng": 19.9450, "full_address": "Kraków, Polska"},
-                {"display_name": "Gdańsk, Polska", "city": "Gdańsk", "country": "Polska", "lat": 54.3520, "lng": 18.6466, "full_address": "Gdańsk, Polska"},
-                {"display_name": "Gdynia, Polska", "city": "Gdynia", "country": "Polska", "lat": 54.5165, "lng": 18.5403, "full_address": "Gdynia, Polska"},
-                {"display_name": "Wrocław, Polska", "city": "Wrocław", "country": "Polska", "lat": 51.1079, "lng": 17.0385, "full_address": "Wrocław, Polska"},
-                {"display_name": "Poznań, Polska", "city": "Poznań", "country": "Polska", "lat": 52.4064, "lng": 16.9252, "full_address": "Poznań, Polska"}
-            ]
-            
-            # Filter fallback cities based on query
-            query_lower = query.lower()
-            for city in fallback_cities:
-                city_name_lower = city["city"].lower()
-                city_name_normalized = city_name_lower.replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ł', 'l').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z')
-                query_normalized = query_lower.replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ł', 'l').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z')
-                
-                if query_normalized in city_name_normalized or city_name_normalized.startswith(query_normalized):
-                    cities.insert(0, city)  # Add at the beginning
-        
-        return {"cities": cities}
-        
-    except Exception as e:
-        print(f"Error in autocomplete: {e}")
-        # Return some fallback cities for Poland
-        fallback_cities = [
-            {"display_name": "Warszawa, Polska", "city": "Warszawa", "country": "Polska", "lat": 52.2297, "lng": 21.0122, "full_address": "Warszawa, Polska"},
-            {"display_name": "Kraków, Polska", "city": "Kraków", "country": "Polska", "lat": 50.0647, "lng": 19.9450, "full_address": "Kraków, Polska"},
-            {"display_name": "Gdańsk, Polska", "city": "Gdańsk", "country": "Polska", "lat": 54.3520, "lng": 18.6466, "full_address": "Gdańsk, Polska"},
-            {"display_name": "Gdynia, Polska", "city": "Gdynia", "country": "Polska", "lat": 54.5165, "lng": 18.5403, "full_address": "Gdynia, Polska"},
-            {"display_name": "Wrocław, Polska", "city": "Wrocław", "country": "Polska", "lat": 51.1079, "lng": 17.0385, "full_address": "Wrocław, Polska"},
-            {"display_name": "Poznań, Polska", "city": "Poznań", "country": "Polska", "lat": 52.4064, "lng": 16.9252, "full_address": "Poznań, Polska"},
-            {"display_name": "Łódź, Polska", "city": "Łódź", "country": "Polska", "lat": 51.7592, "lng": 19.4560, "full_address": "Łódź, Polska"},
-            {"display_name": "Szczecin, Polska", "city": "Szczecin", "country": "Polska", "lat": 53.4285, "lng": 14.5528, "full_address": "Szczecin, Polska"}
-        ]
-        
-        # Filter fallback cities based on query (case insensitive, partial match)
-        query_lower = query.lower()
-        filtered_cities = []
-        
-        for city in fallback_cities:
-            city_name_lower = city["city"].lower()
-            # Remove Polish diacritics for better matching
-            city_name_normalized = city_name_lower.replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ł', 'l').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z')
-            query_normalized = query_lower.replace('ą', 'a').replace('ć', 'c').replace('ę', 'e').replace('ł', 'l').replace('ń', 'n').replace('ó', 'o').replace('ś', 's').replace('ź', 'z').replace('ż', 'z')
-            
-            if query_normalized in city_name_normalized or city_name_normalized.startswith(query_normalized):
-                filtered_cities.append(city)
-        
-        return {"cities": filtered_cities if filtered_cities else fallback_cities[:3]}
+def autocomplete_cities(query: str = Query(..., min_length=2), limit: int = Query(10, ge=1, le=50)):
+    """Autocomplete cities with country suggestions (local city index, no network calls)"""
+    gazetteer = local_gazetteer()
+    if gazetteer is None:
+        return {"cities": []}
+    return {"cities": [place.to_dict() for place in gazetteer.complete(query, limit=limit)]}
 
 @router.get("/init/progress/{user_id}")
 def read_progress(user_id: str):
@@ -140,38 +60,86 @@ def read_progress(user_id: str):
     }
 
 # ---------- CHART CALCULATION ----------
-@router.post("/calculate")
-def calculate_hd_chart(request: schemas.HDChartRequest):
-    """Calculate Human Design chart"""
+def _ensure_coordinates(request: schemas.HDChartRequest) -> None:
+    """Geokodowanie na wejściu - tylko gdy klient przysłał samą nazwę miejsca"""
+    if request.birth_lat is not None and request.birth_lng is not None:
+        return
+    try:
+        lat, lng, _ = geocode_place(request.birth_place)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not geocode birth place: {str(e)}")
+    request.birth_lat, request.birth_lng = lat, lng
+
+def _chart_response(session: HDSession) -> schemas.HDChartResponse:
+    """Odpowiedź z zapisanej sesji (z tłumaczeniem terminów)"""
+    response_data = {
+        "session_id": session.session_id,
+        "type": session.type,
+        "strategy": session.strategy,
+        "authority": session.authority,
+        "profile": session.profile,
+        "sun_gate": session.sun_gate,
+        "earth_gate": session.earth_gate,
+        "moon_gate": session.moon_gate,
+        "north_node_gate": session.north_node_gate,
+        "south_node_gate": session.south_node_gate,
+        "defined_centers": session.defined_centers or [],
+        "undefined_centers": session.undefined_centers or [],
+        "defined_channels": session.defined_channels or [],
+        "active_gates": session.active_gates or [],
+        "activations": session.activations or [],
+        "definition": session.definition,
+        "bridging_gates": session.bridging_gates or []
+    }
+    
+    # Apply Polish translations
+    translated_data = service.translate_hd_terms_to_polish(response_data)
+    
+    return schemas.HDChartResponse(**translated_data)
+
+def _flight_key(request: schemas.HDChartRequest, *scope: str) -> str:
+    """Klucz single-flight: kanoniczny hash danych wykresu + pola zapisywane w sesji"""
+    chart_hash = chart_input_hash(
+        request.birth_date, request.birth_time, request.birth_lat, request.birth_lng,
+        request.zodiac_system, request.calculation_method
+    )
+    payload = "\x1f".join([*scope, request.user_id, request.name, request.birth_place, chart_hash])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _compute_chart(request: schemas.HDChartRequest):
+    """(chart_data wybranego systemu, warianty do zapisu w sesji); błąd obliczeń kończy się 500, nie zapisem mocka"""
+    calculator = service.HumanDesignCalculator()
+    variants = calculator.calculate_chart_variants(
+        request.birth_date,
+        request.birth_time,
+        request.birth_lat,
+        request.birth_lng,
+        request.birth_place
+    )
+    input_hash = service.birth_input_hash(request.birth_date, request.birth_time,
+                                          request.birth_lat, request.birth_lng)
+    chart_data = variants[variant_key(request.zodiac_system, request.calculation_method)]
+    return chart_data, service.pack_session_variants(variants, input_hash)
+
+def _calculate(request: schemas.HDChartRequest, idempotency_key: Optional[str]) -> schemas.HDChartResponse:
+    """Obliczenie i zapis nowej sesji (blokujące - wykonywane w puli wątków)"""
+    existing = service.get_session_by_idempotency_key(request.user_id, idempotency_key)
+    if existing:
+        print(f"♻️ HD Calculation replayed for Idempotency-Key {idempotency_key}: {existing.session_id}")
+        return _chart_response(existing)
     try:
         print(f"🔄 HD Calculation started for {request.name}")
         print(f"📅 Birth data: {request.birth_date} {request.birth_time}")
         print(f"📍 Location: {request.birth_place} ({request.birth_lat}, {request.birth_lng})")
         print(f"🔧 Settings: {request.zodiac_system}, {request.calculation_method}")
         
-        calculator = service.HumanDesignCalculator()
-        
-        # Calculate chart data
-        chart_data = calculator.calculate_chart(
-            request.birth_date,
-            request.birth_time,
-            request.birth_lat,
-            request.birth_lng,
-            request.zodiac_system,
-            request.calculation_method,
-            request.birth_place
-        )
+        # Wszystkie warianty systemów naraz - późniejsza zmiana systemu to odczyt z sesji
+        chart_data, variants = _compute_chart(request)
         
         print(f"✅ HD Calculation completed successfully")
         
-        # Determine Human Design components
-        type = calculator.determine_type(chart_data)
-        strategy = calculator.get_strategy(type)
-        authority = calculator.get_authority(chart_data)
-        profile = calculator.get_profile(chart_data)
-        
-        # Create session ID
-        session_id = f"{request.user_id}-hd-{int(time.time())}"
+        # Create session ID (sufiks - różne wykresy liczone w tej samej sekundzie)
+        session_id = f"{request.user_id}-hd-{int(time.time())}-{uuid.uuid4().hex[:6]}"
         
         # Prepare session data
         session_data = {
@@ -184,48 +152,17 @@ def calculate_hd_chart(request: schemas.HDChartRequest):
             "birth_lng": request.birth_lng,
             "zodiac_system": request.zodiac_system,
             "calculation_method": request.calculation_method,
-            "type": type,
-            "strategy": strategy,
-            "authority": authority,
-            "profile": profile,
-            "sun_gate": chart_data.get("sun", {}).get("gate", 1),
-            "earth_gate": chart_data.get("earth", {}).get("gate", 2),
-            "moon_gate": chart_data.get("moon", {}).get("gate", 3),
-            "north_node_gate": chart_data.get("north_node", {}).get("gate", 4),
-            "south_node_gate": chart_data.get("south_node", {}).get("gate", 5),
-            "defined_centers": chart_data.get("centers", {}).get("defined", []),
-            "undefined_centers": chart_data.get("centers", {}).get("undefined", []),
-            "defined_channels": chart_data.get("channels", {}).get("defined", []),
-            "active_gates": chart_data.get("active_gates", []),
-            "activations": chart_data.get("activations", [])
+            **service.session_fields_from_chart(chart_data),
+            "input_hash": chart_input_hash(request.birth_date, request.birth_time, request.birth_lat,
+                                           request.birth_lng, request.zodiac_system, request.calculation_method),
+            "variants": variants,
+            "idempotency_key": idempotency_key
         }
         
         # Save to database
         session = service.save_hd_session_to_db(request.user_id, session_data)
         
-        # Create response data dict for translation
-        response_data = {
-            "session_id": session.session_id,
-            "type": session.type,
-            "strategy": session.strategy,
-            "authority": session.authority,
-            "profile": session.profile,
-            "sun_gate": session.sun_gate,
-            "earth_gate": session.earth_gate,
-            "moon_gate": session.moon_gate,
-            "north_node_gate": session.north_node_gate,
-            "south_node_gate": session.south_node_gate,
-            "defined_centers": session.defined_centers or [],
-            "undefined_centers": session.undefined_centers or [],
-            "defined_channels": session.defined_channels or [],
-            "active_gates": session.active_gates or [],
-            "activations": session.activations or []
-        }
-        
-        # Apply Polish translations
-        translated_data = service.translate_hd_terms_to_polish(response_data)
-        
-        return schemas.HDChartResponse(**translated_data)
+        return _chart_response(session)
         
     except Exception as e:
         print(f"❌ HD Calculation failed: {str(e)}")
@@ -234,39 +171,23 @@ def calculate_hd_chart(request: schemas.HDChartRequest):
         print(f"❌ Traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error calculating chart: {str(e)}")
 
+@router.post("/calculate")
+async def calculate_hd_chart(request: schemas.HDChartRequest,
+                             idempotency_key: Optional[str] = Header(None)):
+    """Calculate Human Design chart"""
+    await run_in_threadpool(_ensure_coordinates, request)
+    # Identyczne równoległe żądania (podwójne kliknięcie, ponowienie) liczone są raz
+    key = _flight_key(request, "calculate", idempotency_key or "")
+    return await chart_flight.run(key, _calculate, request, idempotency_key)
+
 @router.get("/chart/{session_id}")
 def get_hd_chart(session_id: str):
     """Get Human Design chart by session ID"""
-    session = service.get_hd_session(session_id)
+    session = service.get_hd_session(session_id, with_activations=True)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    # Backfill planetary activations for older sessions (pre-activations column)
-    if not session.activations or len(session.activations) == 0:
-        try:
-            calculator = service.HumanDesignCalculator()
-            chart_data = calculator.calculate_chart(
-                session.birth_date,
-                session.birth_time,
-                session.birth_lat,
-                session.birth_lng,
-                session.zodiac_system,
-                session.calculation_method,
-                session.birth_place
-            )
-            session.activations = chart_data.get("activations", [])
-            # also backfill active_gates if missing
-            if not session.active_gates:
-                session.active_gates = chart_data.get("active_gates", [])
-            db = next(get_db())
-            try:
-                session = db.merge(session)
-                db.commit()
-                db.refresh(session)
-            finally:
-                db.close()
-        except Exception as e:
-            print(f"WARN: could not backfill activations: {e}")
+    # Starsze sesje bez aktywacji uzupełnia zadanie: python -m app.modules.hd.activations_backfill
     
     # Create session data dict for translation
     session_data = {
@@ -294,6 +215,7 @@ def get_hd_chart(session_id: str):
         "defined_channels": session.defined_channels or [],
         "active_gates": session.active_gates or [],
         "activations": session.activations or [],
+        **service.get_session_definition(session),
         "status": session.status,
         "started_at": session.started_at.isoformat(),
         "ended_at": session.ended_at.isoformat() if session.ended_at else None
@@ -304,114 +226,48 @@ def get_hd_chart(session_id: str):
     
     return schemas.HDSessionData(**translated_data)
 
-@router.post("/chart/{session_id}/regenerate")
-def regenerate_hd_chart(session_id: str, request: schemas.HDChartRequest):
-    """Regenerate Human Design chart with new calculation system"""
-    print(f"🔄 Regenerate HD called - session_id: {session_id}, request.user_id: {request.user_id}")
+def _regenerate(session_id: str, request: schemas.HDChartRequest) -> schemas.HDChartResponse:
+    """Przeliczenie istniejącej sesji (blokujące - wykonywane w puli wątków)"""
     try:
-        # Get existing session
-        existing_session = service.get_hd_session(session_id)
-        print(f"📊 Existing session found: {existing_session}")
+        existing_session = service.get_hd_session(session_id, with_activations=True)
         if not existing_session:
-            print("❌ Session not found")
             raise HTTPException(status_code=404, detail="Session not found")
         
         # Check if user owns this session
-        print(f"🔐 Checking access - existing_session.user_id: '{existing_session.user_id}', request.user_id: '{request.user_id}'")
         if existing_session.user_id != request.user_id:
-            print(f"❌ Access denied - user IDs don't match")
             raise HTTPException(status_code=403, detail="Access denied")
         
-        calculator = service.HumanDesignCalculator()
-        
-        # Calculate chart data with new parameters
-        chart_data = calculator.calculate_chart(
-            request.birth_date,
-            request.birth_time,
-            request.birth_lat,
-            request.birth_lng,
-            request.zodiac_system,
-            request.calculation_method,
-            request.birth_place
-        )
-        
-        # Determine Human Design components
-        type = calculator.determine_type(chart_data)
-        strategy = calculator.get_strategy(type)
-        authority = calculator.get_authority(chart_data)
-        profile = calculator.get_profile(chart_data)
-        
-        print(f"DEBUG: Regenerating with new data:")
-        print(f"  Birth date: {request.birth_date}")
-        print(f"  Birth time: {request.birth_time}")
-        print(f"  Birth place: {request.birth_place}")
-        print(f"  Zodiac system: {request.zodiac_system}")
-        print(f"  Calculation method: {request.calculation_method}")
-        print(f"  Chart data keys: {list(chart_data.keys())}")
-        print(f"  Calculated type: {type}")
-        print(f"  Calculated strategy: {strategy}")
-        print(f"  Calculated authority: {authority}")
-        print(f"  Calculated profile: {profile}")
-        print(f"  OLD session type: {existing_session.type}")
-        print(f"  OLD session strategy: {existing_session.strategy}")
-        
-        # Update existing session with new data
-        existing_session.name = request.name
-        existing_session.birth_date = request.birth_date
-        existing_session.birth_time = request.birth_time
-        existing_session.birth_place = request.birth_place
-        existing_session.birth_lat = request.birth_lat
-        existing_session.birth_lng = request.birth_lng
-        existing_session.zodiac_system = request.zodiac_system
-        existing_session.calculation_method = request.calculation_method
-        existing_session.type = type
-        existing_session.strategy = strategy
-        existing_session.authority = authority
-        existing_session.profile = profile
-        existing_session.sun_gate = chart_data.get("sun", {}).get("gate", 1)
-        existing_session.earth_gate = chart_data.get("earth", {}).get("gate", 2)
-        existing_session.moon_gate = chart_data.get("moon", {}).get("gate", 3)
-        existing_session.north_node_gate = chart_data.get("north_node", {}).get("gate", 4)
-        existing_session.south_node_gate = chart_data.get("south_node", {}).get("gate", 5)
-        existing_session.defined_centers = chart_data.get("centers", {}).get("defined", [])
-        existing_session.undefined_centers = chart_data.get("centers", {}).get("undefined", [])
-        existing_session.defined_channels = chart_data.get("channels", {}).get("defined", [])
-        existing_session.active_gates = chart_data.get("active_gates", [])
-        existing_session.activations = chart_data.get("activations", [])
-        
-        # Save updated session
-        db = next(get_db())
-        try:
-            # Merge the session into the new db session
-            existing_session = db.merge(existing_session)
-            db.commit()
-            db.refresh(existing_session)
-            
-            # Create response data dict for translation
-            response_data = {
-                "session_id": existing_session.session_id,
-                "type": existing_session.type,
-                "strategy": existing_session.strategy,
-                "authority": existing_session.authority,
-                "profile": existing_session.profile,
-                "sun_gate": existing_session.sun_gate,
-                "earth_gate": existing_session.earth_gate,
-                "moon_gate": existing_session.moon_gate,
-                "north_node_gate": existing_session.north_node_gate,
-                "south_node_gate": existing_session.south_node_gate,
-                "defined_centers": existing_session.defined_centers,
-                "undefined_centers": existing_session.undefined_centers,
-                "defined_channels": existing_session.defined_channels,
-                "active_gates": existing_session.active_gates or [],
-                "activations": existing_session.activations or []
-            }
-            
-            # Apply Polish translations
-            translated_data = service.translate_hd_terms_to_polish(response_data)
-            
-            return schemas.HDChartResponse(**translated_data)
-        finally:
-            db.close()
+        values = {
+            "name": request.name,
+            "birth_date": request.birth_date,
+            "birth_time": request.birth_time,
+            "birth_place": request.birth_place,
+            "birth_lat": request.birth_lat,
+            "birth_lng": request.birth_lng,
+            "zodiac_system": request.zodiac_system,
+            "calculation_method": request.calculation_method,
+        }
+        # Ten sam hash wejścia (dane urodzenia, system, wersja silnika) - wykres zapisany w sesji jest aktualny
+        input_hash = chart_input_hash(request.birth_date, request.birth_time, request.birth_lat,
+                                      request.birth_lng, request.zodiac_system, request.calculation_method)
+        if existing_session.input_hash != input_hash:
+            # Zmiana samego systemu przy tych samych danych urodzenia - wariant zapisany przy sesji
+            birth_hash = service.birth_input_hash(request.birth_date, request.birth_time,
+                                                  request.birth_lat, request.birth_lng)
+            fields = service.stored_variant(existing_session, request.zodiac_system,
+                                            request.calculation_method, birth_hash)
+            if fields is None:
+                chart_data, variants = _compute_chart(request)
+                fields = service.session_fields_from_chart(chart_data)
+                values["variants"] = variants
+            values.update(fields, input_hash=input_hash, engine_version=ENGINE_VERSION)
+        
+        # Zapisywane są tylko kolumny, które faktycznie się zmieniły
+        changes = service.changed_columns(existing_session, values)
+        if not changes:
+            return _chart_response(existing_session)
+        print(f"🔄 Regenerate HD {session_id}: {', '.join(sorted(changes))}")
+        return _chart_response(service.update_hd_session(session_id, changes))
             
     except HTTPException as he:
         # Re-raise HTTP exceptions without wrapping
@@ -423,6 +279,13 @@ def regenerate_hd_chart(session_id: str, request: schemas.HDChartRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error regenerating chart: {str(e)}")
 
+@router.post("/chart/{session_id}/regenerate")
+async def regenerate_hd_chart(session_id: str, request: schemas.HDChartRequest):
+    """Regenerate Human Design chart with new calculation system"""
+    await run_in_threadpool(_ensure_coordinates, request)
+    key = _flight_key(request, "regenerate", session_id)
+    return await chart_flight.run(key, _regenerate, session_id, request)
+
 # ---------- CHAT ----------
 # Chat functionality moved to chat_router.py
 
@@ -514,29 +377,158 @@ def get_user_hd_dashboard(user_id: str):
         db.close()
 
 # ---------- GATES DATA ----------
+# Opisy bramek zmieniają się tylko z wdrożeniem - dzień w cache, potem potwierdzenie ETagiem
+GATES_CACHE_CONTROL = "public, max-age=86400"
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    return bool(if_none_match) and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")])
+
+def _encoded_json_response(encoded: EncodedJSON, if_none_match: Optional[str],
+                           accept_encoding: Optional[str]) -> Response:
+    """Gotowe bajty JSON (gzip, jeśli klient przyjmuje) albo 304 przy zgodnym ETagu"""
+    use_gzip = "gzip" in (accept_encoding or "").lower()
+    headers = {
+        "ETag": encoded.gzip_etag if use_gzip else encoded.etag,
+        "Cache-Control": GATES_CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=encoded.gzipped, media_type="application/json", headers=headers)
+    return Response(content=encoded.body, media_type="application/json", headers=headers)
+
 @router.get("/gates/{language}")
-async def get_gates(language: str = "pl"):
+async def get_gates(language: str = "pl", if_none_match: Optional[str] = Header(None),
+                    accept_encoding: Optional[str] = Header(None)):
     """
     Pobiera dane bramek w określonym języku
     """
-    if language == "pl":
-        return GATES_PL
-    else:
-        # W przyszłości można dodać inne języki
+    catalog = gate_catalog.catalog(language)
+    if catalog is None:
         raise HTTPException(status_code=404, detail=f"Language {language} not supported")
+    return _encoded_json_response(catalog, if_none_match, accept_encoding)
 
 @router.get("/gates/{language}/{gate_number}")
-async def get_gate_info(language: str = "pl", gate_number: int = None):
+async def get_gate_info(language: str = "pl", gate_number: int = None, if_none_match: Optional[str] = Header(None),
+                        accept_encoding: Optional[str] = Header(None)):
     """
     Pobiera informacje o konkretnej bramce
     """
-    if language == "pl":
-        if gate_number in GATES_PL:
-            return GATES_PL[gate_number]
-        else:
-            raise HTTPException(status_code=404, detail=f"Gate {gate_number} not found")
-    else:
+    if gate_catalog.pack(language) is None:
         raise HTTPException(status_code=404, detail=f"Language {language} not supported")
+    gate = gate_catalog.gate(language, gate_number)
+    if gate is None:
+        raise HTTPException(status_code=404, detail=f"Gate {gate_number} not found")
+    return _encoded_json_response(gate, if_none_match, accept_encoding)
+
+# ---------- TRANSITS ----------
+@router.get("/transits")
+def get_transits(
+    start: date = Query(..., description="Pierwszy dzień (UTC), np. 2026-01-01"),
+    end: Optional[date] = Query(None, description="Ostatni dzień (UTC) włącznie; domyślnie = start"),
+    planets: Optional[str] = Query(None, description="Lista ciał oddzielona przecinkami, np. Sun,Moon"),
+    kind: str = Query("line", regex="^(line|gate)$")
+):
+    """Momenty wejścia planet w nową bramkę lub linię w zakresie dat"""
+    end = end or start
+    planet_list = [p.strip() for p in planets.split(",") if p.strip()] if planets else None
+    try:
+        events = find_transits(start, end, planet_list, kind)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "kind": kind,
+        "events": events,
+        "total": len(events)
+    }
+
+@router.get("/chart/{session_id}/transits")
+def get_session_transits(
+    session_id: str,
+    day: Optional[date] = Query(None, description="Dzień (UTC); domyślnie dzisiaj")
+):
+    """Dzienna nakładka tranzytów na wykres sesji (dopełnione kanały, chwilowo zdefiniowane centra)"""
+    day = day or datetime.utcnow().date()
+    overlay = get_session_overlay(session_id, day)
+    if overlay is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return overlay
+
+# ---------- BODYGRAPH ----------
+# Treść pod adresem z maskami nigdy się nie zmienia - rok w cache bez rewalidacji
+BODYGRAPH_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+@router.get("/chart/{session_id}/bodygraph.svg")
+def get_bodygraph_svg(session_id: str, request: Request):
+    """Bodygraph sesji - przekierowanie na niezmienny adres treści (regeneracja sesji zmienia adres, nie treść)"""
+    session = service.get_hd_session(session_id, with_activations=True)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    personality_mask, design_mask = activation_masks(session.activations, session.active_gates)
+    url = request.url_for("get_bodygraph_by_key", key=bodygraph_key(personality_mask, design_mask))
+    return RedirectResponse(str(url), status_code=307, headers={"Cache-Control": "no-cache"})
+
+@router.get("/bodygraph/{key}.svg")
+def get_bodygraph_by_key(key: str, if_none_match: Optional[str] = Header(None)):
+    """Bodygraph jako SVG pod adresem treści (cache po hashu masek bramek, mocny ETag)"""
+    masks = parse_bodygraph_key(key)
+    if masks is None:
+        raise HTTPException(status_code=404, detail="Bodygraph not found")
+    etag = f'"{bodygraph_hash(*masks)}"'
+    headers = {"ETag": etag, "Cache-Control": BODYGRAPH_CACHE_CONTROL}
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    _, svg = bodygraph_cache.get(*masks)
+    return Response(content=svg, media_type="image/svg+xml", headers=headers)
+
+# ---------- CONNECTIONS ----------
+@router.get("/connection/{session_a}/{session_b}")
+def get_connection_chart(session_a: str, session_b: str):
+    """Wykres połączenia dwóch sesji (z zapisanych bramek, bez efemeryd)"""
+    sessions = service.get_sessions_gates([session_a, session_b])
+    missing = [sid for sid in (session_a, session_b) if sid not in sessions]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Session not found: {', '.join(missing)}")
+    a, b = sessions[session_a], sessions[session_b]
+    return {
+        "a": {"session_id": session_a, "name": a["name"]},
+        "b": {"session_id": session_b, "name": b["name"]},
+        **connection_chart(gate_mask(a["active_gates"]), gate_mask(b["active_gates"]))
+    }
+
+@router.post("/connection/matrix")
+def get_connection_matrix(request: schemas.HDConnectionMatrixRequest):
+    """Macierz N × N liczby kanałów połączenia (electromagnetic / dominance / compromise / companionship)"""
+    session_ids = list(dict.fromkeys(request.session_ids))
+    if len(session_ids) > MAX_MATRIX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many sessions (max {MAX_MATRIX_SIZE})")
+    sessions = service.get_sessions_gates(session_ids)
+    found = [sid for sid in session_ids if sid in sessions]
+    matrix = connection_matrix([gate_mask(sessions[sid]["active_gates"]) for sid in found])
+    return {
+        "session_ids": found,
+        "names": [sessions[sid]["name"] for sid in found],
+        "missing": [sid for sid in session_ids if sid not in sessions],
+        "matrix": {kind: values.tolist() for kind, values in matrix.items()}
+    }
+
+@router.post("/group")
+def get_group_chart(request: schemas.HDGroupRequest):
+    """Wykres grupy (suma bramek członków, kanały i centra definiowane przez grupę)"""
+    session_ids = list(dict.fromkeys(request.session_ids))
+    if len(session_ids) > MAX_MATRIX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Too many sessions (max {MAX_MATRIX_SIZE})")
+    sessions = service.get_sessions_gates(session_ids)
+    if not sessions:
+        raise HTTPException(status_code=404, detail="No sessions found")
+    chart = group_chart({sid: gate_mask(data["active_gates"]) for sid, data in sessions.items()})
+    chart["names"] = {sid: data["name"] for sid, data in sessions.items()}
+    chart["missing"] = [sid for sid in session_ids if sid not in sessions]
+    return chart
 
 # Dodaj router HD chat
 router.include_router(hd_chat_router)
@@ -25,8 +25,9 @@ class HDChartRequest(BaseModel):
     birth_date: datetime
     birth_time: str
     birth_place: str
-    birth_lat: float
-    birth_lng: float
+    # Współrzędne z autocomplete; gdy brak, miejsce jest geokodowane na wejściu
+    birth_lat: Optional[float] = None
+    birth_lng: Optional[float] = None
     # System obliczeń
     zodiac_system: str = "tropical"  # "tropical" or "sidereal"
     calculation_method: str = "degrees"  # "days" or "degrees"
@@ -48,6 +49,15 @@ class HDChartResponse(BaseModel):
     active_gates: List[int]
     # Planetary activations grouped by side
     activations: List[dict] | None = None
+    definition: Optional[str] = None
+    bridging_gates: List[int] | None = None
+
+# --- CONNECTIONS ---
+class HDConnectionMatrixRequest(BaseModel):
+    session_ids: List[str]
+
+class HDGroupRequest(BaseModel):
+    session_ids: List[str]
 
 # --- CHAT ---
 class HDChatMessage(BaseModel):
@@ -93,6 +103,8 @@ class HDSessionData(BaseModel):
     defined_channels: List[str]
     active_gates: List[int]
     activations: List[dict] | None = None
+    definition: Optional[str] = None
+    bridging_gates: List[int] | None = None
     status: str
     started_at: str
     ended_at: Optional[str] = None
@@ -1,12 +1,20 @@
 # app/modules/hd/service.py
 import requests
+import base64
 import json
 from datetime import datetime
 from typing import Dict, List, Optional
 from app.modules.hd.models import HDSession, HDChatMessage, HDSummary
 from app.core.database import get_db
-from sqlalchemy.orm import Session
-from app.modules.hd.hd_calculator import compute_hd_chart
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy.exc import IntegrityError
+from app.modules.hd.hd_calculator import (
+    CALCULATION_METHODS, ENGINE_VERSION, ZODIAC_SYSTEMS, analyze_definition, variant_key
+)
+from app.modules.hd.ephemeris_pool import run_chart, run_chart_variants
+from app.modules.hd.activations_codec import pack_activations, unpack_activations
+from app.modules.hd.chart_cache import chart_cache, chart_input_hash
+from app.modules.hd.geocoding import local_gazetteer
 
 def translate_hd_terms_to_polish(data: Dict) -> Dict:
     """Translate Human Design terms from English to Polish"""
@@ -28,6 +36,15 @@ def translate_hd_terms_to_polish(data: Dict) -> Dict:
         "To Wait a Lunar Cycle": "Czekać na cykl księżycowy"
     }
     
+    # Definition translations
+    definition_translations = {
+        "None": "Brak definicji",
+        "Single": "Pojedyncza",
+        "Split": "Podwójna (split)",
+        "Triple Split": "Potrójna",
+        "Quadruple Split": "Poczwórna"
+    }
+    
     # Authority translations
     authority_translations = {
         "Sacral": "Sakralny",
@@ -55,6 +72,10 @@ def translate_hd_terms_to_polish(data: Dict) -> Dict:
     if "strategy" in translated_data:
         translated_data["strategy"] = strategy_translations.get(translated_data["strategy"], translated_data["strategy"])
     
+    # Translate definition
+    if translated_data.get("definition"):
+        translated_data["definition"] = definition_translations.get(translated_data["definition"], translated_data["definition"])
+    
     # Translate authority
     if "authority" in translated_data:
         translated_data["authority"] = authority_translations.get(translated_data["authority"], translated_data["authority"])
@@ -71,48 +92,77 @@ class HumanDesignCalculator:
     def calculate_chart(self, birth_date: datetime, birth_time: str, birth_lat: float, birth_lng: float, 
                         zodiac_system: str = "tropical", calculation_method: str = "degrees",
                         birth_place: Optional[str] = None) -> Dict:
-        """Calculate Human Design chart using Swiss Ephemeris"""
-        try:
-            # Konwersja daty na string
-            date_str = birth_date.strftime("%Y-%m-%d")
-            
-            # Preferuj nazwę miejsca z żądania; w przeciwnym razie spróbuj geokodowania wstecznego
-            place_name = birth_place or None
-            if not place_name:
-                try:
-                    from geopy.geocoders import Nominatim
-                    geolocator = Nominatim(user_agent="hd_backend")
-                    location = geolocator.reverse(f"{birth_lat}, {birth_lng}", language="pl")
-                    place_name = location.address if location else f"Lat: {birth_lat}, Lng: {birth_lng}"
-                except:
-                    place_name = f"Lat: {birth_lat}, Lng: {birth_lng}"
-            
-            print(f"🔍 DEBUG: Computing HD chart with:")
-            print(f"   Date: {date_str}, Time: {birth_time}")
-            print(f"   Place: {place_name}")
-            print(f"   Zodiac: {zodiac_system}, Method: {calculation_method}")
-            
-            result = compute_hd_chart(
-                name="User",  # Będzie zastąpione w routerze
-                date_str=date_str,
-                time_str=birth_time,
-                place=place_name,
-                zodiac_system=zodiac_system,
-                calculation_method=calculation_method
-            )
-            
-            print(f"✅ DEBUG: HD calculation result: {result.get('summary', {})}")
-            
-            # Konwersja na format oczekiwany przez resztę aplikacji
-            chart_data = self._convert_to_legacy_format(result)
-            # Zapisz chart_data dla używania w innych metodach
-            self._last_chart_data = chart_data
-            return chart_data
-            
-        except Exception as e:
-            print(f"Error calculating chart: {e}")
-            # Fallback do mock data w przypadku błędu
-            return self._get_mock_chart_data(zodiac_system, calculation_method)
+        """Calculate Human Design chart using Swiss Ephemeris (błąd obliczeń zgłaszany wyjątkiem)"""
+        # Ten sam zestaw danych urodzenia mógł już być policzony (L1 pamięć / L2 baza)
+        cache_key = chart_input_hash(birth_date, birth_time, birth_lat, birth_lng,
+                                     zodiac_system, calculation_method)
+        cached = chart_cache.get(cache_key)
+        if cached is not None:
+            self._last_chart_data = cached
+            return cached
+        
+        # Konwersja daty na string
+        date_str = birth_date.strftime("%Y-%m-%d")
+        
+        place_name = self._place_name(birth_place, birth_lat, birth_lng)
+        
+        result = run_chart(
+            name="User",  # Będzie zastąpione w routerze
+            date_str=date_str,
+            time_str=birth_time,
+            lat=birth_lat,
+            lon=birth_lng,
+            place=place_name,
+            zodiac_system=zodiac_system,
+            calculation_method=calculation_method
+        )
+        
+        # Konwersja na format oczekiwany przez resztę aplikacji
+        chart_data = self._convert_to_legacy_format(result)
+        # Zapisz chart_data dla używania w innych metodach
+        self._last_chart_data = chart_data
+        chart_cache.put(cache_key, chart_data)
+        return chart_data
+    
+    def calculate_chart_variants(self, birth_date: datetime, birth_time: str, birth_lat: float,
+                                 birth_lng: float, birth_place: Optional[str] = None) -> Dict[str, Dict]:
+        """
+        Wszystkie warianty wykresu (tropical/sidereal × degrees/days) w jednym przebiegu silnika.
+        Zwraca {variant_key: chart_data}. Błąd obliczeń jest zgłaszany wyjątkiem (bez danych mock) -
+        wynik trafia do sesji razem z input_hash i ENGINE_VERSION, więc nie może być zastępczy.
+        """
+        cache_keys = {
+            variant_key(zodiac, method): chart_input_hash(birth_date, birth_time, birth_lat, birth_lng,
+                                                          zodiac, method)
+            for zodiac in ZODIAC_SYSTEMS for method in CALCULATION_METHODS
+        }
+        cached = {key: chart_cache.get(cache_key) for key, cache_key in cache_keys.items()}
+        if all(chart is not None for chart in cached.values()):
+            return cached
+        
+        date_str = birth_date.strftime("%Y-%m-%d")
+        place_name = self._place_name(birth_place, birth_lat, birth_lng)
+        results = run_chart_variants(
+            name="User",  # Będzie zastąpione w routerze
+            date_str=date_str,
+            time_str=birth_time,
+            lat=birth_lat,
+            lon=birth_lng,
+            place=place_name
+        )
+        variants = {}
+        for key, result in results.items():
+            variants[key] = self._convert_to_legacy_format(result)
+            chart_cache.put(cache_keys[key], variants[key])
+        return variants
+    
+    def _place_name(self, birth_place: Optional[str], birth_lat: float, birth_lng: float) -> str:
+        """Współrzędne są znane - nazwa miejsca służy tylko do opisu (bez zapytań sieciowych)"""
+        if birth_place:
+            return birth_place
+        gazetteer = local_gazetteer()
+        nearest = gazetteer.reverse(birth_lat, birth_lng) if gazetteer else None
+        return nearest.display_name if nearest else f"Lat: {birth_lat}, Lng: {birth_lng}"
     
     def _convert_to_legacy_format(self, hd_result: Dict) -> Dict:
         """Konwersja wyniku z prawdziwych obliczeń na format legacy"""
@@ -155,52 +205,19 @@ class HumanDesignCalculator:
             },
             "hd_summary": summary,
             "active_gates": summary.get("active_gates", []),
+            "definition": summary.get("definition"),
+            "bridging_gates": summary.get("bridging_gates", []),
             "activations": hd_result.get("positions", [])
         }
         return converted
     
-    def _get_mock_chart_data(self, zodiac_system: str = "tropical", calculation_method: str = "degrees") -> Dict:
-        """Mock chart data for testing with different calculation systems"""
-        # Simulate different results based on calculation system
-        base_gate = 1
-        if zodiac_system == "tropical":
-            base_gate = 2  # Different gate for tropical
-        if calculation_method == "days":
-            base_gate += 1  # Different gate for days calculation
-            
-        return {
-            "sun": {"gate": base_gate, "line": 1},
-            "earth": {"gate": base_gate + 1, "line": 1},
-            "moon": {"gate": base_gate + 2, "line": 1},
-            "north_node": {"gate": base_gate + 3, "line": 1},
-            "south_node": {"gate": base_gate + 4, "line": 1},
-            "centers": {
-                "defined": ["Root", "Sacral", "Solar Plexus"],
-                "undefined": ["Head", "Ajna", "Throat", "G", "Heart", "Spleen"]
-            },
-            "channels": {
-                "defined": ["1-8", "2-14", "3-60"]
-            },
-            "calculation_info": {
-                "zodiac_system": zodiac_system,
-                "calculation_method": calculation_method,
-                "description": f"Calculated using {zodiac_system} zodiac and {calculation_method} method"
-            }
-        }
-    
     def determine_type(self, chart_data: Dict) -> str:
         """Determine Human Design type based on chart data"""
-        print(f"DEBUG: determine_type called with chart_data keys: {list(chart_data.keys())}")
-        print(f"DEBUG: chart_data has hd_summary: {'hd_summary' in chart_data}")
-        
         # Użyj prawdziwych obliczeń jeśli dostępne
         if "hd_summary" in chart_data:
-            hd_type = chart_data["hd_summary"].get("type", "Unknown")
-            print(f"DEBUG: Using hd_summary type: {hd_type}")
-            return hd_type
+            return chart_data["hd_summary"].get("type", "Unknown")
         
         # Fallback do starej logiki
-        print(f"DEBUG: Using fallback logic")
         defined_centers = chart_data.get("centers", {}).get("defined", [])
         
         if "Sacral" in defined_centers:
@@ -266,6 +283,82 @@ class HumanDesignCalculator:
         
         return f"{personality_line}/{design_line}"
 
+def session_fields_from_chart(chart_data: Dict) -> Dict:
+    """Kolumny wykresu sesji HDSession (typ, bramki, centra, aktywacje...) z chart_data"""
+    calculator = HumanDesignCalculator()
+    calculator._last_chart_data = chart_data
+    hd_type = calculator.determine_type(chart_data)
+    return {
+        "type": hd_type,
+        "strategy": calculator.get_strategy(hd_type),
+        "authority": calculator.get_authority(chart_data),
+        "profile": calculator.get_profile(chart_data),
+        "sun_gate": chart_data.get("sun", {}).get("gate", 1),
+        "earth_gate": chart_data.get("earth", {}).get("gate", 2),
+        "moon_gate": chart_data.get("moon", {}).get("gate", 3),
+        "north_node_gate": chart_data.get("north_node", {}).get("gate", 4),
+        "south_node_gate": chart_data.get("south_node", {}).get("gate", 5),
+        "defined_centers": chart_data.get("centers", {}).get("defined", []),
+        "undefined_centers": chart_data.get("centers", {}).get("undefined", []),
+        "defined_channels": chart_data.get("channels", {}).get("defined", []),
+        "active_gates": chart_data.get("active_gates", []),
+        "activations": chart_data.get("activations", []),
+        "definition": chart_data.get("definition"),
+        "bridging_gates": chart_data.get("bridging_gates", []),
+    }
+
+def birth_input_hash(birth_date, birth_time: str, birth_lat: float, birth_lng: float) -> str:
+    """Hash danych urodzenia wspólny dla wszystkich wariantów (zawiera wersję silnika)"""
+    return chart_input_hash(birth_date, birth_time, birth_lat, birth_lng,
+                            zodiac_system="all", calculation_method="all")
+
+def pack_session_variants(variants: Dict[str, Dict], input_hash: str) -> Dict:
+    """Warianty wykresu do kolumny hd_sessions.variants (aktywacje w formacie activations_codec, base64)"""
+    charts = {}
+    for key, chart_data in variants.items():
+        fields = session_fields_from_chart(chart_data)
+        packed = pack_activations(fields["activations"])
+        fields["activations"] = base64.b64encode(packed).decode("ascii") if packed else None
+        charts[key] = fields
+    return {"input_hash": input_hash, "charts": charts}
+
+def stored_variant(session: HDSession, zodiac_system: str, calculation_method: str,
+                   input_hash: str) -> Optional[Dict]:
+    """Kolumny wykresu z wariantów zapisanych przy sesji; None, gdy dane urodzenia lub silnik się zmieniły"""
+    variants = session.variants
+    if not variants or variants.get("input_hash") != input_hash:
+        return None
+    fields = variants.get("charts", {}).get(variant_key(zodiac_system, calculation_method))
+    if not fields:
+        return None
+    fields = dict(fields)
+    packed = fields.get("activations")
+    fields["activations"] = unpack_activations(base64.b64decode(packed)) if packed else []
+    return fields
+
+def changed_columns(session: HDSession, values: Dict) -> Dict:
+    """Kolumny z values różne od zapisanych w sesji (aktywacje porównywane w postaci spakowanej)"""
+    changes = {}
+    for column, value in values.items():
+        if column == "activations":
+            column, value = "activations_packed", pack_activations(value)
+        if getattr(session, column) != value:
+            changes[column] = value
+    return changes
+
+def update_hd_session(session_id: str, changes: Dict) -> Optional[HDSession]:
+    """UPDATE wyłącznie podanych kolumn; zwraca sesję po zmianie"""
+    db = next(get_db())
+    try:
+        if changes:
+            db.query(HDSession).filter(HDSession.session_id == session_id).update(
+                changes, synchronize_session=False)
+            db.commit()
+        return db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(
+            HDSession.session_id == session_id).first()
+    finally:
+        db.close()
+
 def save_hd_session_to_db(user_id: str, session_data: Dict) -> HDSession:
     """Save Human Design session to database"""
     db = next(get_db())
@@ -294,20 +387,71 @@ def save_hd_session_to_db(user_id: str, session_data: Dict) -> HDSession:
             undefined_centers=session_data["undefined_centers"],
             defined_channels=session_data["defined_channels"],
             active_gates=session_data.get("active_gates", []),
-            activations=session_data.get("activations", [])
+            activations=session_data.get("activations", []),
+            definition=session_data.get("definition"),
+            bridging_gates=session_data.get("bridging_gates", []),
+            variants=session_data.get("variants"),
+            input_hash=session_data.get("input_hash"),
+            engine_version=session_data.get("engine_version", ENGINE_VERSION),
+            idempotency_key=session_data.get("idempotency_key")
         )
         
         db.add(session)
-        db.commit()
-        db.refresh(session)
-        return session
+        try:
+            db.commit()
+        except IntegrityError:
+            # Ten sam Idempotency-Key zapisany równolegle (np. w innym procesie) - zwracamy tamtą sesję
+            db.rollback()
+            existing = get_session_by_idempotency_key(user_id, session_data.get("idempotency_key"))
+            if existing is None:
+                raise
+            return existing
+        # refresh() nie ładuje kolumn odroczonych - odczyt z aktywacjami (odpowiedź /calculate je zwraca)
+        return db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(
+            HDSession.id == session.id).first()
     finally:
         db.close()
 
-def get_hd_session(session_id: str) -> Optional[HDSession]:
-    """Get Human Design session by ID"""
+def get_session_by_idempotency_key(user_id: str, idempotency_key: Optional[str]) -> Optional[HDSession]:
+    """Sesja utworzona wcześniej z tym samym Idempotency-Key (z aktywacjami - trafia do odpowiedzi wykresu)"""
+    if not idempotency_key:
+        return None
+    db = next(get_db())
+    try:
+        return db.query(HDSession).options(undefer(HDSession.activations_packed)).filter(
+            HDSession.user_id == user_id, HDSession.idempotency_key == idempotency_key
+        ).first()
+    finally:
+        db.close()
+
+def get_hd_session(session_id: str, with_activations: bool = False) -> Optional[HDSession]:
+    """Get Human Design session by ID (aktywacje są odroczone - with_activations je dociąga)"""
+    db = next(get_db())
+    try:
+        query = db.query(HDSession)
+        if with_activations:
+            query = query.options(undefer(HDSession.activations_packed))
+        return query.filter(HDSession.session_id == session_id).first()
+    finally:
+        db.close()
+
+def get_session_definition(session: HDSession) -> Dict:
+    """Definicja i bramki mostkujące sesji (dla starszych sesji liczone z zapisanych kanałów)"""
+    if session.definition:
+        return {"definition": session.definition, "bridging_gates": session.bridging_gates or []}
+    try:
+        return analyze_definition(session.defined_channels or [], session.active_gates or [])
+    except (KeyError, ValueError) as e:
+        print(f"WARN: could not derive definition for session {session.session_id}: {e}")
+        return {"definition": None, "bridging_gates": []}
+
+def get_sessions_gates(session_ids: List[str]) -> Dict[str, Dict]:
+    """Imię i aktywne bramki dla wielu sesji jednym zapytaniem (bez wczytywania pełnych wierszy)"""
     db = next(get_db())
     try:
-        return db.query(HDSession).filter(HDSession.session_id == session_id).first()
+        rows = db.query(HDSession.session_id, HDSession.name, HDSession.active_gates).filter(
+            HDSession.session_id.in_(session_ids)
+        ).all()
+        return {row.session_id: {"name": row.name, "active_gates": row.active_gates or []} for row in rows}
     finally:
         db.close()
@@ -120,6 +120,8 @@ def load_hd_personality(hd_data: dict, lang: str = "pl") -> str:
         .replace("{defined_centers}", str(hd_data.get("defined_centers", [])))
         .replace("{undefined_centers}", str(hd_data.get("undefined_centers", [])))
         .replace("{defined_channels}", str(hd_data.get("defined_channels", [])))
+        .replace("{definition}", hd_data.get("definition") or "Unknown")
+        .replace("{bridging_gates}", str(hd_data.get("bridging_gates", [])))
         .replace("{activations}", str(hd_data.get("activations", [])))
     )
 
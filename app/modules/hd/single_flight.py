@@ -0,0 +1,48 @@
+# app/modules/hd/single_flight.py
+"""
+Single-flight dla obliczeń wykresów.
+
+Równoległe żądania z tym samym kluczem (hash kanonicznych danych wejściowych) nie liczą wykresu
+kilka razy: pierwsze uruchamia obliczenie w puli wątków, kolejne czekają na ten sam wynik.
+Klucz zwalniany jest po zakończeniu obliczenia, więc późniejsze żądania liczą od nowa
+(albo trafiają w cache wykresów). Anulowanie jednego z czekających nie przerywa obliczenia.
+
+HD_CALC_THREADS - liczba wątków wykonujących obliczenia i zapis do bazy (domyślnie 8).
+"""
+import asyncio
+import os
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+class SingleFlight:
+    """Koalescencja wywołań blokującej funkcji po kluczu (tylko z pętli zdarzeń)"""
+
+    def __init__(self, executor: Optional[Executor] = None):
+        self._executor = executor
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def _release(self, key: str, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # wyjątek odebrany przez czekających - bez ostrzeżeń "never retrieved"
+
+    async def run(self, key: str, fn: Callable, *args):
+        self.stats["calls"] += 1
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+            future.add_done_callback(lambda done: self._release(key, done))
+            self._inflight[key] = future
+            self.stats["executed"] += 1
+        else:
+            self.stats["coalesced"] += 1
+        return await asyncio.shield(future)
+
+    def snapshot(self) -> Dict:
+        return {**self.stats, "in_flight": len(self._inflight)}
+
+chart_flight = SingleFlight(ThreadPoolExecutor(
+    max_workers=int(os.getenv("HD_CALC_THREADS", "8")), thread_name_prefix="hd-calc",
+))
@@ -0,0 +1,108 @@
+# app/modules/hd/timezones.py
+"""
+Wspólny dla procesu resolver stref czasowych (timezonefinder).
+
+TimezoneFinder tworzony jest raz, leniwie, przy pierwszym zapytaniu. Wyniki trzymane są w LRU
+z kluczem zaokrąglonym do siatki HD_TZ_GRID stopni (domyślnie 0.01° ≈ 1 km; 0 wyłącza zaokrąglanie).
+HD_TZ_IN_MEMORY=1 wczytuje dane wielokątów do pamięci (szybsze zapytania, więcej RAM).
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from timezonefinder import TimezoneFinder
+
+DEFAULT_GRID = 0.01
+DEFAULT_CACHE_SIZE = 65536
+
+class TimezoneResolver:
+    """Strefa czasowa dla współrzędnych, z cache po siatce i zapytaniami wsadowymi"""
+
+    def __init__(self, grid: float = DEFAULT_GRID, in_memory: bool = False,
+                 cache_size: int = DEFAULT_CACHE_SIZE):
+        self.grid = grid
+        self.in_memory = in_memory
+        self._finder: Optional[TimezoneFinder] = None
+        self._lock = threading.Lock()
+        self._cached_lookup = lru_cache(maxsize=cache_size)(self._lookup)
+        self.stats = {"calls": 0, "total_ms": 0.0, "init_ms": 0.0}
+
+    def _key(self, lat: float, lng: float) -> Tuple[float, float]:
+        if self.grid <= 0:
+            return float(lat), float(lng)
+        return round(round(lat / self.grid) * self.grid, 6), round(round(lng / self.grid) * self.grid, 6)
+
+    def _finder_instance(self) -> TimezoneFinder:
+        if self._finder is None:
+            with self._lock:
+                if self._finder is None:
+                    start = time.perf_counter()
+                    self._finder = TimezoneFinder(in_memory=self.in_memory)
+                    self.stats["init_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return self._finder
+
+    def _lookup(self, key: Tuple[float, float]) -> Optional[str]:
+        finder = self._finder_instance()
+        # timezonefinder czyta dane z plików - zapytania serializujemy
+        with self._lock:
+            return finder.timezone_at(lng=key[1], lat=key[0])
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            with self._lock:
+                self.stats["calls"] += 1
+                self.stats["total_ms"] += elapsed
+
+    def timezone_at(self, lat: float, lng: float) -> Optional[str]:
+        return self._timed(self._cached_lookup, self._key(lat, lng))
+
+    def resolve(self, lat: float, lng: float) -> str:
+        """Jak timezone_at, ale bez strefy zgłasza ValueError"""
+        tz = self.timezone_at(lat, lng)
+        if not tz:
+            raise ValueError("Nie udało się ustalić strefy czasowej")
+        return tz
+
+    def timezones_for(self, lats: Sequence[float], lngs: Sequence[float]) -> List[Optional[str]]:
+        """Strefy dla wielu punktów (np. przeliczenia wsadowe); każda komórka siatki liczona raz"""
+        def lookup_all():
+            keys = [self._key(lat, lng) for lat, lng in zip(lats, lngs)]
+            found = {key: self._cached_lookup(key) for key in set(keys)}
+            return [found[key] for key in keys]
+        return self._timed(lookup_all)
+
+    def snapshot(self) -> Dict:
+        info = self._cached_lookup.cache_info()
+        with self._lock:
+            return {
+                **self.stats,
+                "total_ms": round(self.stats["total_ms"], 3),
+                "loaded": self._finder is not None,
+                "in_memory": self.in_memory,
+                "grid": self.grid,
+                "cache_hits": info.hits,
+                "cache_misses": info.misses,
+                "cache_size": info.currsize,
+            }
+
+_resolver: Optional[TimezoneResolver] = None
+_resolver_lock = threading.Lock()
+
+def get_timezone_resolver() -> TimezoneResolver:
+    """Resolver procesu, konfigurowany przez HD_TZ_GRID / HD_TZ_IN_MEMORY / HD_TZ_CACHE_SIZE"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                _resolver = TimezoneResolver(
+                    grid=float(os.getenv("HD_TZ_GRID", DEFAULT_GRID)),
+                    in_memory=os.getenv("HD_TZ_IN_MEMORY", "0").lower() in ("1", "true", "yes"),
+                    cache_size=int(os.getenv("HD_TZ_CACHE_SIZE", DEFAULT_CACHE_SIZE)),
+                )
+    return _resolver
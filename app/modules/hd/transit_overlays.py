@@ -0,0 +1,188 @@
+# app/modules/hd/transit_overlays.py
+"""
+Dzienna nakładka tranzytów dla każdej sesji HD (tabela hd_transit_overlays, jeden wiersz na sesję i dzień).
+
+Nakładka mówi, które kanały sesji (z co najmniej jedną jej bramką) dopełniają dziś tranzytujące bramki,
+które centra są chwilowo zdefiniowane i co zmieniło się względem wczoraj. Liczona jest wsadowo na maskach bitowych: maska bramek sesji
+OR maska bramek tranzytu dnia (transits.transit_gate_mask) w zodiaku sesji - bramki sidereal porównywane są
+z tranzytem sidereal. Zapisywane są tylko wiersze, których treść (content_hash) się zmieniła.
+Wiersz pamięta też zodiak i maskę bramek sesji (session_key), z których powstał - po regenerate
+ze zmienionymi bramkami odczyt nakładki liczy ją od nowa zamiast zwracać starą.
+
+Uruchamianie (np. z crona co noc):
+    python -m app.modules.hd.transit_overlays --day 2026-10-18 --days 2
+"""
+import argparse
+import hashlib
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from app.core.database import get_db
+from app.modules.hd.hd_batch import channel_masks_array, touched_channel_masks_array
+from app.modules.hd.hd_calculator import (
+    CHANNEL_GATE_MASKS, CHANNEL_LIST, center_mask, centers_from_mask, gate_mask, gates_from_mask,
+    iter_bits,
+)
+from app.modules.hd.models import HDSession, HDTransitOverlay
+from app.modules.hd.transits import transit_gate_mask
+
+DEFAULT_CHUNK_SIZE = 1000
+
+def _channel_names(ch_mask: int) -> List[str]:
+    return [f"{a}-{b}" for a, b in (CHANNEL_LIST[k] for k in iter_bits(ch_mask))]
+
+def _center_names(c_mask: int) -> List[str]:
+    return sorted(centers_from_mask(c_mask))
+
+def _overlay(day: date, user_mask: int, own_ch: int, new_ch: int, prev_new_ch: int,
+             transit_mask: int) -> Dict:
+    own_centers = center_mask(own_ch)
+    temp_centers = center_mask(own_ch | new_ch) & ~own_centers
+    prev_temp_centers = center_mask(own_ch | prev_new_ch) & ~own_centers
+    return {
+        "day": day.isoformat(),
+        "transit_gates": sorted(gates_from_mask(transit_mask)),
+        "completed_channels": [
+            {"channel": f"{CHANNEL_LIST[k][0]}-{CHANNEL_LIST[k][1]}",
+             "transit_gates": sorted(gates_from_mask(CHANNEL_GATE_MASKS[k] & ~user_mask))}
+            for k in iter_bits(new_ch)
+        ],
+        "temporary_centers": _center_names(temp_centers),
+        "changes": {
+            "new_channels": _channel_names(new_ch & ~prev_new_ch),
+            "ended_channels": _channel_names(prev_new_ch & ~new_ch),
+            "new_centers": _center_names(temp_centers & ~prev_temp_centers),
+            "ended_centers": _center_names(prev_temp_centers & ~temp_centers),
+        },
+    }
+
+def build_overlays(user_masks: np.ndarray, day: date, zodiac_system: str = "tropical") -> List[Dict]:
+    """Nakładki dla tablicy masek bramek sesji (uint64) w jednym zodiaku; identyczne maski liczone raz"""
+    transit_mask = transit_gate_mask(day, zodiac_system)
+    prev_transit_mask = transit_gate_mask(day - timedelta(days=1), zodiac_system)
+    own = channel_masks_array(user_masks)
+    # Tylko kanały z co najmniej jedną bramką sesji - kanały w całości z tranzytu to "pogoda dnia", nie nakładka
+    candidates = touched_channel_masks_array(user_masks) & ~own
+    new = channel_masks_array(user_masks | np.uint64(transit_mask)) & candidates
+    prev_new = channel_masks_array(user_masks | np.uint64(prev_transit_mask)) & candidates
+
+    computed: Dict[int, Dict] = {}
+    overlays = []
+    for user_mask, own_ch, new_ch, prev_new_ch in zip(user_masks.tolist(), own.tolist(),
+                                                      new.tolist(), prev_new.tolist()):
+        if user_mask not in computed:
+            computed[user_mask] = _overlay(day, user_mask, own_ch, new_ch, prev_new_ch, transit_mask)
+        overlays.append(computed[user_mask])
+    return overlays
+
+def session_key(zodiac_system: str, user_mask: int) -> str:
+    """Zodiak i maska bramek sesji, z których liczona jest nakładka"""
+    return f"{zodiac_system}:{int(user_mask):016x}"
+
+def overlay_hash(overlay: Dict) -> str:
+    payload = json.dumps(overlay, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _store(db, day: date, session_ids: List[str], overlays: List[Dict], keys: List[str], stats: Dict) -> None:
+    """Wstawia brakujące wiersze i nadpisuje tylko te, których treść lub session_key się zmieniły"""
+    existing = {
+        row.session_id: (row.id, row.content_hash, row.session_key)
+        for row in db.query(HDTransitOverlay.id, HDTransitOverlay.session_id, HDTransitOverlay.content_hash,
+                            HDTransitOverlay.session_key)
+        .filter(HDTransitOverlay.day == day, HDTransitOverlay.session_id.in_(session_ids))
+    }
+    inserts, updates = [], []
+    for session_id, overlay, key in zip(session_ids, overlays, keys):
+        content_hash = overlay_hash(overlay)
+        current = existing.get(session_id)
+        if current is None:
+            inserts.append({"session_id": session_id, "day": day, "overlay": overlay,
+                            "content_hash": content_hash, "session_key": key})
+        elif current[1:] != (content_hash, key):
+            updates.append({"id": current[0], "overlay": overlay, "content_hash": content_hash,
+                            "session_key": key, "updated_at": datetime.now(timezone.utc)})
+        else:
+            stats["unchanged"] += 1
+    if inserts:
+        db.bulk_insert_mappings(HDTransitOverlay, inserts)
+    if updates:
+        db.bulk_update_mappings(HDTransitOverlay, updates)
+    db.commit()
+    stats["inserted"] += len(inserts)
+    stats["updated"] += len(updates)
+
+def run_overlay_job(day: date, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict:
+    """Przelicza nakładki wszystkich sesji na dany dzień (stronicowanie po id)"""
+    stats = {"day": day.isoformat(), "sessions": 0, "skipped": 0, "inserted": 0, "updated": 0, "unchanged": 0}
+    db = next(get_db())
+    try:
+        last_id = 0
+        while True:
+            rows = (db.query(HDSession.id, HDSession.session_id, HDSession.active_gates, HDSession.zodiac_system)
+                    .filter(HDSession.id > last_id).order_by(HDSession.id).limit(chunk_size).all())
+            if not rows:
+                break
+            last_id = rows[-1].id
+            by_zodiac = defaultdict(list)
+            for row in rows:
+                if row.active_gates:
+                    by_zodiac[row.zodiac_system or "tropical"].append(row)
+                else:
+                    stats["skipped"] += 1
+            for zodiac_system, group in by_zodiac.items():
+                masks = np.array([gate_mask(row.active_gates) for row in group], dtype=np.uint64)
+                _store(db, day, [row.session_id for row in group], build_overlays(masks, day, zodiac_system),
+                       [session_key(zodiac_system, mask) for mask in masks.tolist()], stats)
+                stats["sessions"] += len(group)
+    finally:
+        db.close()
+    return stats
+
+def get_session_overlay(session_id: str, day: date) -> Optional[Dict]:
+    """
+    Nakładka sesji na dany dzień. Gdy jeszcze nie policzona albo policzona z innych bramek/zodiaku
+    (regenerate po zapisie nakładki) - liczy i zapisuje tylko tę sesję.
+    """
+    db = next(get_db())
+    try:
+        session = db.query(HDSession.session_id, HDSession.active_gates, HDSession.zodiac_system).filter(
+            HDSession.session_id == session_id
+        ).first()
+        if not session or not session.active_gates:
+            return None
+        zodiac_system = session.zodiac_system or "tropical"
+        user_mask = gate_mask(session.active_gates)
+        key = session_key(zodiac_system, user_mask)
+        row = db.query(HDTransitOverlay.overlay, HDTransitOverlay.session_key).filter(
+            HDTransitOverlay.session_id == session_id, HDTransitOverlay.day == day
+        ).first()
+        if row and row.session_key == key:
+            return row.overlay
+        overlay = build_overlays(np.array([user_mask], dtype=np.uint64), day, zodiac_system)[0]
+        try:
+            _store(db, day, [session_id], [overlay], [key], {"inserted": 0, "updated": 0, "unchanged": 0})
+        except IntegrityError:
+            # Ten sam wiersz zapisany równolegle (inne żądanie lub zadanie nocne)
+            db.rollback()
+        return overlay
+    finally:
+        db.close()
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Precompute daily HD transit overlays")
+    parser.add_argument("--day", type=date.fromisoformat, default=None, help="first day (UTC), default today")
+    parser.add_argument("--days", type=int, default=1, help="number of consecutive days")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    first = args.day or datetime.now(timezone.utc).date()
+    for i in range(args.days):
+        print(json.dumps(run_overlay_job(first + timedelta(days=i), chunk_size=args.chunk_size)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# app/modules/hd/transits.py
+"""
+Tranzyty: momenty wejścia planet w nową bramkę lub linię.
+
+Każda doba UTC jest próbkowana co godzinę (wszystkie ciała naraz, tablicą efemeryd jeśli aktywna),
+a każda zmiana bramki/linii między próbkami jest zawężana bisekcją do ~0.1 s.
+Wynik doby to kompaktowa tablica rekordów (jd, ciało, bramka, linia, poprzednia bramka/linia),
+trzymana w LRU - zapytanie o zakres to sklejenie wycinków dób bez ponownych obliczeń.
+Domyślnie tranzyty są tropikalne; dla sidereal długości przesuwane są o ajanamsę (zodiac_offset),
+tak jak w compute_hd_chart_at, więc bramki tranzytu da się porównać z bramkami wykresu sidereal.
+"""
+import os
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.modules.hd.hd_calculator import (
+    HAVE_SW, ACTIVATION_BODIES, GATE_INDEX, _body_ids, gate_mask, zodiac_offset,
+)
+from app.modules.hd.hd_batch import calc_positions_array
+
+if HAVE_SW:
+    import swisseph as swe
+
+SAMPLES_PER_DAY = 24     # Księżyc przechodzi ~0.6° na godzinę, linia ma 0.9375°
+BISECT_PRECISION = 1e-6  # dni (~0.09 s)
+MAX_RANGE_DAYS = 366
+
+TRANSIT_DTYPE = np.dtype([
+    ("jd", "<f8"), ("body", "u1"), ("gate", "u1"), ("line", "u1"),
+    ("prev_gate", "u1"), ("prev_line", "u1"),
+])
+
+_UNIX_EPOCH_JD = 2440587.5
+# Ziemia i Węzeł Południowy są naprzeciw Słońca i Węzła Północnego
+_OPPOSITE_OF = {"Earth": "Sun", "South Node": "North Node"}
+
+def _day_start_jd(day: date) -> float:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() / 86400.0 + _UNIX_EPOCH_JD
+
+def jd_to_datetime(jd: float) -> datetime:
+    return datetime.fromtimestamp((jd - _UNIX_EPOCH_JD) * 86400.0, tz=timezone.utc)
+
+def body_longitude(jd: float, body: str, zodiac_system: str = "tropical") -> float:
+    """Dokładna długość jednego ciała (Swiss Ephemeris) w danym zodiaku"""
+    base = _OPPOSITE_OF.get(body, body)
+    lon = swe.calc_ut(jd, _body_ids()[base])[0][0] - zodiac_offset(jd, zodiac_system)
+    return (lon + (180.0 if body in _OPPOSITE_OF else 0.0)) % 360.0
+
+def _activation(jd: float, body: str, zodiac_system: str = "tropical"):
+    a = GATE_INDEX.lookup(body_longitude(jd, body, zodiac_system))
+    return a.gate, a.line
+
+def _first_change(body: str, lo: float, hi: float, start_act, zodiac_system: str = "tropical") -> float:
+    """Najwcześniejszy moment w (lo, hi], w którym aktywacja różni się od start_act"""
+    while hi - lo > BISECT_PRECISION:
+        mid = (lo + hi) / 2.0
+        if _activation(mid, body, zodiac_system) == start_act:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+@lru_cache(maxsize=int(os.getenv("HD_TRANSIT_CACHE_DAYS", "3660")))
+def transit_day(day: date, zodiac_system: str = "tropical") -> np.ndarray:
+    """Wszystkie zmiany bramki/linii w danej dobie UTC (tablica TRANSIT_DTYPE, posortowana po czasie)"""
+    if not HAVE_SW:
+        raise RuntimeError("Brak pyswisseph - nie można obliczyć tranzytów")
+    start = _day_start_jd(day)
+    jd = start + np.arange(SAMPLES_PER_DAY + 1) / SAMPLES_PER_DAY
+    act = GATE_INDEX.lookup_array(calc_positions_array(jd, zodiac_system))
+
+    events = []
+    for col, body in enumerate(ACTIVATION_BODIES):
+        gates, lines = act.gate[:, col], act.line[:, col]
+        changed = np.flatnonzero((gates[1:] != gates[:-1]) | (lines[1:] != lines[:-1]))
+        for i in changed:
+            lo, hi = float(jd[i]), float(jd[i + 1])
+            current = _activation(lo, body, zodiac_system)
+            end_act = _activation(hi, body, zodiac_system)
+            # W jednym kroku może wypaść kilka granic (lub powrót przy ruchu wstecznym)
+            while current != end_act:
+                t = _first_change(body, lo, hi, current, zodiac_system)
+                new = _activation(t, body, zodiac_system)
+                events.append((t, col, new[0], new[1], current[0], current[1]))
+                lo, current = t, new
+    events.sort()
+    return np.array(events, dtype=TRANSIT_DTYPE)
+
+@lru_cache(maxsize=366)
+def transit_gate_mask(day: date, zodiac_system: str = "tropical") -> int:
+    """Maska bramek zajętych przez tranzytujące ciała w ciągu doby (stan o północy + wszystkie wejścia)"""
+    start = _day_start_jd(day)
+    act = GATE_INDEX.lookup_array(calc_positions_array(np.array([start]), zodiac_system))
+    return gate_mask(act.gate[0].tolist()) | gate_mask(transit_day(day, zodiac_system)["gate"].tolist())
+
+def transit_table(start: date, end: date) -> np.ndarray:
+    """Sklejone tablice dób [start, end]"""
+    days = (end - start).days + 1
+    parts = [transit_day(start + timedelta(days=i)) for i in range(days)]
+    return np.concatenate(parts) if parts else np.empty(0, dtype=TRANSIT_DTYPE)
+
+def find_transits(start: date, end: date, planets: Optional[Iterable[str]] = None,
+                  kind: str = "line") -> List[Dict]:
+    """
+    Zdarzenia wejścia w bramkę/linię w zakresie dat (włącznie).
+    kind: "line" - każda zmiana linii (w tym wejścia w nową bramkę), "gate" - tylko nowe bramki.
+    """
+    if end < start:
+        raise ValueError("Data końcowa jest wcześniejsza niż początkowa")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f"Zakres nie może przekraczać {MAX_RANGE_DAYS} dni")
+    # Walidacja ciał przed liczeniem tablicy (do MAX_RANGE_DAYS dób bisekcji)
+    planets = list(planets) if planets else []
+    unknown = set(planets) - set(ACTIVATION_BODIES)
+    if unknown:
+        raise ValueError(f"Nieznane ciała: {', '.join(sorted(unknown))}")
+    table = transit_table(start, end)
+    if planets:
+        wanted = [ACTIVATION_BODIES.index(p) for p in planets]
+        table = table[np.isin(table["body"], wanted)]
+    gate_change = table["gate"] != table["prev_gate"]
+    if kind == "gate":
+        table, gate_change = table[gate_change], gate_change[gate_change]
+    return [
+        {
+            "time": jd_to_datetime(float(row["jd"])).isoformat(timespec="seconds"),
+            "planet": ACTIVATION_BODIES[row["body"]],
+            "event": "gate" if is_gate else "line",
+            "gate": int(row["gate"]),
+            "line": int(row["line"]),
+            "from_gate": int(row["prev_gate"]),
+            "from_line": int(row["prev_line"]),
+        }
+        for row, is_gate in zip(table, gate_change)
+    ]
+
+def transit_cache_stats() -> Dict:
+    info = transit_day.cache_info()
+    return {"days_cached": info.currsize, "hits": info.hits, "misses": info.misses, "maxsize": info.maxsize}
@@ -0,0 +1,244 @@
+# benchmarks/hd_pipeline.py
+"""
+Benchmark potoku obliczeń Human Design (bez sieci).
+
+Stały korpus rekordów urodzenia (deterministyczny seed) przechodzi przez kolejne etapy:
+calc_positions, gate_line_for, find_design_time_solar_arc, compute_definition + compute_type,
+HumanDesignCalculator.calculate_chart oraz POST /hd/calculate przez klienta ASGI (httpx).
+Geokodowanie i strefy czasowe są podmienione na deterministyczne zaślepki, baza to tymczasowy SQLite,
+cache wykresów działa tylko w pamięci i jest czyszczony przed etapami, więc każdy wykres liczony jest od zera.
+
+Dla każdego etapu raportowane są p50 / p95 / p99 (ms na wywołanie). Porównanie z zapisanym baseline
+kończy się kodem 1, gdy p50 lub p95 któregoś etapu wzrośnie o więcej niż --tolerance.
+
+Uruchamianie (z katalogu głównego repozytorium):
+    python -m benchmarks.hd_pipeline
+    python -m benchmarks.hd_pipeline --records 500 --endpoint-records 100
+    python -m benchmarks.hd_pipeline --update-baseline
+"""
+import argparse
+import asyncio
+import atexit
+import contextlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# Tymczasowa baza musi być ustawiona przed importem modułów aplikacji
+_TMP_DIR = tempfile.mkdtemp(prefix="hd-bench-")
+atexit.register(shutil.rmtree, _TMP_DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/bench.db"
+
+import httpx
+import numpy as np
+from fastapi import FastAPI
+
+import app.core.models  # noqa: F401 - tabele users itd. dla kluczy obcych
+import app.modules.values.models  # noqa: F401
+import app.modules.spiral.models  # noqa: F401
+from app.core import database
+from app.modules.hd import connections, ephemeris_pool, hd_calculator, router as hd_router, service, transits
+from app.modules.hd.bodygraph import bodygraph_cache
+from app.modules.hd.chart_cache import chart_cache
+from app.modules.hd.gate_catalog import gate_catalog
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_RECORDS = 2000
+DEFAULT_ENDPOINT_RECORDS = 500
+DEFAULT_TOLERANCE = 0.25
+SEED = 20261017
+PERCENTILES = (50, 95, 99)
+CHECKED = ("p50", "p95")  # p99 jest zbyt zaszumiony, by na nim przerywać
+
+# ---------- Stubs ----------
+def _stub_timezone(lat: float, lng: float) -> str:
+    """Strefa z długości geograficznej (pełne godziny), bez timezonefinder"""
+    offset = int(round(lng / 15.0))
+    return f"Etc/GMT{-offset:+d}" if offset else "UTC"
+
+def _stub_geocode(place: str):
+    return 52.2297, 21.0122, "Europe/Warsaw"
+
+def _install_stubs() -> None:
+    hd_calculator.resolve_timezone = _stub_timezone
+    ephemeris_pool.resolve_timezone = _stub_timezone
+    hd_calculator.geocode_place = _stub_geocode
+    hd_router.geocode_place = _stub_geocode
+    chart_cache.persistent = False
+    database.engine.echo = False
+    database.Base.metadata.create_all(database.engine)
+
+# ---------- Corpus ----------
+def build_corpus(n: int, seed: int = SEED) -> List[Dict]:
+    rng = random.Random(seed)
+    start = datetime(1940, 1, 1)
+    records = []
+    for i in range(n):
+        born = start + timedelta(minutes=rng.randrange(70 * 365 * 24 * 60))
+        records.append({
+            "user_id": "bench-user",
+            "name": f"Bench {i}",
+            "birth_date": born.strftime("%Y-%m-%dT00:00:00"),
+            "birth_time": born.strftime("%H:%M"),
+            "birth_place": f"Bench place {i}",
+            "birth_lat": round(rng.uniform(-55.0, 65.0), 4),
+            "birth_lng": round(rng.uniform(-170.0, 170.0), 4),
+            "zodiac_system": "sidereal" if rng.random() < 0.25 else "tropical",
+            "calculation_method": "days" if rng.random() < 0.1 else "degrees",
+        })
+    return records
+
+# Wszystkie pamięci wyników (lru_cache) na ścieżkach mierzonych etapów
+_LRU_CACHED = (
+    hd_calculator.design_julday_solar_arc,
+    hd_calculator.center_components,
+    hd_calculator._definition_sets,
+    hd_calculator._bridge_channels,
+    hd_calculator.type_for_channel_mask,
+    transits.transit_day,
+    transits.transit_gate_mask,
+    connections._group_chart,
+)
+
+def _reset_caches() -> None:
+    """Każdy etap mierzy koszt zimny: czyszczone są wszystkie pamięci wyników i cache modułów"""
+    for fn in _LRU_CACHED:
+        fn.cache_clear()
+    chart_cache.clear()
+    bodygraph_cache.clear()
+    gate_catalog.clear()
+
+def _utc(record: Dict) -> datetime:
+    local = datetime.fromisoformat(f"{record['birth_date'][:10]}T{record['birth_time']}")
+    return hd_calculator.to_utc(local, _stub_timezone(record["birth_lat"], record["birth_lng"]))
+
+# ---------- Timing ----------
+def _time_calls(fn: Callable, items) -> List[float]:
+    samples = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for item in items:
+            start = time.perf_counter()
+            fn(item)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def _summary(samples: List[float]) -> Dict:
+    values = np.percentile(np.asarray(samples), PERCENTILES)
+    return {"n": len(samples), **{f"p{p}": round(float(v), 4) for p, v in zip(PERCENTILES, values)}}
+
+def _endpoint_samples(records: List[Dict]) -> List[float]:
+    app = FastAPI()
+    app.include_router(hd_router.router, prefix="/hd")
+
+    async def run() -> List[float]:
+        samples = []
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for record in records:
+                start = time.perf_counter()
+                response = await client.post("/hd/calculate", json=record)
+                samples.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/hd/calculate returned {response.status_code}: {response.text}")
+        return samples
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return asyncio.run(run())
+
+def run_suite(n_records: int, n_endpoint: int) -> Dict[str, Dict]:
+    _install_stubs()
+    corpus = build_corpus(n_records)
+    births = [_utc(r) for r in corpus]
+
+    positions = [hd_calculator.calc_positions(dt) for dt in births]
+    gate_sets = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for r in corpus:
+            chart = hd_calculator.compute_hd_chart_at("", r["birth_date"][:10], r["birth_time"], r["birth_lat"],
+                                                      r["birth_lng"], tzname=_stub_timezone(r["birth_lat"], r["birth_lng"]))
+            gate_sets.append(set(chart["summary"]["active_gates"]))
+
+    def definition_and_type(gates):
+        channels, centers = hd_calculator.compute_definition(gates)
+        hd_type = hd_calculator.compute_type(centers, channels)
+        hd_calculator.compute_authority(centers, hd_type)
+
+    calculator = service.HumanDesignCalculator()
+
+    def calculate_chart(r):
+        calculator.calculate_chart(datetime.fromisoformat(r["birth_date"]), r["birth_time"], r["birth_lat"],
+                                   r["birth_lng"], r["zodiac_system"], r["calculation_method"], r["birth_place"])
+
+    plan = [
+        ("calc_positions", lambda: _time_calls(hd_calculator.calc_positions, births)),
+        ("gate_line_for", lambda: _time_calls(
+            lambda pos: [hd_calculator.gate_line_for(p.lon) for p in pos], positions)),
+        ("find_design_time_solar_arc", lambda: _time_calls(hd_calculator.find_design_time_solar_arc, births)),
+        ("definition_and_type", lambda: _time_calls(definition_and_type, gate_sets)),
+        ("calculate_chart", lambda: _time_calls(calculate_chart, corpus)),
+        ("post_hd_calculate", lambda: _endpoint_samples(corpus[:n_endpoint])),
+    ]
+    results = {}
+    for name, run in plan:
+        _reset_caches()
+        results[name] = _summary(run())
+    return results
+
+# ---------- Baseline ----------
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    regressions = []
+    for stage, current in results.items():
+        reference = baseline.get(stage)
+        if not reference:
+            continue
+        for key in CHECKED:
+            limit = reference[key] * (1 + tolerance)
+            if current[key] > limit:
+                regressions.append(f"{stage} {key}: {current[key]:.4f} ms > {limit:.4f} ms "
+                                   f"(baseline {reference[key]:.4f} ms)")
+    return regressions
+
+def _print_table(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    print(f"{'stage':<28}{'n':>6}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'p50 base':>12}")
+    for stage, r in results.items():
+        base = baseline.get(stage, {}).get("p50")
+        base_txt = f"{base:>12.4f}" if base is not None else f"{'-':>12}"
+        print(f"{stage:<28}{r['n']:>6}{r['p50']:>12.4f}{r['p95']:>12.4f}{r['p99']:>12.4f}{base_txt}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the HD calculation pipeline")
+    parser.add_argument("--records", type=int, default=DEFAULT_RECORDS)
+    parser.add_argument("--endpoint-records", type=int, default=DEFAULT_ENDPOINT_RECORDS)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown of p50/p95 before failing")
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--json", type=Path, default=None, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.records, args.endpoint_records)
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["stages"] if args.baseline.exists() else {}
+    _print_table(results, baseline)
+
+    payload = {"records": args.records, "endpoint_records": args.endpoint_records, "seed": SEED, "stages": results}
+    if args.json:
+        args.json.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,7 +2,7 @@
 """Create Human Design tables in database"""
 
 from app.core.database import engine, Base
-from app.modules.hd.models import HDSession, HDChatMessage, HDSummary
+from app.modules.hd.models import HDSession, HDChatMessage, HDSummary, HDChartCache, HDTransitOverlay
 
 print("Creating Human Design tables...")
 
@@ -16,6 +16,12 @@ print("✓ Created hd_chat_messages table")
 HDSummary.__table__.create(engine, checkfirst=True)
 print("✓ Created hd_summaries table")
 
+HDChartCache.__table__.create(engine, checkfirst=True)
+print("✓ Created hd_chart_cache table")
+
+HDTransitOverlay.__table__.create(engine, checkfirst=True)
+print("✓ Created hd_transit_overlays table")
+
 print("\n✅ All Human Design tables created successfully!")
 
 
@@ -0,0 +1,44 @@
+"""add hd transit overlays table
+
+Revision ID: 030f0e225b3b
+Revises: 58a65b80c038
+Create Date: 2026-10-17 12:04:18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '030f0e225b3b'
+down_revision: Union[str, Sequence[str], None] = '58a65b80c038'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'hd_transit_overlays',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('session_id', sa.String(length=255), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('overlay', sa.JSON(), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['hd_sessions.session_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_hd_transit_overlays_id'), 'hd_transit_overlays', ['id'], unique=False)
+    op.create_index('ix_hd_transit_overlays_session_day', 'hd_transit_overlays', ['session_id', 'day'], unique=True)
+    op.create_index('ix_hd_transit_overlays_day', 'hd_transit_overlays', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_hd_transit_overlays_day', table_name='hd_transit_overlays')
+    op.drop_index('ix_hd_transit_overlays_session_day', table_name='hd_transit_overlays')
+    op.drop_index(op.f('ix_hd_transit_overlays_id'), table_name='hd_transit_overlays')
+    op.drop_table('hd_transit_overlays')
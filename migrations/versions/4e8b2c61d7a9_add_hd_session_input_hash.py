@@ -0,0 +1,26 @@
+"""add input hash to hd sessions
+
+Revision ID: 4e8b2c61d7a9
+Revises: c3f1a7d92e60
+Create Date: 2026-10-17 17:25:48
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8b2c61d7a9'
+down_revision: Union[str, Sequence[str], None] = 'c3f1a7d92e60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('input_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('hd_sessions', 'input_hash')
@@ -0,0 +1,28 @@
+"""add definition and bridging gates to hd sessions
+
+Revision ID: 58a65b80c038
+Revises: c472700f88aa
+Create Date: 2026-10-17 11:12:40
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '58a65b80c038'
+down_revision: Union[str, Sequence[str], None] = 'c472700f88aa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('definition', sa.String(length=30), nullable=True))
+    op.add_column('hd_sessions', sa.Column('bridging_gates', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('hd_sessions', 'bridging_gates')
+    op.drop_column('hd_sessions', 'definition')
@@ -0,0 +1,28 @@
+"""add idempotency key to hd sessions
+
+Revision ID: 9d41c7e2b6a3
+Revises: 030f0e225b3b
+Create Date: 2026-10-17 14:21:06
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41c7e2b6a3'
+down_revision: Union[str, Sequence[str], None] = '030f0e225b3b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+    op.create_index('ix_hd_sessions_user_idempotency', 'hd_sessions', ['user_id', 'idempotency_key'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_hd_sessions_user_idempotency', table_name='hd_sessions')
+    op.drop_column('hd_sessions', 'idempotency_key')
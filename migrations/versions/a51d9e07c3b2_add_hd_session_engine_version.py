@@ -0,0 +1,26 @@
+"""add engine version to hd sessions
+
+Revision ID: a51d9e07c3b2
+Revises: 4e8b2c61d7a9
+Create Date: 2026-10-17 18:02:31
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a51d9e07c3b2'
+down_revision: Union[str, Sequence[str], None] = '4e8b2c61d7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('engine_version', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('hd_sessions', 'engine_version')
@@ -0,0 +1,89 @@
+"""pack hd session activations into a binary column
+
+Revision ID: b7e3f19a4c58
+Revises: 9d41c7e2b6a3
+Create Date: 2026-10-17 15:02:44
+
+"""
+import json
+import math
+import struct
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3f19a4c58'
+down_revision: Union[str, Sequence[str], None] = '9d41c7e2b6a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Układ zamrożony na potrzeby migracji (zgodny z app.modules.hd.activations_codec)
+BODIES = ["Sun", "Moon", "Mercury", "Venus", "Mars", "Jupiter", "Saturn", "Uranus", "Neptune", "Pluto",
+          "North Node", "Earth", "South Node"]
+SLOTS = [(side, body) for side in ("Personality", "Design") for body in BODIES]
+SLOT_INDEX = {slot: i for i, slot in enumerate(SLOTS)}
+RECORD = struct.Struct("<BBf")
+BATCH_SIZE = 1000
+
+hd_sessions = sa.table(
+    'hd_sessions',
+    sa.column('id', sa.Integer),
+    sa.column('activations', sa.JSON),
+    sa.column('activations_packed', sa.LargeBinary),
+)
+
+
+def _pack(rows):
+    if not rows:
+        return None
+    buf = bytearray(RECORD.pack(0, 0, math.nan) * len(SLOTS))
+    for row in rows:
+        i = SLOT_INDEX.get((row.get('side'), row.get('planet')))
+        if i is None or row.get('lon') is None:
+            continue
+        RECORD.pack_into(buf, i * RECORD.size, row.get('gate') or 0, row.get('line') or 0, row['lon'])
+    return bytes(buf)
+
+
+def _unpack(data):
+    return [
+        {'side': side, 'planet': planet, 'lon': round(lon, 6), 'gate': gate or None, 'line': line or None}
+        for (side, planet), (gate, line, lon) in zip(SLOTS, RECORD.iter_unpack(bytes(data)))
+        if not math.isnan(lon)
+    ]
+
+
+def _convert(source, target, convert) -> None:
+    """Przepisuje source → target partiami po id"""
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(hd_sessions.c.id, hd_sessions.c[source])
+            .where(hd_sessions.c.id > last_id, hd_sessions.c[source].isnot(None))
+            .order_by(hd_sessions.c.id).limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = [{'_id': row_id, 'value': convert(value)} for row_id, value in rows]
+        conn.execute(
+            hd_sessions.update().where(hd_sessions.c.id == sa.bindparam('_id'))
+            .values({target: sa.bindparam('value')}),
+            updates,
+        )
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('activations_packed', sa.LargeBinary(), nullable=True))
+    _convert('activations', 'activations_packed', lambda v: _pack(json.loads(v) if isinstance(v, str) else v))
+    op.drop_column('hd_sessions', 'activations')
+
+
+def downgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('activations', sa.JSON(), nullable=True))
+    _convert('activations_packed', 'activations', _unpack)
+    op.drop_column('hd_sessions', 'activations_packed')
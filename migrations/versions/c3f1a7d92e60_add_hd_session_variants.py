@@ -0,0 +1,26 @@
+"""add chart variants to hd sessions
+
+Revision ID: c3f1a7d92e60
+Revises: b7e3f19a4c58
+Create Date: 2026-10-17 16:40:12
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3f1a7d92e60'
+down_revision: Union[str, Sequence[str], None] = 'b7e3f19a4c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_sessions', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('hd_sessions', 'variants')
@@ -0,0 +1,42 @@
+"""add hd chart cache table
+
+Revision ID: c472700f88aa
+Revises: 51b795146791
+Create Date: 2026-10-17 07:31:52.790833
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c472700f88aa'
+down_revision: Union[str, Sequence[str], None] = '51b795146791'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'hd_chart_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('engine_version', sa.String(length=20), nullable=False),
+        sa.Column('chart_data', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_hd_chart_cache_id'), 'hd_chart_cache', ['id'], unique=False)
+    op.create_index(op.f('ix_hd_chart_cache_cache_key'), 'hd_chart_cache', ['cache_key'], unique=True)
+    op.create_index(op.f('ix_hd_chart_cache_engine_version'), 'hd_chart_cache', ['engine_version'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_hd_chart_cache_engine_version'), table_name='hd_chart_cache')
+    op.drop_index(op.f('ix_hd_chart_cache_cache_key'), table_name='hd_chart_cache')
+    op.drop_index(op.f('ix_hd_chart_cache_id'), table_name='hd_chart_cache')
+    op.drop_table('hd_chart_cache')
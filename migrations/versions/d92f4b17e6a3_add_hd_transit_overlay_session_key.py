@@ -0,0 +1,26 @@
+"""add session key to hd transit overlays
+
+Revision ID: d92f4b17e6a3
+Revises: a51d9e07c3b2
+Create Date: 2026-10-17 21:14:08
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd92f4b17e6a3'
+down_revision: Union[str, Sequence[str], None] = 'a51d9e07c3b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('hd_transit_overlays', sa.Column('session_key', sa.String(length=40), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('hd_transit_overlays', 'session_key')
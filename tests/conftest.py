@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core import models as core_models  # noqa: F401 - mapper User
+from app.modules.values import models as values_models  # noqa: F401
+from app.modules.spiral import models as spiral_models  # noqa: F401
+from app.modules.hd import models as hd_models  # noqa: F401
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """Osobna baza SQLite na test (coach.db nie jest dotykana): (engine, fabryka sesji)"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    yield engine, sessionmaker(bind=engine)
+    engine.dispose()
@@ -0,0 +1,16 @@
+import pytest
+
+from app.modules.hd.bodygraph import bodygraph_key, parse_bodygraph_key
+
+KEY = bodygraph_key(0xABC, (1 << 63) | 7)
+
+def test_key_round_trip():
+    assert parse_bodygraph_key(KEY) == (0xABC, (1 << 63) | 7)
+
+@pytest.mark.parametrize("key", [
+    KEY.upper(), "1-+" + KEY[3:], "1-0x" + KEY[4:], "1- " + KEY[3:], KEY + "\n", " " + KEY,
+    "2-" + KEY[2:], KEY[:-1], "1--" + KEY[3:],
+])
+def test_non_canonical_keys_are_rejected(key):
+    # Jeden wykres = jeden adres "immutable"
+    assert parse_bodygraph_key(key) is None
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.modules.hd import engine_recompute
+from app.modules.hd.hd_calculator import ENGINE_VERSION
+from app.modules.hd.models import HDSession
+
+BIRTH = dict(birth_date=datetime(1987, 11, 21), birth_time="03:17", birth_place="Warszawa",
+             birth_lat=52.2297, birth_lng=21.0122, zodiac_system="tropical", calculation_method="degrees")
+
+@pytest.fixture
+def db(sqlite_db, monkeypatch):
+    engine, Session = sqlite_db
+    monkeypatch.setattr(engine_recompute, "get_db", lambda: iter([Session()]))
+    return engine, Session
+
+def _session(session_id, fields, **overrides):
+    values = {**fields, **overrides}
+    activations = values.pop("activations")
+    row = HDSession(user_id="u1", session_id=session_id, name=session_id, engine_version="4",
+                    input_hash="stale", variants={"input_hash": "stale", "charts": {}}, **BIRTH, **values)
+    row.activations = activations
+    return row
+
+def test_unchanged_rows_are_not_rewritten(db):
+    engine, Session = db
+    utc_birth = datetime(1987, 11, 21, 2, 17)
+    fields = engine_recompute._recompute_chunk([utc_birth], "tropical", "degrees")[0]
+    other_type = "Reflector" if fields["type"] != "Reflector" else "Projector"
+    with Session() as s:
+        s.add_all([_session("same", fields), _session("moved", fields, type=other_type)])
+        s.commit()
+        same_id, moved_id = (s.query(HDSession.id).filter_by(session_id=sid).scalar() for sid in ("same", "moved"))
+
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, sql, params, context, many: statements.append((sql, params)))
+    stats = engine_recompute.run_recompute(batch_size=10)
+
+    assert (stats["unchanged"], stats["rewritten"], stats["moved"]["type"]) == (1, 1, 1)
+    updates = [(sql, params) for sql, params in statements if sql.startswith("UPDATE")]
+    # Jedno UPDATE samej wersji dla niezmienionych i jedno przepisanie zmienionej sesji
+    assert len(updates) == 2
+    bump = next(params for sql, params in updates if "WHERE hd_sessions.id IN" in sql)
+    assert same_id in bump and moved_id not in bump
+    rewrite = next(params for sql, params in updates if "WHERE hd_sessions.id IN" not in sql)
+    assert same_id not in rewrite
+
+    with Session() as s:
+        same = s.query(HDSession).filter_by(session_id="same").one()
+        moved = s.query(HDSession).filter_by(session_id="moved").one()
+        assert same.engine_version == moved.engine_version == ENGINE_VERSION
+        assert same.input_hash == "stale" and same.variants == {"input_hash": "stale", "charts": {}}
+        assert moved.type == fields["type"] and moved.input_hash != "stale" and moved.variants is None
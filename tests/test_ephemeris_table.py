@@ -0,0 +1,9 @@
+from app.modules.hd import ephemeris_table
+
+def test_sidereal_lines_are_refined_near_boundaries(tmp_path):
+    # Rzadka tablica (krok 2 dni) - interpolacja Księżyca myli linie, doliczanie musi je poprawić także w sidereal
+    path = tmp_path / "hd_ephemeris"
+    ephemeris_table.build_table(1990, 1990, 2.0, path)
+    report = ephemeris_table.accuracy_report(path, samples=3000, tolerance=0.05, zodiac_system="sidereal")
+    assert report["bodies"]["Moon"]["line_mismatches_interpolated"] > 0
+    assert all(body["line_mismatches_refined"] == 0 for body in report["bodies"].values())
@@ -0,0 +1,11 @@
+import numpy as np
+import pytest
+
+from app.modules.hd import hd_batch
+
+def test_failed_ephemeris_lookup_raises(monkeypatch):
+    # Ujemna flaga Swiss Ephemeris nie może dać cichych długości 0°
+    monkeypatch.setattr(hd_batch, "active_table", lambda: None)
+    monkeypatch.setattr(hd_batch.swe, "calc_ut", lambda jd, body, *flags: ((0.0,) * 6, -1))
+    with pytest.raises(RuntimeError):
+        hd_batch.calc_positions_array(np.array([2447120.5]))
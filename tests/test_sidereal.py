@@ -0,0 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import swisseph as swe
+
+from app.modules.hd import hd_calculator
+
+def test_ayanamsa_is_lahiri_in_worker_threads():
+    # Stan Swiss Ephemeris jest lokalny dla wątku - nowy wątek nie może wrócić do Fagan/Bradley
+    jd = swe.julday(1987, 11, 21, 2.28)
+    with ThreadPoolExecutor(1) as executor:
+        in_thread = executor.submit(hd_calculator.ayanamsa, jd).result()
+    assert abs(in_thread - hd_calculator.ayanamsa(jd)) < 1e-9
+    assert abs(in_thread - 23.6875) < 1e-3
@@ -0,0 +1,71 @@
+from datetime import date, datetime
+
+import numpy as np
+
+from app.modules.hd import transit_overlays, transits
+from app.modules.hd.hd_batch import compute_hd_charts_batch
+from app.modules.hd.hd_calculator import gate_mask
+
+DAY = date(2026, 10, 18)
+
+def _overlay(user_gates, transit_gates, monkeypatch):
+    monkeypatch.setattr(transit_overlays, "transit_gate_mask",
+                        lambda day, zodiac_system="tropical": gate_mask(transit_gates))
+    masks = np.array([gate_mask(user_gates)], dtype=np.uint64)
+    return transit_overlays.build_overlays(masks, DAY)[0]
+
+def test_transit_gate_completes_user_channel(monkeypatch):
+    overlay = _overlay([1, 20], [8], monkeypatch)
+    assert overlay["completed_channels"] == [{"channel": "1-8", "transit_gates": [8]}]
+    assert set(overlay["temporary_centers"]) == {"G", "Throat"}
+
+def test_channel_from_transit_gates_only_is_ignored(monkeypatch):
+    # 1-8 w całości z tranzytu, sesja nie ma żadnej z tych bramek
+    overlay = _overlay([20], [1, 8], monkeypatch)
+    assert overlay["completed_channels"] == []
+    assert overlay["temporary_centers"] == []
+    assert overlay["changes"]["new_channels"] == []
+
+def test_sidereal_session_uses_sidereal_transits(monkeypatch):
+    # Ten sam dzień daje inne bramki tranzytu w każdym zodiaku - sesja sidereal dostaje swoje
+    masks = {"tropical": gate_mask([2]), "sidereal": gate_mask([8])}
+    monkeypatch.setattr(transit_overlays, "transit_gate_mask",
+                        lambda day, zodiac_system="tropical": masks[zodiac_system])
+    user = np.array([gate_mask([1, 20])], dtype=np.uint64)
+    sidereal = transit_overlays.build_overlays(user, DAY, "sidereal")[0]
+    tropical = transit_overlays.build_overlays(user, DAY, "tropical")[0]
+    assert sidereal["completed_channels"] == [{"channel": "1-8", "transit_gates": [8]}]
+    assert tropical["completed_channels"] == []
+
+def test_sidereal_transit_mask_matches_sidereal_chart():
+    # Wykres sidereal na północ UTC ma bramki Personality w masce tranzytu sidereal tego dnia
+    for zodiac_system in ("tropical", "sidereal"):
+        chart = compute_hd_charts_batch([datetime(DAY.year, DAY.month, DAY.day)], zodiac_system=zodiac_system)[0]
+        gates = [p["gate"] for p in chart["positions"] if p["side"] == "Personality"]
+        assert gate_mask(gates) & ~transits.transit_gate_mask(DAY, zodiac_system) == 0
+    assert transits.transit_gate_mask(DAY, "sidereal") != transits.transit_gate_mask(DAY, "tropical")
+
+def test_stored_overlay_is_recomputed_after_gates_change(sqlite_db, monkeypatch):
+    # Regenerate zmienia active_gates - zapisana nakładka dnia nie może zostać stara
+    from app.modules.hd.models import HDSession, HDTransitOverlay
+    _, Session = sqlite_db
+    monkeypatch.setattr(transit_overlays, "get_db", lambda: iter([Session()]))
+    monkeypatch.setattr(transit_overlays, "transit_gate_mask",
+                        lambda day, zodiac_system="tropical": gate_mask([8]))
+    with Session() as s:
+        s.add(HDSession(user_id="u1", session_id="s1", name="s1", birth_date=datetime(1990, 1, 1),
+                        birth_time="12:00", birth_place="x", birth_lat=0.0, birth_lng=0.0,
+                        zodiac_system="sidereal", type="Projector", strategy="x", authority="x", profile="1/3",
+                        sun_gate=1, earth_gate=2, moon_gate=3, north_node_gate=4, south_node_gate=5,
+                        active_gates=[1, 20]))
+        s.commit()
+    assert transit_overlays.get_session_overlay("s1", DAY)["completed_channels"][0]["channel"] == "1-8"
+
+    with Session() as s:
+        s.query(HDSession).filter_by(session_id="s1").update({"active_gates": [20]})
+        s.commit()
+    assert transit_overlays.get_session_overlay("s1", DAY)["completed_channels"] == []
+    with Session() as s:
+        row = s.query(HDTransitOverlay).filter_by(session_id="s1").one()
+        assert row.overlay["completed_channels"] == []
+        assert row.session_key == transit_overlays.session_key("sidereal", gate_mask([20]))